@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+# Host accesses benchmark: direct RemoteClient accesses vs BatchClient, against a local stand-in
+# litex_server (emulating the BIST CSRs and main_ram) counting the packets/round trips.
+# ./bench_hostbatch.py
+
+import os
+import time
+import argparse
+import tempfile
+
+from litex import RemoteClient
+from litex.tools.litex_server import RemoteServer
+
+from hostbatch import BatchClient
+
+# Stand-in SoC -------------------------------------------------------------------------------------
+
+csr_base      = 0x82000000
+main_ram_base = 0x40000000
+clk_freq      = int(200e6)
+
+bist_registers = {
+    "sdram_generator": ["reset", "start", "done", "base", "end", "length", "random", "ticks"],
+    "sdram_checker":   ["reset", "start", "done", "base", "end", "length", "random", "ticks",
+                        "errors"],
+}
+
+def write_csr_csv(filename):
+    with open(filename, "w") as f:
+        addr = csr_base
+        for name, registers in bist_registers.items():
+            f.write("csr_base,{},0x{:08x},,\n".format(name, addr))
+            for register in registers:
+                mode = "ro" if register in ["done", "ticks", "errors"] else "rw"
+                f.write("csr_register,{}_{},0x{:08x},1,{}\n".format(name, register, addr, mode))
+                addr += 4
+            addr += 0x800 - (addr - csr_base)%0x800
+        f.write("constant,config_clock_frequency,{},,\n".format(clk_freq))
+        f.write("constant,config_csr_data_width,32,,\n")
+        f.write("memory_region,main_ram,0x{:08x},{},cached\n".format(main_ram_base, 2**30))
+
+class StandInComm:
+    """Stand-in of the SoC behind litex_server: memory + BIST done bist_duration after start."""
+    def __init__(self, bist_duration):
+        self.bist_duration = bist_duration
+        self.mem           = {}
+        self.starts        = {}
+        self.transactions  = 0
+        self.registers     = {}
+        addr = csr_base
+        for name, registers in bist_registers.items():
+            for register in registers:
+                self.registers[addr] = (name, register)
+                addr += 4
+            addr += 0x800 - (addr - csr_base)%0x800
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def read(self, addr, length=None, burst="incr"):
+        self.transactions += 1
+        datas = []
+        for i in range(1 if length is None else length):
+            a = addr + 4*i*(burst == "incr")
+            name, register = self.registers.get(a, (None, None))
+            if register == "done":
+                datas.append(int(time.time() - self.starts.get(name, -1e9) >= self.bist_duration))
+            elif register == "ticks":
+                datas.append(int(self.bist_duration*clk_freq))
+            else:
+                datas.append(self.mem.get(a, 0))
+        return datas[0] if length is None else datas
+
+    def write(self, addr, datas):
+        self.transactions += 1
+        datas = datas if isinstance(datas, list) else [datas]
+        for i, data in enumerate(datas):
+            name, register = self.registers.get(addr + 4*i, (None, None))
+            if register == "start":
+                self.starts[name] = time.time()
+            self.mem[addr + 4*i] = data
+
+class CountingRemoteClient(RemoteClient):
+    """RemoteClient counting the packets sent and the round trips (packets waiting a response)."""
+    def __init__(self, *args, **kwargs):
+        RemoteClient.__init__(self, *args, **kwargs)
+        self.packets     = 0
+        self.round_trips = 0
+
+    def send_packet(self, socket, packet):
+        self.packets += 1
+        RemoteClient.send_packet(self, socket, packet)
+
+    def receive_packet(self, socket):
+        self.round_trips += 1
+        return RemoteClient.receive_packet(self, socket)
+
+# Workloads ----------------------------------------------------------------------------------------
+
+def bist_direct(wb, length):
+    for name in ["sdram_generator", "sdram_checker"]:
+        regs = wb.regs
+        getattr(regs, name + "_reset").write(1)
+        getattr(regs, name + "_reset").write(0)
+        getattr(regs, name + "_base").write(0)
+        getattr(regs, name + "_length").write(length)
+        getattr(regs, name + "_random").write(0)
+        getattr(regs, name + "_start").write(1)
+        while(not getattr(regs, name + "_done").read()):
+            pass
+        getattr(regs, name + "_ticks").read()
+        if name == "sdram_checker":
+            regs.sdram_checker_errors.read()
+
+def bist_batched(wb, length):
+    bus = BatchClient(wb)
+    for name in ["sdram_generator", "sdram_checker"]:
+        regs = wb.regs
+        bus.queue(getattr(regs, name + "_reset"), 1)
+        bus.queue(getattr(regs, name + "_reset"), 0)
+        bus.queue(getattr(regs, name + "_base"), 0)
+        bus.queue(getattr(regs, name + "_length"), length)
+        bus.queue(getattr(regs, name + "_random"), 0)
+        bus.queue(getattr(regs, name + "_start"), 1)
+        bus.flush()
+        bus.poll(getattr(regs, name + "_done"))
+        if name == "sdram_checker":
+            bus.read_regs(regs.sdram_checker_ticks, regs.sdram_checker_errors)
+        else:
+            bus.read_regs(regs.sdram_generator_ticks)
+
+def memory_direct(wb, length):
+    for i in range(length):
+        wb.write(wb.mems.main_ram.base + 4*i, i)
+    datas = [wb.read(wb.mems.main_ram.base + 4*i) for i in range(length)]
+    assert datas == list(range(length))
+
+def memory_batched(wb, length):
+    bus = BatchClient(wb)
+    bus.write(wb.mems.main_ram.base, list(range(length)))
+    datas = bus.read(wb.mems.main_ram.base, length)
+    assert datas == list(range(length))
+
+workloads = {
+    "bist":   (bist_direct,   bist_batched),
+    "memory": (memory_direct, memory_batched),
+}
+
+# Benchmark ----------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Host accesses benchmark (stand-in litex_server)")
+    parser.add_argument("--port",          default=1234,  help="stand-in server TCP port (default=1234)")
+    parser.add_argument("--bist-duration", default=0.2,   help="emulated BIST duration in s (default=0.2)")
+    parser.add_argument("--length",        default=4096,  help="memory test length in words (default=4096)")
+    args = parser.parse_args()
+
+    csr_csv = os.path.join(tempfile.mkdtemp(), "csr.csv")
+    write_csr_csv(csr_csv)
+    comm   = StandInComm(float(args.bist_duration))
+    server = RemoteServer(comm, "127.0.0.1", int(args.port))
+    server.open()
+    server.start(1)
+
+    print("{:>8s} {:>8s} {:>9s} {:>12s} {:>13s} {:>9s}".format(
+        "TEST", "MODE", "PACKETS", "ROUND TRIPS", "TRANSACTIONS", "TIME(S)"))
+    for test, (direct, batched) in workloads.items():
+        length = int(args.length) if test == "memory" else 128*1024*1024
+        for mode, workload in [("direct", direct), ("batched", batched)]:
+            wb = CountingRemoteClient(port=int(args.port), csr_csv=csr_csv)
+            wb.open()
+            transactions = comm.transactions
+            start = time.time()
+            workload(wb, length)
+            wb.read(wb.mems.main_ram.base) # Make sure all writes are processed.
+            duration = time.time() - start
+            print("{:>8s} {:>8s} {:9d} {:12d} {:13d} {:9.3f}".format(
+                test, mode, wb.packets, wb.round_trips, comm.transactions - transactions, duration))
+            wb.close()
+            time.sleep(0.1) # Let the server accept the next connection.
+
+    server.close()
+
+if __name__ == "__main__":
+    main()
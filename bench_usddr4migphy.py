@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+# Migen simulation benchmarks of LiteDRAM + USDDR4MIGPHY (with MIG PHY-only model).
+# ./bench_usddr4migphy.py commands
+# ./bench_usddr4migphy.py mappings --write-ratio=1
+# ./bench_usddr4migphy.py dma --n=256
+# ./bench_usddr4migphy.py l2 --n=256
+# ./bench_usddr4migphy.py qos
+# ./bench_usddr4migphy.py wbuffer --n=256
+
+import argparse
+import random
+
+from migen import *
+from migen.sim import passive
+
+from litex.soc.interconnect import wishbone
+
+from litedram.modules import EDY4016A
+from litedram.core import LiteDRAMCore
+
+from usddr4migphy import USDDR4MIGPHY, get_ddr4_rank_tccd
+from usddr4migphymodel import ddr4_model_pads
+from ddr4addressmapping import DDR4AddressMapping, address_mappings
+from dmafrontend import DMAFrontend
+from l2cache import L2Cache
+from qosarbiter import QoSArbiter
+from writebuffer import WriteBuffer
+
+# Bench SoC ----------------------------------------------------------------------------------------
+
+class BenchSoC(Module):
+    def __init__(self, databits=16, nranks=1, sys_clk_freq=int(200e6), address_mapping=None,
+        tCCD=None, with_dma=False, l2_cache=None, qos_ports=0, write_buffer=None, **phy_kwargs):
+        self.sys_clk_freq = sys_clk_freq
+
+        # DDR4 PHY (with MIG PHY-only model) -------------------------------------------------------
+        # Small model memory: data is not checked and Migen simulates memories as Arrays.
+        self.submodules.phy = phy = USDDR4MIGPHY(None, ddr4_model_pads(databits, nranks),
+            simulation = True,
+            databits   = databits,
+            sim_model  = {"calib_delay": 16, "mem_depth": 64},
+            **phy_kwargs)
+
+        # DDR4 Core --------------------------------------------------------------------------------
+        module = EDY4016A(sys_clk_freq, "1:4")
+        if tCCD is not None:
+            module.timing_settings.tCCD = tCCD # sys_clk cycles.
+        module.timing_settings.tCCD = get_ddr4_rank_tccd(nranks, module.timing_settings.tCCD)
+        self.submodules.core = core = LiteDRAMCore(phy,
+            module.geom_settings,
+            module.timing_settings,
+            sys_clk_freq)
+        self.port = core.crossbar.get_port()
+
+        # Address Mapping --------------------------------------------------------------------------
+        if address_mapping is not None:
+            self.submodules.mapping = DDR4AddressMapping(self.port,
+                colbits  = module.geom_settings.colbits - log2_int(2*phy.settings.nphases),
+                bankbits = module.geom_settings.bankbits,
+                bgbits   = len(phy.mc_bg)//8,
+                mappings = [address_mapping])
+            self.port = self.mapping.port
+
+        # Write Buffer -----------------------------------------------------------------------------
+        if write_buffer is not None:
+            self.submodules.write_buffer = WriteBuffer(self.port,
+                colbits  = module.geom_settings.colbits - log2_int(2*phy.settings.nphases),
+                bankbits = module.geom_settings.bankbits,
+                **write_buffer)
+            self.port = self.write_buffer.port
+
+        # DMA --------------------------------------------------------------------------------------
+        if with_dma:
+            self.submodules.dma = DMAFrontend(
+                write_port = core.crossbar.get_port(mode="write"),
+                read_port  = core.crossbar.get_port(mode="read"),
+                fifo_depth = 64)
+
+        # L2 Cache (Wishbone) ----------------------------------------------------------------------
+        if l2_cache is not None:
+            self.wishbone = wishbone.Interface()
+            self.submodules.l2_cache = L2Cache(self.wishbone, core.crossbar.get_port(), **l2_cache)
+
+        # QoS Arbiter ------------------------------------------------------------------------------
+        if qos_ports:
+            self.submodules.qos = QoSArbiter(core.crossbar.get_port(), nports=qos_ports)
+
+# Generators ---------------------------------------------------------------------------------------
+
+def wait_calibration(soc):
+    yield soc.core.dfii._control.storage.eq(0b1111) # Hardware control.
+    while not (yield soc.phy.calib_done.status):
+        yield
+
+tCCD_L = 6 # tCK, EDY4016A @ 2400MT/s: max(5nCK, 5ns).
+
+@passive
+def command_monitor(soc, stats):
+    """Decode the MIG command slots and count commands by type while stats["run"] is set.
+
+    Back-to-back CAS commands to the same bank group closer than tCCD_L (in tCK) are counted in
+    stats["ccd_l"], read/write direction changes in stats["turnarounds"]."""
+    addressbits = len(soc.phy.mc_adr)//8
+    cmds = {(0, 1, 0): "pre", (0, 0, 1): "ref", (1, 0, 1): "rd", (1, 0, 0): "wr"}
+    last_cas = None
+    while True:
+        if stats["run"]:
+            act_n = (yield soc.phy.mc_act_n)
+            cs_n  = (yield soc.phy.mc_cs_n)
+            adr   = (yield soc.phy.mc_adr)
+            bg    = (yield soc.phy.mc_bg)
+            for slot in range(0, 8, 2):
+                if (cs_n >> slot) & 0b1:
+                    continue
+                if not (act_n >> slot) & 0b1:
+                    stats["act"] += 1
+                    continue
+                we_n  = (adr >> (8*(addressbits - 3) + slot)) & 0b1
+                cas_n = (adr >> (8*(addressbits - 2) + slot)) & 0b1
+                ras_n = (adr >> (8*(addressbits - 1) + slot)) & 0b1
+                cmd   = cmds.get((ras_n, cas_n, we_n), None)
+                if cmd is not None:
+                    stats[cmd] += 1
+                if cmd in ["rd", "wr"]:
+                    if last_cas is not None and last_cas[2] != cmd:
+                        stats["turnarounds"] += 1
+                    tck = 4*stats["cycles"] + slot//2
+                    if last_cas is not None and last_cas[1] == (bg >> slot) & 0b1:
+                        if tck - last_cas[0] < tCCD_L:
+                            stats["ccd_l"] += 1
+                    last_cas = (tck, (bg >> slot) & 0b1, cmd)
+            stats["cycles"] += 1
+        yield
+
+@passive
+def data_monitor(port, stats):
+    while True:
+        if (yield port.wdata.valid) and (yield port.wdata.ready):
+            stats["wdata"] += 1
+        if (yield port.rdata.valid) and (yield port.rdata.ready):
+            stats["rdata"] += 1
+        yield
+
+def access_generator(soc, port, stats, n, write_ratio=0.5, sequential=False, seed=42):
+    """Random (or sequential) addresses with write_ratio writes, commands are issued as fast as
+    accepted."""
+    prng = random.Random(seed)
+    yield from wait_calibration(soc)
+    yield port.wdata.valid.eq(1)
+    yield port.wdata.we.eq(2**len(port.wdata.we) - 1)
+    yield port.rdata.ready.eq(1)
+    stats["run"] = True
+    reads  = 0
+    writes = 0
+    for i in range(n):
+        we = prng.random() < write_ratio
+        yield port.cmd.valid.eq(1)
+        yield port.cmd.we.eq(we)
+        yield port.cmd.addr.eq(i if sequential else prng.randrange(2**len(port.cmd.addr)))
+        yield port.wdata.data.eq(prng.randrange(2**len(port.wdata.data)))
+        yield
+        while not (yield port.cmd.ready):
+            yield
+        reads  += not we
+        writes += we
+    yield port.cmd.valid.eq(0)
+    while stats["rdata"] < reads or stats["wdata"] < writes:
+        yield
+    stats["run"] = False
+
+def dma_generator(soc, n, ticks):
+    """DMA write then read of n native port words from/to full rate streams (valid/ready always
+    set), returns the DMA ticks of each direction."""
+    dma = soc.dma
+    yield from wait_calibration(soc)
+    yield dma.sink.valid.eq(1)
+    yield dma.source.ready.eq(1)
+    for direction in ["wr", "rd"]:
+        yield getattr(dma, direction + "_base").storage.eq(0)
+        yield getattr(dma, direction + "_length").storage.eq(n)
+        yield getattr(dma, direction + "_start").re.eq(1)
+        yield
+        yield getattr(dma, direction + "_start").re.eq(0)
+        yield
+        while not (yield getattr(dma, direction + "_done").status):
+            yield
+        ticks[direction] = (yield getattr(dma, direction + "_ticks").status)
+
+def wishbone_generator(soc, words, passes, write_ratio, stats, seed=42):
+    """Sequential 32-bit accesses (write_ratio writes) over words words, passes times, then
+    reads the L2 hits/misses counters."""
+    prng = random.Random(seed)
+    bus  = soc.wishbone
+    yield from wait_calibration(soc)
+    stats["run"] = True
+    for n in range(passes):
+        for adr in range(words):
+            if prng.random() < write_ratio:
+                yield from bus.write(adr, prng.randrange(2**32))
+            else:
+                yield from bus.read(adr)
+    stats["run"] = False
+    yield
+    stats["hits"]   = (yield soc.l2_cache.hits.status)
+    stats["misses"] = (yield soc.l2_cache.misses.status)
+
+def latency_generator(soc, port, gap, streams, latencies, priorities, limits, seed=42):
+    """Sets the QoS arbiter priorities/outstanding limits, then issues single random reads (gap
+    cycles between them) while the streams run and records their latency (command presented to
+    read data)."""
+    prng = random.Random(seed)
+    for n, (priority, limit) in enumerate(zip(priorities, limits)):
+        yield getattr(soc.qos, "port{}_priority".format(n)).storage.eq(priority)
+        yield getattr(soc.qos, "port{}_max_outstanding".format(n)).storage.eq(limit)
+    yield from wait_calibration(soc)
+    yield port.rdata.ready.eq(1)
+    while not any(s["run"] for s in streams):
+        yield
+    while any(s["run"] for s in streams):
+        yield port.cmd.valid.eq(1)
+        yield port.cmd.we.eq(0)
+        yield port.cmd.addr.eq(prng.randrange(2**len(port.cmd.addr)))
+        latency = 0
+        yield
+        while not (yield port.cmd.ready):
+            latency += 1
+            yield
+        yield port.cmd.valid.eq(0)
+        latency += 1
+        yield
+        while not (yield port.rdata.valid):
+            latency += 1
+            yield
+        latencies.append(latency)
+        for i in range(gap):
+            yield
+
+@passive
+def cycles_monitor(stats):
+    while True:
+        if any(s["run"] for s in stats):
+            for s in stats:
+                s["cycles"] += 1
+        yield
+
+# Benchmarks ---------------------------------------------------------------------------------------
+
+phases_configs = {
+    "rd0/3-wr2/1": dict(rdphase=0, rdcmdphase=3, wrphase=2, wrcmdphase=1),
+    "rd2/1-wr0/3": dict(rdphase=2, rdcmdphase=1, wrphase=0, wrcmdphase=3),
+    "rd1/0-wr1/0": dict(rdphase=1, rdcmdphase=0, wrphase=1, wrcmdphase=0),
+}
+
+def new_stats():
+    return {"run": False, "cycles": 0, "wdata": 0, "rdata": 0,
+            "act": 0, "pre": 0, "ref": 0, "rd": 0, "wr": 0, "ccd_l": 0, "turnarounds": 0}
+
+def bench_commands(n, write_ratio):
+    print("Random access commands (DFI phase configs as rdphase/rdcmdphase-wrphase/wrcmdphase):")
+    print("{:>14s} {:>8s} {:>6s} {:>6s} {:>6s} {:>6s} {:>6s} {:>10s} {:>10s}".format(
+        "CONFIG", "CYCLES", "ACT", "PRE", "RD", "WR", "REF", "CMDS/CYC", "CAS/CYC"))
+    reference = None
+    for name, phases in phases_configs.items():
+        soc   = BenchSoC(**phases)
+        stats = new_stats()
+        run_simulation(soc, [
+            access_generator(soc, soc.port, stats, n, write_ratio),
+            command_monitor(soc, stats),
+            data_monitor(soc.port, stats)])
+        cmds = sum(stats[c] for c in ["act", "pre", "ref", "rd", "wr"])
+        cmds_per_cycle = cmds/stats["cycles"]
+        if reference is None:
+            reference = cmds_per_cycle
+        print("{:>14s} {:8d} {:6d} {:6d} {:6d} {:6d} {:6d} {:10.3f} {:10.3f} ({:+.1f}%)".format(
+            name, stats["cycles"],
+            stats["act"], stats["pre"], stats["rd"], stats["wr"], stats["ref"],
+            cmds_per_cycle,
+            (stats["rd"] + stats["wr"])/stats["cycles"],
+            100*(cmds_per_cycle/reference - 1)))
+
+def bench_mappings(n, write_ratio):
+    print("Sequential accesses (BIST-like), address mappings:")
+    print("{:>19s} {:>8s} {:>6s} {:>6s} {:>14s} {:>10s} {:>8s}".format(
+        "MAPPING", "CYCLES", "ACT", "CAS", "BYTES/CYCLE", "GB/S", "TCCD_L"))
+    # LiteDRAM has a single tCCD (tCCD_S for EDY4016A): the default mapping is also run with tCCD_L
+    # (2 sys_clk cycles) to get the bandwidth with back-to-back CAS commands to the same bank group
+    # correctly spaced.
+    configs = [(mapping, dict(address_mapping=mapping)) for mapping in address_mappings]
+    configs.insert(1, ("ROW_BANK_COL/TCCD_L", dict(address_mapping="ROW_BANK_COL", tCCD=2)))
+    for name, kwargs in configs:
+        soc   = BenchSoC(**kwargs)
+        stats = new_stats()
+        run_simulation(soc, [
+            access_generator(soc, soc.port, stats, n, write_ratio, sequential=True),
+            command_monitor(soc, stats),
+            data_monitor(soc.port, stats)])
+        bytes_cycle = n*len(soc.port.wdata.data)//8/stats["cycles"]
+        print("{:>19s} {:8d} {:6d} {:6d} {:14.3f} {:10.3f} {:8d}".format(
+            name, stats["cycles"], stats["act"], stats["rd"] + stats["wr"],
+            bytes_cycle, bytes_cycle*soc.sys_clk_freq/1e9, stats["ccd_l"]))
+
+def bench_dma(n):
+    print("DMA sustained throughput (full rate streams, sequential addresses):")
+    print("{:>9s} {:>8s} {:>9s} {:>14s} {:>10s}".format(
+        "DIRECTION", "CYCLES", "WORDS", "BYTES/CYCLE", "MB/S"))
+    soc   = BenchSoC(with_dma=True)
+    ticks = {}
+    run_simulation(soc, dma_generator(soc, n, ticks))
+    for direction, name in [("wr", "write"), ("rd", "read")]:
+        bytes_cycle = n*soc.dma.data_width//8/ticks[direction]
+        print("{:>9s} {:8d} {:9d} {:14.3f} {:10.1f}".format(
+            name, ticks[direction], n, bytes_cycle, bytes_cycle*soc.sys_clk_freq/1e6))
+
+def bench_l2(n, write_ratio):
+    print("Wishbone throughput through the L2 cache ({} words working set, 2 passes):".format(n))
+    print("{:>6s} {:>5s} {:>5s} {:>8s} {:>8s} {:>8s} {:>11s} {:>10s}".format(
+        "SIZE", "LINE", "WAYS", "CYCLES", "HITS", "MISSES", "BYTES/CYCLE", "MB/S"))
+    for size, line_words, nways in [(64, 1, 1), (256, 1, 1), (1024, 1, 1), (4096, 1, 1),
+                                    (1024, 4, 1), (1024, 2, 2)]:
+        soc   = BenchSoC(l2_cache=dict(size=size, line_words=line_words, nways=nways))
+        stats = new_stats()
+        run_simulation(soc, [
+            wishbone_generator(soc, n, 2, write_ratio, stats),
+            cycles_monitor([stats])])
+        bytes_cycle = 2*n*4/stats["cycles"]
+        print("{:6d} {:5d} {:5d} {:8d} {:8d} {:8d} {:11.3f} {:10.1f}".format(
+            size, line_words*len(soc.port.wdata.data)//8, nways, stats["cycles"], stats["hits"],
+            stats["misses"], bytes_cycle, bytes_cycle*soc.sys_clk_freq/1e6))
+
+def bench_qos(n, write_ratio):
+    print("QoS arbiter: sparse random reads on port 0 against 2 sequential streams on ports 1/2:")
+    print("{:>15s} {:>8s} {:>7s} {:>8s} {:>8s} {:>14s}".format(
+        "CONFIG", "CYCLES", "PROBES", "LAT AVG", "LAT MAX", "STREAMS B/CYC"))
+    # Priorities/outstanding limits of ports 0/1/2. Priority alone only wins the arbitration, port 0
+    # still waits behind the streams accesses queued in the controller: the streams outstanding
+    # accesses also have to be limited.
+    configs = [
+        ("equal",          [0, 0, 0], [16, 16, 16]),
+        ("priority",       [1, 0, 0], [16, 16, 16]),
+        ("priority+limit", [1, 0, 0], [16,  2,  2]),
+    ]
+    for name, priorities, limits in configs:
+        soc       = BenchSoC(qos_ports=3)
+        streams   = [new_stats() for _ in range(2)]
+        latencies = []
+        generators = [
+            latency_generator(soc, soc.qos.ports[0], 16, streams, latencies, priorities, limits),
+            cycles_monitor(streams)]
+        for i, s in enumerate(streams):
+            port = soc.qos.ports[1 + i]
+            generators += [
+                access_generator(soc, port, s, n, write_ratio, sequential=True, seed=i),
+                data_monitor(port, s)]
+        run_simulation(soc, generators)
+        cycles = max(s["cycles"] for s in streams)
+        print("{:>15s} {:8d} {:7d} {:8.1f} {:8d} {:14.3f}".format(
+            name, cycles, len(latencies), sum(latencies)/len(latencies), max(latencies),
+            2*n*len(soc.port.wdata.data)//8/cycles))
+
+def bench_wbuffer(n, write_ratio):
+    print("Mixed sequential reads/writes through the write buffer (depth 16):")
+    print("{:>14s} {:>8s} {:>6s} {:>6s} {:>6s} {:>9s} {:>14s} {:>10s}".format(
+        "CONFIG", "CYCLES", "ACT", "RD", "WR", "RD<->WR", "BYTES/CYCLE", "GB/S"))
+    configs = [
+        ("none",         None),
+        # Writes drained as soon as posted, reads in order.
+        ("pass-through", dict(high=1, low=0, reorder=0)),
+        ("batched",      dict(high=12, low=4, reorder=0)),
+        ("batched+ro",   dict(high=12, low=4, reorder=1)),
+    ]
+    for name, config in configs:
+        soc   = BenchSoC(write_buffer=None if config is None else {})
+        stats = new_stats()
+
+        def generator(soc):
+            if config is not None:
+                yield soc.write_buffer.high_watermark.storage.eq(config["high"])
+                yield soc.write_buffer.low_watermark.storage.eq(config["low"])
+                yield soc.write_buffer.reorder.storage.eq(config["reorder"])
+            yield from access_generator(soc, soc.port, stats, n, write_ratio, sequential=True)
+            # Wait for the buffered writes.
+            if config is not None:
+                stats["run"] = True
+                while (yield soc.write_buffer.level.status):
+                    yield
+                stats["run"] = False
+
+        run_simulation(soc, [
+            generator(soc),
+            command_monitor(soc, stats),
+            data_monitor(soc.port, stats)])
+        bytes_cycle = n*len(soc.port.wdata.data)//8/stats["cycles"]
+        print("{:>14s} {:8d} {:6d} {:6d} {:6d} {:9d} {:14.3f} {:10.3f}".format(
+            name, stats["cycles"], stats["act"], stats["rd"], stats["wr"], stats["turnarounds"],
+            bytes_cycle, bytes_cycle*soc.sys_clk_freq/1e9))
+
+# Main ---------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="LiteDRAM/USDDR4MIGPHY simulation benchmarks")
+    parser.add_argument("bench", choices=["commands", "mappings", "dma", "l2", "qos", "wbuffer"],
+        help="benchmark to run")
+    parser.add_argument("--n", default=64, help="number of accesses (default=64)")
+    parser.add_argument("--write-ratio", default=0.5, help="ratio of writes (default=0.5)")
+    args = parser.parse_args()
+
+    if args.bench == "commands":
+        bench_commands(int(args.n), float(args.write_ratio))
+    elif args.bench == "mappings":
+        bench_mappings(int(args.n), float(args.write_ratio))
+    elif args.bench == "dma":
+        bench_dma(int(args.n))
+    elif args.bench == "l2":
+        bench_l2(int(args.n), float(args.write_ratio))
+    elif args.bench == "qos":
+        bench_qos(int(args.n), float(args.write_ratio))
+    elif args.bench == "wbuffer":
+        bench_wbuffer(int(args.n), float(args.write_ratio))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+from migen import *
+
+from litex.soc.interconnect.csr import *
+
+from litedram.common import LiteDRAMNativePort
+
+# DDR4 Address Mapping -----------------------------------------------------------------------------
+
+address_mappings = ["ROW_BANK_COL", "ROW_BANK_COL_BG", "ROW_BANK_COL_BGXOR"]
+
+class DDR4AddressMapping(Module, AutoCSR):
+    """Bank group aware address mapping of a LiteDRAM native port
+
+    LiteDRAM maps native port addresses as {row, bank, column} with the DDR4 bank group as MSBs of
+    the bank (as packed by USDDR4MIGPHY), so linear accesses stay in the same bank and bank group
+    and back-to-back CAS commands require tCCD_L. The user port (self.port) addresses are remapped:
+    - ROW_BANK_COL:       {row, bg, ba, column}, LiteDRAM mapping.
+    - ROW_BANK_COL_BG:    {row, ba, column, bg}, bank group as LSBs: linear accesses rotate over
+                          the bank groups (same bank/row in each bank group).
+    - ROW_BANK_COL_BGXOR: {row, bg, ba, column} with bank group XORed with the column LSBs: linear
+                          accesses rotate over the bank groups, aligned blocks stay contiguous
+                          in a bank.
+
+    When several mappings are given, the mapping is selected at runtime with the sel CSR (index in
+    mappings).
+    """
+    def __init__(self, port, colbits, bankbits, bgbits, mappings=["ROW_BANK_COL"]):
+        assert all(mapping in address_mappings for mapping in mappings)
+        babits = bankbits - bgbits
+        self.port = LiteDRAMNativePort(
+            mode          = port.mode,
+            address_width = port.address_width,
+            data_width    = port.data_width,
+            clock_domain  = port.clock_domain,
+            id            = port.id)
+
+        # # #
+
+        addr  = self.port.cmd.addr
+        col   = addr[:colbits]
+        ba    = addr[colbits:colbits + babits]
+        bg    = addr[colbits + babits:colbits + bankbits]
+        row   = addr[colbits + bankbits:]
+        addrs = {
+            "ROW_BANK_COL":       addr,
+            "ROW_BANK_COL_BG":    Cat(addr[bgbits:colbits + bgbits], addr[colbits + bgbits:colbits + bankbits],
+                                      addr[:bgbits], row),
+            "ROW_BANK_COL_BGXOR": Cat(col, ba, bg ^ col[:bgbits], row),
+        }
+
+        if len(mappings) > 1:
+            self.sel = CSRStorage(bits_for(len(mappings) - 1))
+            mapped   = Array(addrs[mapping] for mapping in mappings)[self.sel.storage]
+        else:
+            mapped   = addrs[mappings[0]]
+
+        self.comb += [
+            self.port.cmd.connect(port.cmd, omit={"addr"}),
+            port.cmd.addr.eq(mapped),
+            self.port.wdata.connect(port.wdata),
+            port.rdata.connect(self.port.rdata),
+            port.flush.eq(self.port.flush),
+            self.port.lock.eq(port.lock),
+        ]
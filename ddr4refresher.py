@@ -0,0 +1,230 @@
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+from migen import *
+
+from litex.soc.interconnect import stream
+from litex.soc.interconnect.csr import *
+
+from litedram.common import cmd_request_rw_layout
+
+# DDR4 Fine Granularity Refresh --------------------------------------------------------------------
+
+fgr_modes = ["1x", "2x", "4x"]
+
+# MR3 A[8:6] (Fine Granularity Refresh Mode): normal (fixed 1x), fixed 2x, fixed 4x.
+fgr_mr3 = {"1x": 0b000 << 6, "2x": 0b001 << 6, "4x": 0b010 << 6}
+fgr_mr3_mask = 0b111 << 6
+
+# MR3 programmed by the MIG at calibration (ip/ddr4_0 configuration, no CRC/geardown/PDA/ECC):
+# MPR operation off (A2), 1/2 rate (A3, no geardown), per-DRAM addressability off (A4), temperature
+# sensor readout off (A5), FGR normal (A8:A6), write command latency 4nCK (A10:A9, only used with
+# CRC and DM), MPR serial read format (A12:A11). To be checked against the MR3 parameter of the
+# generated MIG sources when the IP configuration changes.
+mig_mr3 = 0x0000
+
+def get_fgr_mr3(mode, mr3=mig_mr3):
+    """MR3 value switching to the FGR mode, other MR3 fields kept from mr3."""
+    return (mr3 & ~fgr_mr3_mask) | fgr_mr3[mode]
+
+def ddr4_fgr_timings(sdram_module_cls, clk_freq, rate, speedgrade=None):
+    """(tREFI, tRFC) in sys_clk cycles of each Fine Granularity Refresh mode of a DDR4 module."""
+    timings = {}
+    for mode in fgr_modes:
+        settings = sdram_module_cls(clk_freq, rate, speedgrade, fine_refresh_mode=mode).timing_settings
+        timings[mode] = (settings.tREFI, settings.tRFC)
+    return timings
+
+# DDR4 Refresher -----------------------------------------------------------------------------------
+
+class DDR4Refresher(Module, AutoCSR):
+    """DDR4 Refresher with postponed/pulled-in refresh and Fine Granularity Refresh
+
+    Drop-in replacement of LiteDRAM's Refresher (refresh_cls of the ControllerSettings, use
+    functools.partial to pass fgr_timings). Refreshes are owed every tREFI of the selected FGR mode
+    and are issued (Precharge All, tRP, Refresh, tRFC) when the controller is not busy (busy:
+    requests pending in the bank machines, to be connected by the integration):
+    - while busy, owed refreshes are postponed up to postpone*(1, 2, 4) (1x, 2x, 4x) refreshes,
+      the JEDEC limit being 8 tREFI in 1x mode; above that, a refresh is forced.
+    - while not busy, owed refreshes are issued and up to pull_in refreshes are issued in advance.
+
+    The FGR mode (fgr CSR) must match the MR3 FGR setting of the DRAM (fgr_mr3), modes not given
+    in fgr_timings fall back to 1x timings. Refreshes are counted in CSRs: refreshes (REF commands),
+    postponed (tREFI ticks while busy), forced (refreshes at the postponing limit), pulled_in
+    (refreshes ahead of time) and max_pending (maximum owed refreshes).
+    """
+    def __init__(self, settings, clk_freq, zqcs_freq=1e0, postponing=8, fgr_timings=None):
+        assert postponing <= 8
+        abits  = settings.geom.addressbits
+        babits = settings.geom.bankbits + log2_int(settings.phy.nranks)
+        self.cmd  = cmd = stream.Endpoint(cmd_request_rw_layout(a=abits, ba=babits))
+        self.busy = Signal()
+
+        self.fgr         = CSRStorage(2)
+        self.postpone    = CSRStorage(4, reset=postponing)
+        self.pull_in     = CSRStorage(4)
+        self.refreshes   = CSRStatus(32)
+        self.postponed   = CSRStatus(32)
+        self.forced      = CSRStatus(32)
+        self.pulled_in   = CSRStatus(32)
+        self.max_pending = CSRStatus(8)
+
+        # # #
+
+        if fgr_timings is None:
+            fgr_timings = {}
+        timings = [fgr_timings.get(mode, (settings.timing.tREFI, settings.timing.tRFC))
+            for mode in fgr_modes]
+        trefi_max = max(trefi for trefi, trfc in timings)
+        trfc_max  = max(trfc  for trefi, trfc in timings)
+        fgr       = Signal(2)
+        self.comb += fgr.eq(Mux(self.fgr.storage > 2, 0, self.fgr.storage))
+
+        # Refresh Timer (tREFI of the FGR mode) ----------------------------------------------------
+        tick  = Signal()
+        timer = Signal(max=trefi_max, reset=timings[0][0] - 1)
+        self.comb += tick.eq(timer == 0)
+        self.sync += [
+            If(tick,
+                timer.eq(Array(trefi - 1 for trefi, trfc in timings)[fgr])
+            ).Else(
+                timer.eq(timer - 1)
+            )
+        ]
+
+        # Owed Refreshes ---------------------------------------------------------------------------
+        # pending: refreshes owed (> 0) or issued in advance (< 0).
+        ref     = Signal()
+        pending = Signal((7, True))
+        limit   = Signal(7)
+        self.comb += limit.eq(self.postpone.storage << fgr)
+        self.sync += pending.eq(pending + tick - ref)
+
+        forced  = Signal()
+        request = Signal()
+        self.comb += [
+            forced.eq(pending > limit),
+            request.eq(forced | (~self.busy & (pending > -self.pull_in.storage))),
+        ]
+
+        # Counters ---------------------------------------------------------------------------------
+        self.sync += [
+            If(ref,
+                self.refreshes.status.eq(self.refreshes.status + 1),
+                If(pending <= 0,
+                    self.pulled_in.status.eq(self.pulled_in.status + 1)
+                )
+            ),
+            If(tick & self.busy,
+                self.postponed.status.eq(self.postponed.status + 1)
+            ),
+            If((pending > 0) & (pending > self.max_pending.status),
+                self.max_pending.status.eq(pending)
+            )
+        ]
+
+        # ZQCS Timer -------------------------------------------------------------------------------
+        if settings.timing.tZQCS is not None:
+            zqcs_period = int(clk_freq/zqcs_freq)
+            zqcs_timer  = Signal(max=zqcs_period, reset=zqcs_period - 1)
+            wants_zqcs  = Signal()
+            zqcs_done   = Signal()
+            self.sync += [
+                If(zqcs_timer != 0,
+                    zqcs_timer.eq(zqcs_timer - 1)
+                ),
+                If(zqcs_done,
+                    wants_zqcs.eq(0),
+                    zqcs_timer.eq(zqcs_period - 1)
+                ).Elif(zqcs_timer == 0,
+                    wants_zqcs.eq(1)
+                )
+            ]
+
+        # Refresh FSM ------------------------------------------------------------------------------
+        count = Signal(max=max(trfc_max, settings.timing.tRP, settings.timing.tZQCS or 0) + 1)
+        self.submodules.fsm = fsm = FSM(reset_state="IDLE")
+        fsm.act("IDLE",
+            If(settings.with_refresh & request,
+                If(forced & self.busy,
+                    NextValue(self.forced.status, self.forced.status + 1)
+                ),
+                NextState("WAIT-BANK-MACHINES")
+            )
+        )
+        fsm.act("WAIT-BANK-MACHINES",
+            cmd.valid.eq(1),
+            If(cmd.ready,
+                NextState("PRECHARGE-ALL")
+            )
+        )
+        fsm.act("PRECHARGE-ALL",
+            cmd.valid.eq(1),
+            cmd.a.eq(2**10),
+            cmd.ras.eq(1),
+            cmd.we.eq(1),
+            NextValue(count, settings.timing.tRP - 1),
+            NextState("TRP")
+        )
+        fsm.act("TRP",
+            cmd.valid.eq(1),
+            NextValue(count, count - 1),
+            If(count == 0,
+                NextState("REFRESH")
+            )
+        )
+        fsm.act("REFRESH",
+            cmd.valid.eq(1),
+            cmd.ras.eq(1),
+            cmd.cas.eq(1),
+            ref.eq(1),
+            NextValue(count, Array(trfc - 1 for trefi, trfc in timings)[fgr]),
+            NextState("TRFC")
+        )
+        done = [
+            cmd.valid.eq(0),
+            cmd.last.eq(1),
+            NextState("IDLE")
+        ]
+        if settings.timing.tZQCS is None:
+            fsm.act("TRFC",
+                cmd.valid.eq(1),
+                NextValue(count, count - 1),
+                If(count == 0, *done)
+            )
+        else:
+            fsm.act("TRFC",
+                cmd.valid.eq(1),
+                NextValue(count, count - 1),
+                If(count == 0,
+                    If(wants_zqcs,
+                        NextState("ZQCS")
+                    ).Else(*done)
+                )
+            )
+            fsm.act("ZQCS",
+                cmd.valid.eq(1),
+                cmd.we.eq(1),
+                NextValue(count, settings.timing.tZQCS - 1),
+                NextState("TZQCS")
+            )
+            fsm.act("TZQCS",
+                cmd.valid.eq(1),
+                NextValue(count, count - 1),
+                If(count == 0,
+                    zqcs_done.eq(1),
+                    *done
+                )
+            )
+
+# DDR4 Refresher CSRs ------------------------------------------------------------------------------
+
+class DDR4RefresherCSRs(Module, AutoCSR):
+    """CSRs of a DDR4Refresher built by LiteDRAM's controller (refresh_cls)
+
+    LiteDRAMController does not collect the CSRs of its submodules: this module (no logic) holds the
+    refresher CSRs so that they can be added to the SoC as a regular CSR submodule (add_csr).
+    """
+    def __init__(self, refresher):
+        for csr in refresher.get_csrs():
+            setattr(self, csr.name, csr)
@@ -0,0 +1,83 @@
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+# DFI command-level decoding of captured DFI phase signals (SegmentedCapture).
+
+# DFI Capture Fields -------------------------------------------------------------------------------
+
+dfi_capture_phase_fields = ["cs_n", "act_n", "ras_n", "cas_n", "we_n", "bank", "address",
+    "rddata_en", "wrdata_en"]
+
+def dfi_capture_fields(phy):
+    """SegmentedCapture fields of the DFI commands of a USDDR4MIGPHY (controller side) and of the
+    CAS sent to the MIG."""
+    fields = [("rd_cas", phy.mc_rd_cas), ("wr_cas", phy.mc_wr_cas)]
+    for n, phase in enumerate(phy.dfi.phases):
+        for name in dfi_capture_phase_fields:
+            fields.append(("p{}_{}".format(n, name), getattr(phase, name)))
+    return fields
+
+# DFI Decoder --------------------------------------------------------------------------------------
+
+dfi_commands = {
+    # (ras_n, cas_n, we_n)
+    (0, 1, 1): "ACT",
+    (1, 0, 1): "RD",
+    (1, 0, 0): "WR",
+    (0, 1, 0): "PRE",
+    (0, 0, 1): "REF",
+    (0, 0, 0): "MRS",
+    (1, 1, 0): "ZQC",
+}
+
+def decode_dfi(samples, nphases=4, nranks=1, babits=2, start=0):
+    """Decode DFI samples (one dict of p<n>_<field> values per sys_clk cycle, first sample at
+    cycle start) to a list of commands (dicts): cycle, phase, tck, cmd, rank, bg, ba, row (ACT),
+    col (RD/WR), ap (RD/WR: auto-precharge, PRE: all banks)."""
+    trace = []
+    for i, sample in enumerate(samples):
+        for n in range(nphases):
+            p    = lambda name: sample["p{}_{}".format(n, name)]
+            cs_n = p("cs_n")
+            if cs_n == 2**nranks - 1:
+                continue
+            if not p("act_n"):
+                cmd = "ACT"
+            else:
+                cmd = dfi_commands.get((p("ras_n"), p("cas_n"), p("we_n")), None)
+            if cmd is None:
+                continue
+            entry = {
+                "cycle": start + i,
+                "phase": n,
+                "tck":   nphases*(start + i) + n,
+                "cmd":   cmd,
+                "rank":  [r for r in range(nranks) if not (cs_n >> r) & 0b1][0],
+            }
+            if cmd in ["ACT", "RD", "WR", "PRE"]:
+                entry["bg"] = p("bank") >> babits
+                entry["ba"] = p("bank") & (2**babits - 1)
+            if cmd == "ACT":
+                entry["row"] = p("address")
+            if cmd in ["RD", "WR"]:
+                entry["col"] = p("address") & 0x3ff
+            if cmd in ["RD", "WR", "PRE"]:
+                entry["ap"] = (p("address") >> 10) & 0b1
+            trace.append(entry)
+    return trace
+
+def format_dfi(trace):
+    lines = []
+    for entry in trace:
+        line = "{:8d} {:6d}.{:d} {:>4s} r{:d}".format(
+            entry["tck"], entry["cycle"], entry["phase"], entry["cmd"], entry["rank"])
+        if "bg" in entry:
+            line += " bg{:d} ba{:d}".format(entry["bg"], entry["ba"])
+        if "row" in entry:
+            line += " row=0x{:05x}".format(entry["row"])
+        if "col" in entry:
+            line += " col=0x{:03x}".format(entry["col"])
+        if entry.get("ap", 0):
+            line += " all" if entry["cmd"] == "PRE" else " ap"
+        lines.append(line)
+    return "\n".join(lines)
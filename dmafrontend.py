@@ -0,0 +1,198 @@
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+from migen import *
+
+from litex.soc.interconnect.csr import *
+from litex.soc.interconnect import stream
+from litex.soc.interconnect import wishbone
+
+from litedram.frontend.dma import LiteDRAMDMAWriter, LiteDRAMDMAReader
+
+# DMA Frontend -------------------------------------------------------------------------------------
+
+class DMAFrontend(Module, AutoCSR):
+    """Stream <-> DRAM DMA on LiteDRAM native ports
+
+    - sink -> DRAM (write_port): wr_length native port words from sink are written from wr_base.
+    - DRAM -> source (read_port): rd_length native port words from rd_base are read to source.
+
+    Streams are native port wide (one port word per beat, full-width bursts) and each direction
+    is pipelined up to fifo_depth accesses, so a stream producing/consuming a word per cycle
+    (Ethernet/PCIe, simulated stream) runs at the port rate (fifo_depth must cover the port read
+    latency). Bases are in bytes, lengths in native
+    port words. done is set when all the data has been accepted by the DMA writer / returned on
+    source, ticks are the sys_clk cycles from start to done.
+    """
+    def __init__(self, write_port, read_port, fifo_depth=16):
+        assert write_port.data_width == read_port.data_width
+        self.data_width = data_width = write_port.data_width
+        ashift = log2_int(data_width//8)
+        awidth = write_port.address_width + ashift
+
+        self.sink   = sink   = stream.Endpoint([("data", data_width)])
+        self.source = source = stream.Endpoint([("data", data_width)])
+
+        self.wr_start  = CSR()
+        self.wr_done   = CSRStatus()
+        self.wr_base   = CSRStorage(awidth)
+        self.wr_length = CSRStorage(32)
+        self.wr_ticks  = CSRStatus(32)
+        self.rd_start  = CSR()
+        self.rd_done   = CSRStatus()
+        self.rd_base   = CSRStorage(awidth)
+        self.rd_length = CSRStorage(32)
+        self.rd_ticks  = CSRStatus(32)
+
+        # # #
+
+        self.submodules.writer = writer = LiteDRAMDMAWriter(write_port, fifo_depth)
+        self.submodules.reader = reader = LiteDRAMDMAReader(read_port, fifo_depth)
+
+        # Write: sink -> DRAM ----------------------------------------------------------------------
+        wr_active = Signal()
+        wr_count  = Signal(32)
+        self.comb += [
+            writer.sink.valid.eq(wr_active & sink.valid),
+            writer.sink.address.eq(self.wr_base.storage[ashift:] + wr_count),
+            writer.sink.data.eq(sink.data),
+            sink.ready.eq(wr_active & writer.sink.ready),
+            self.wr_done.status.eq(~wr_active),
+        ]
+        self.sync += [
+            If(self.wr_start.re,
+                wr_active.eq(self.wr_length.storage != 0),
+                wr_count.eq(0),
+                self.wr_ticks.status.eq(0)
+            ).Elif(wr_active,
+                self.wr_ticks.status.eq(self.wr_ticks.status + 1),
+                If(writer.sink.valid & writer.sink.ready,
+                    wr_count.eq(wr_count + 1),
+                    If(wr_count == (self.wr_length.storage - 1),
+                        wr_active.eq(0)
+                    )
+                )
+            )
+        ]
+
+        # Read: DRAM -> source ---------------------------------------------------------------------
+        rd_cmd_active = Signal()
+        rd_active     = Signal()
+        rd_cmd_count  = Signal(32)
+        rd_count      = Signal(32)
+        self.comb += [
+            reader.sink.valid.eq(rd_cmd_active),
+            reader.sink.address.eq(self.rd_base.storage[ashift:] + rd_cmd_count),
+            reader.source.connect(source),
+            self.rd_done.status.eq(~rd_active),
+        ]
+        self.sync += [
+            If(self.rd_start.re,
+                rd_cmd_active.eq(self.rd_length.storage != 0),
+                rd_active.eq(self.rd_length.storage != 0),
+                rd_cmd_count.eq(0),
+                rd_count.eq(0),
+                self.rd_ticks.status.eq(0)
+            ).Else(
+                If(reader.sink.valid & reader.sink.ready,
+                    rd_cmd_count.eq(rd_cmd_count + 1),
+                    If(rd_cmd_count == (self.rd_length.storage - 1),
+                        rd_cmd_active.eq(0)
+                    )
+                ),
+                If(rd_active,
+                    self.rd_ticks.status.eq(self.rd_ticks.status + 1),
+                    If(source.valid & source.ready,
+                        rd_count.eq(rd_count + 1),
+                        If(rd_count == (self.rd_length.storage - 1),
+                            rd_active.eq(0)
+                        )
+                    )
+                )
+            )
+        ]
+
+# DMA Stream Window --------------------------------------------------------------------------------
+
+class DMAStreamWindow(Module):
+    """Wishbone window on the DMA streams (host bridge without a native stream interface)
+
+    Wishbone writes (any address in the window) push 32-bit words to source, Wishbone reads pop
+    32-bit words from sink (the read is held until data is available: start the DMA read first).
+    Words are converted to/from data_width, first word in the LSBs. Mapping a window (instead of
+    a single address) lets the host use burst (incrementing address) accesses.
+    """
+    def __init__(self, data_width, size=0x1000):
+        self.bus    = bus    = wishbone.Interface()
+        self.source = source = stream.Endpoint([("data", data_width)])
+        self.sink   = sink   = stream.Endpoint([("data", data_width)])
+        self.size   = size # bytes
+
+        # # #
+
+        upconverter   = stream.Converter(32, data_width)
+        downconverter = stream.Converter(data_width, 32)
+        self.submodules += upconverter, downconverter
+        self.comb += [
+            upconverter.source.connect(source),
+            sink.connect(downconverter.sink),
+
+            upconverter.sink.valid.eq(bus.cyc & bus.stb & bus.we),
+            upconverter.sink.data.eq(bus.dat_w),
+            downconverter.source.ready.eq(bus.cyc & bus.stb & ~bus.we),
+            bus.dat_r.eq(downconverter.source.data),
+            If(bus.we,
+                bus.ack.eq(bus.cyc & bus.stb & upconverter.sink.ready)
+            ).Else(
+                bus.ack.eq(bus.cyc & bus.stb & downconverter.source.valid)
+            )
+        ]
+
+# Driver -------------------------------------------------------------------------------------------
+
+class DMADriver:
+    """Host bulk load/dump of DRAM through a DMAFrontend + DMAStreamWindow (RemoteClient +
+    BatchClient)
+
+    Data is a list of 32-bit words, DRAM addresses are in bytes (relative to main_ram). Transfers
+    are split in chunks of the window size.
+    """
+    def __init__(self, wb, bus, name="sdram_dma", window="sdram_dma_window", port_bytes=64):
+        self.wb         = wb
+        self.bus        = bus
+        self.name       = name
+        self.base       = getattr(wb.mems, window).base
+        self.size       = getattr(wb.mems, window).size
+        self.port_bytes = port_bytes
+
+    def reg(self, name):
+        return getattr(self.wb.regs, self.name + "_" + name)
+
+    def chunks(self, length):
+        chunk = min(self.size//4, self.bus.max_burst)
+        for offset in range(0, length, chunk):
+            yield offset, min(chunk, length - offset)
+
+    def load(self, addr, datas, timeout=None):
+        """Writes datas to DRAM at addr, returns the DMA ticks."""
+        assert (4*len(datas))%self.port_bytes == 0
+        self.bus.queue(self.reg("wr_base"), addr)
+        self.bus.queue(self.reg("wr_length"), 4*len(datas)//self.port_bytes)
+        self.bus.queue(self.reg("wr_start"), 1)
+        self.bus.flush()
+        for offset, n in self.chunks(len(datas)):
+            self.wb.write(self.base, datas[offset:offset + n])
+        self.bus.poll(self.reg("wr_done"), timeout=timeout)
+        return self.bus.read_regs(self.reg("wr_ticks"))[0]
+
+    def dump(self, addr, length):
+        """Reads length 32-bit words from DRAM at addr."""
+        assert (4*length)%self.port_bytes == 0
+        self.bus.queue(self.reg("rd_base"), addr)
+        self.bus.queue(self.reg("rd_length"), 4*length//self.port_bytes)
+        self.bus.queue(self.reg("rd_start"), 1)
+        self.bus.flush()
+        datas = []
+        for offset, n in self.chunks(length):
+            datas += self.wb.read(self.base, n)
+        return datas
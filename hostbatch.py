@@ -0,0 +1,94 @@
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+# Batched host accesses over a RemoteClient (litex_server): each RemoteClient call is a full round
+# trip through the bridge (UART), this layer groups accesses into as few Etherbone packets as
+# possible.
+
+import time
+
+from litex.tools.remote.etherbone import EtherbonePacket, EtherboneRecord, EtherboneReads
+
+# Batch Client -------------------------------------------------------------------------------------
+
+class BatchClient:
+    """Batched accesses over a RemoteClient
+
+    - read/write: multi-word burst accesses (split in max_burst words packets).
+    - read_regs: CSRs reads (any addresses) in a single packet.
+    - queue/flush: queued CSR writes, consecutive addresses (in queue order) are flushed as a
+      single burst write.
+    - poll: wait for a CSR value with exponential backoff between reads.
+    """
+    def __init__(self, wb, max_burst=255):
+        self.wb        = wb
+        self.max_burst = max_burst # Etherbone records are limited to 255 reads/writes.
+        self.writes    = []
+
+    # Memory ---------------------------------------------------------------------------------------
+    def read(self, addr, length):
+        datas = []
+        for offset in range(0, length, self.max_burst):
+            n = min(self.max_burst, length - offset)
+            datas += self.wb.read(addr + 4*offset, n)
+        return datas
+
+    def write(self, addr, datas):
+        for offset in range(0, len(datas), self.max_burst):
+            self.wb.write(addr + 4*offset, datas[offset:offset + self.max_burst])
+
+    # CSRs -----------------------------------------------------------------------------------------
+    def read_addrs(self, addrs):
+        datas = []
+        for offset in range(0, len(addrs), self.max_burst):
+            record = EtherboneRecord()
+            record.reads  = EtherboneReads(addrs=[self.wb.base_address + addr
+                for addr in addrs[offset:offset + self.max_burst]])
+            record.rcount = len(record.reads)
+
+            packet = EtherbonePacket()
+            packet.records = [record]
+            packet.encode()
+            self.wb.send_packet(self.wb.socket, packet)
+
+            packet = EtherbonePacket(self.wb.receive_packet(self.wb.socket))
+            packet.decode()
+            datas += packet.records.pop().writes.get_datas()
+        return datas
+
+    def read_regs(self, *regs):
+        addrs = [reg.addr + 4*i for reg in regs for i in range(reg.length)]
+        datas = iter(self.read_addrs(addrs))
+        values = []
+        for reg in regs:
+            value = 0
+            for i in range(reg.length):
+                value = (value << reg.data_width) | next(datas)
+            values.append(value)
+        return values
+
+    def queue(self, reg, value):
+        for i in range(reg.length):
+            data = (value >> ((reg.length - 1 - i)*reg.data_width)) & (2**reg.data_width - 1)
+            self.writes.append((reg.addr + 4*i, data))
+
+    def flush(self):
+        base, datas = None, []
+        for addr, data in self.writes:
+            if base is not None and addr == base + 4*len(datas) and len(datas) < self.max_burst:
+                datas.append(data)
+            else:
+                if base is not None:
+                    self.wb.write(base, datas)
+                base, datas = addr, [data]
+        if base is not None:
+            self.wb.write(base, datas)
+        self.writes = []
+
+    def poll(self, reg, value=1, timeout=None, delay=1e-3, max_delay=0.1, backoff=2):
+        start = time.time()
+        while self.read_regs(reg)[0] != value:
+            if timeout is not None and (time.time() - start) > timeout:
+                raise TimeoutError("{} != {} after {}s".format(reg.name, value, timeout))
+            time.sleep(delay)
+            delay = min(delay*backoff, max_delay)
@@ -3,7 +3,9 @@
 # This file is Copyright (c) 2019 Florent Kermarrec <florent@enjoy-digital.fr>
 # License: BSD
 
-import sys
+import argparse
+from functools import partial, reduce
+from operator import or_
 
 from migen import *
 from migen.genlib.io import CRG
@@ -12,26 +14,52 @@ import kcu105_platform as kcu105
 
 from litex.soc.cores.uart import UARTWishboneBridge
 
-from litex.soc.integration.soc_sdram import SoCSDRAM
 from litex.soc.integration.builder import *
 
 from litescope import LiteScopeAnalyzer
 
 from litedram.modules import EDY4016A
+from litedram.core.controller import ControllerSettings
 from litedram.frontend.bist import LiteDRAMBISTGenerator
 from litedram.frontend.bist import LiteDRAMBISTChecker
 
 from usddr4migphy import USDDR4MIGPHY
+from ddr4addressmapping import DDR4AddressMapping, address_mappings
+from latencyhistogram import LatencyHistogram
+from trafficgenerator import TrafficGenerator
+from segmentedcapture import SegmentedCapture
+from dfidecoder import dfi_capture_fields
+from ddr4refresher import DDR4Refresher, DDR4RefresherCSRs, ddr4_fgr_timings
+from dmafrontend import DMAFrontend, DMAStreamWindow
+from soc_sdram_l2 import SoCSDRAML2
+from qosarbiter import AXIQoSFrontend
+from writebuffer import WriteBuffer
 
 # DDR4TestSoC --------------------------------------------------------------------------------------
 
-class DDR4TestSoC(SoCSDRAM):
-    def __init__(self, with_analyzer=True):
-        sys_clk_freq = int(200e6)
+class DDR4TestSoC(SoCSDRAML2):
+    mem_map = {
+        "segments":         0x30000000,
+        "sdram_dma_window": 0x31000000,
+    }
+    mem_map.update(SoCSDRAML2.mem_map)
+
+    def __init__(self, data_rate=1600, sys_clk_freq=None, read_latency=None, with_analyzer=True,
+        l2_size=8192, l2_line_words=1, l2_ways=1, l2_write_back=True, axi_ports=0):
+        # sys_clk is the MIG UI clock: DRAM clock / 4.
+        ui_clk_freq = int(data_rate*1e6/8)
+        if sys_clk_freq is None:
+            sys_clk_freq = ui_clk_freq
+        if sys_clk_freq != ui_clk_freq:
+            raise ValueError("UI clock must be {:.3f}MHz at {}MT/s (4:1 PHY), got {:.3f}MHz.".format(
+                ui_clk_freq/1e6, data_rate, sys_clk_freq/1e6))
         platform = kcu105.Platform()
-        SoCSDRAM.__init__(self, platform,
+        SoCSDRAML2.__init__(self, platform,
             cpu_type       = None,
-            l2_size        = 16,
+            l2_size        = l2_size,
+            l2_line_words  = l2_line_words,
+            l2_ways        = l2_ways,
+            l2_write_back  = l2_write_back,
             clk_freq       = sys_clk_freq,
             csr_data_width = 32,
             with_uart      = False,
@@ -46,23 +74,87 @@ class DDR4TestSoC(SoCSDRAM):
         self.add_wb_master(self.serial_bridge.wishbone)
 
         # DDR4 PHY ---------------------------------------------------------------------------------
-        self.submodules.ddr4_phy = ddr4_phy = USDDR4MIGPHY(platform, platform.request("ddram"))
+        sdram_module = EDY4016A(sys_clk_freq, "1:4")
+        self.submodules.ddr4_phy = ddr4_phy = USDDR4MIGPHY(platform, platform.request("ddram"),
+            data_rate     = data_rate,
+            sdram_module  = sdram_module,
+            read_latency  = read_latency,
+            with_counters = True)
         self.add_csr("ddr4_phy")
 
         # DDR4 Core --------------------------------------------------------------------------------
-        sdram_module = EDY4016A(sys_clk_freq, "1:4")
+        # Refresher with postponing (up to 8 tREFI) and Fine Granularity Refresh (1x/2x/4x).
+        controller_settings = ControllerSettings(
+            refresh_cls        = partial(DDR4Refresher,
+                fgr_timings = ddr4_fgr_timings(EDY4016A, sys_clk_freq, "1:4")),
+            refresh_postponing = 8)
+        # L2 cache (main_ram): line_words native port words (64 bytes) per line.
         self.register_sdram(ddr4_phy,
                             sdram_module.geom_settings,
                             sdram_module.timing_settings,
-                            main_ram_size_limit=0x40000000)
-
-        # DDR4 BIST
-        sdram_generator_port = self.sdram.crossbar.get_port()
-        sdram_checker_port   = self.sdram.crossbar.get_port()
-        self.submodules.sdram_generator = LiteDRAMBISTGenerator(sdram_generator_port)
-        self.add_csr("sdram_generator")
-        self.submodules.sdram_checker   = LiteDRAMBISTChecker(sdram_checker_port)
-        self.add_csr("sdram_checker")
+                            controller_settings = controller_settings,
+                            main_ram_size_limit = 0x40000000)
+
+        # DDR4 Refresher (postpone refreshes while requests are pending in the bank machines)
+        controller = self.sdram.controller
+        nbanks     = controller.settings.phy.nranks*2**controller.settings.geom.bankbits
+        self.comb += controller.refresher.busy.eq(reduce(or_,
+            [getattr(controller.interface, "bank" + str(n)).valid for n in range(nbanks)]))
+        self.submodules.sdram_refresher = DDR4RefresherCSRs(controller.refresher)
+        self.add_csr("sdram_refresher")
+
+        # DDR4 BIST (with runtime selectable address mapping, checker with read latency histogram)
+        interface = self.sdram.crossbar.controller
+        for name, bist_cls in [("sdram_generator", LiteDRAMBISTGenerator),
+                               ("sdram_checker",   LiteDRAMBISTChecker)]:
+            mapping = DDR4AddressMapping(self.sdram.crossbar.get_port(),
+                colbits  = interface.settings.geom.colbits - interface.address_align,
+                bankbits = interface.settings.geom.bankbits,
+                bgbits   = len(ddr4_phy.mc_bg)//8,
+                mappings = address_mappings)
+            setattr(self.submodules, name + "_mapping", mapping)
+            self.add_csr(name + "_mapping")
+            port = mapping.port
+            if bist_cls == LiteDRAMBISTChecker:
+                latency = LatencyHistogram(port)
+                setattr(self.submodules, name + "_latency", latency)
+                self.add_csr(name + "_latency")
+                port = latency.port
+            setattr(self.submodules, name, bist_cls(port))
+            self.add_csr(name)
+
+        # DDR4 Traffic Generator (random/strided/page hit patterns, read/write mix), through a
+        # write buffer (write combining/batching, read reordering) to reduce the turnarounds of
+        # mixed traffic, bypassed by default (raw controller behaviour)
+        self.submodules.sdram_wbuffer = WriteBuffer(self.sdram.crossbar.get_port(),
+            colbits  = interface.settings.geom.colbits - interface.address_align,
+            bankbits = interface.settings.geom.bankbits,
+            bypass   = True)
+        self.add_csr("sdram_wbuffer")
+        self.submodules.sdram_traffic = TrafficGenerator(self.sdram_wbuffer.port,
+            colbits = interface.settings.geom.colbits - interface.address_align)
+        self.add_csr("sdram_traffic")
+
+        # DDR4 DMA (full-width native port streams, mapped on a Wishbone window for host bulk
+        # load/dump until a faster stream interface is connected)
+        self.submodules.sdram_dma = DMAFrontend(
+            write_port = self.sdram.crossbar.get_port(mode="write"),
+            read_port  = self.sdram.crossbar.get_port(mode="read"),
+            fifo_depth = 64)
+        self.add_csr("sdram_dma")
+        self.submodules.sdram_dma_window = DMAStreamWindow(self.sdram_dma.data_width)
+        self.comb += [
+            self.sdram_dma_window.source.connect(self.sdram_dma.sink),
+            self.sdram_dma.source.connect(self.sdram_dma_window.sink),
+        ]
+        self.register_mem("sdram_dma_window", self.mem_map["sdram_dma_window"],
+            self.sdram_dma_window.bus, self.sdram_dma_window.size)
+
+        # DDR4 AXI (QoS arbitrated AXI4 slave ports for DMA masters: self.sdram_axi.axi)
+        if axi_ports:
+            self.submodules.sdram_axi = AXIQoSFrontend(self.sdram.crossbar.get_port(),
+                nports = axi_ports)
+            self.add_csr("sdram_axi")
 
         # Leds -------------------------------------------------------------------------------------
         self.comb += platform.request("user_led", 0).eq(ddr4_phy.calib_done.status)
@@ -89,15 +181,52 @@ class DDR4TestSoC(SoCSDRAM):
             self.submodules.analyzer = LiteScopeAnalyzer(analyzer_signals, 512, csr_csv="analyzer.csv")
             self.add_csr("analyzer")
 
+            # Segmented DFI capture (back-to-back triggered segments, burst upload over Wishbone)
+            self.submodules.segments = SegmentedCapture(dfi_capture_fields(ddr4_phy),
+                depth     = 64,
+                nsegments = 16,
+                csr_csv   = "segments.csv")
+            self.add_csr("segments")
+            self.register_mem("segments", self.mem_map["segments"], self.segments.bus,
+                self.segments.size)
+
 # Build --------------------------------------------------------------------------------------------
 
 def main():
-    if "load" in sys.argv[1:]:
+    parser = argparse.ArgumentParser(description="LiteDRAM DDR4 MIG PHY test SoC on KCU105")
+    parser.add_argument("action", nargs="?", default="build", choices=["build", "load"],
+        help="build the SoC or load the bitstream (default=build)")
+    parser.add_argument("--data-rate", default=1600,
+        help="DDR4 data rate in MT/s, must match the MIG IP (default=1600)")
+    parser.add_argument("--ui-clk-freq", default=None,
+        help="MIG UI (sys) clock frequency in Hz, must be data rate/8 (default=data rate/8)")
+    parser.add_argument("--read-latency", default=None,
+        help="PHY read latency in sys_clk cycles, at least the measured rd_latency + 2 "
+             "(default=CL + 10)")
+    parser.add_argument("--l2-size", default=8192, help="L2 cache size in bytes (default=8192)")
+    parser.add_argument("--l2-line-words", default=1,
+        help="L2 cache line size in native port words (64 bytes) (default=1)")
+    parser.add_argument("--l2-ways", default=1, help="L2 cache associativity (default=1)")
+    parser.add_argument("--l2-write-through", action="store_true",
+        help="L2 cache write-through (default=write-back)")
+    parser.add_argument("--axi-ports", default=0,
+        help="number of QoS arbitrated AXI4 slave ports (default=0)")
+    args = parser.parse_args()
+
+    if args.action == "load":
         from litex.build.xilinx import VivadoProgrammer
         prog = VivadoProgrammer()
         prog.load_bitstream("build/gateware/top.bit")
     else:
-        soc = DDR4TestSoC()
+        soc = DDR4TestSoC(
+            data_rate     = int(args.data_rate),
+            sys_clk_freq  = None if args.ui_clk_freq is None else int(float(args.ui_clk_freq)),
+            read_latency  = None if args.read_latency is None else int(args.read_latency),
+            l2_size       = int(args.l2_size),
+            l2_line_words = int(args.l2_line_words),
+            l2_ways       = int(args.l2_ways),
+            l2_write_back = not args.l2_write_through,
+            axi_ports     = int(args.axi_ports))
         builder = Builder(soc, output_dir="build", csr_csv="csr.csv", compile_gateware=True)
         vns = builder.build()
 
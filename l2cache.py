@@ -0,0 +1,277 @@
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+from functools import reduce
+from operator import or_
+
+from migen import *
+
+from litex.soc.interconnect.csr import *
+
+# L2 Cache -----------------------------------------------------------------------------------------
+
+class L2Cache(Module, AutoCSR):
+    """Set-associative L2 cache between a 32-bit Wishbone master and a LiteDRAM native port
+
+    size bytes in nways ways of lines of line_words native port words: line fills (and write-backs)
+    are bursts of line_words pipelined port accesses. Replacement: first invalid way, else
+    round-robin per set.
+    - write_back=True:  writes allocate and dirty lines are written back on eviction.
+    - write_back=False: write-through, writes update the line on a hit and are always forwarded
+                        to the port (byte enables), write misses do not allocate.
+    Accesses from other ports (DMA, BIST) are not snooped: accesses to the same DRAM regions must
+    be coordinated by the host. hits/misses (lookups) and writebacks (dirty lines evicted) are
+    counted in CSRs, cleared with clear.
+    """
+    def __init__(self, master, port, size=8192, line_words=1, nways=1, write_back=True):
+        data_width = port.data_width
+        ratio      = data_width//32
+        nlines     = size//(data_width//8*line_words)
+        nsets      = nlines//nways
+        assert ratio >= 1 and nsets >= 1
+        assert line_words == 2**log2_int(line_words)
+        assert nways      == 2**log2_int(nways)
+        assert nsets      == 2**log2_int(nsets)
+        obits = log2_int(ratio)
+        lbits = log2_int(line_words)
+        sbits = log2_int(nsets)
+        tbits = port.address_width - lbits - sbits
+        assert tbits > 0
+        self.master     = master
+        self.port       = port
+        self.size       = size
+        self.line_words = line_words
+        self.nways      = nways
+        self.write_back = write_back
+
+        self.clear      = CSR()
+        self.hits       = CSRStatus(32)
+        self.misses     = CSRStatus(32)
+        self.writebacks = CSRStatus(32)
+
+        # # #
+
+        # Address decoding (master: 32-bit words, port: native port words) ------------------------
+        offset = Signal(max=max(ratio, 2))
+        lword  = Signal(max=max(line_words, 2))
+        index  = Signal(max=max(nsets, 2))
+        tag    = Signal(tbits)
+        self.comb += [
+            offset.eq(master.adr[:obits] if obits else 0),
+            lword.eq(master.adr[obits:obits + lbits] if lbits else 0),
+            index.eq(master.adr[obits + lbits:obits + lbits + sbits] if sbits else 0),
+            tag.eq(master.adr[obits + lbits + sbits:obits + port.address_width]),
+        ]
+
+        def line_adr(word):
+            return Cat(*([word[:lbits]] if lbits else []), *([index] if sbits else []), 0)
+
+        def port_adr(word, tag):
+            return Cat(*([word[:lbits]] if lbits else []), *([index] if sbits else []), tag)
+
+        # Memories (data, tags: tag/valid/dirty, round-robin pointer) -----------------------------
+        data_adr  = Signal(max=max(nsets*line_words, 2))
+        data_dat  = Signal(data_width)
+        datas     = []
+        tags      = []
+        for w in range(nways):
+            data     = Memory(data_width, nsets*line_words)
+            data_port = data.get_port(write_capable=True, we_granularity=8)
+            tag_mem  = Memory(tbits + 2, nsets)
+            tag_port = tag_mem.get_port(write_capable=True)
+            self.specials += data, data_port, tag_mem, tag_port
+            self.comb += [
+                data_port.adr.eq(data_adr),
+                data_port.dat_w.eq(data_dat),
+                tag_port.adr.eq(index),
+            ]
+            datas.append(data_port)
+            tags.append(tag_port)
+        tag_valid = [t.dat_r[tbits]     for t in tags]
+        tag_dirty = [t.dat_r[tbits + 1] for t in tags]
+        tag_hit   = [v & (t.dat_r[:tbits] == tag) for t, v in zip(tags, tag_valid)]
+
+        # Lookup -----------------------------------------------------------------------------------
+        hit     = Signal()
+        hit_way = Signal(max=max(nways, 2))
+        victim  = Signal(max=max(nways, 2))
+        rr      = Signal(max=max(nways, 2))
+        self.comb += hit.eq(reduce(or_, tag_hit))
+        for w in reversed(range(nways)):
+            self.comb += If(tag_hit[w], hit_way.eq(w))
+        if nways > 1:
+            rr_mem  = Memory(log2_int(nways), nsets)
+            rr_port = rr_mem.get_port(write_capable=True)
+            self.specials += rr_mem, rr_port
+            self.comb += [
+                rr_port.adr.eq(index),
+                rr.eq(rr_port.dat_r),
+                victim.eq(rr),
+            ]
+            for w in reversed(range(nways)):
+                self.comb += If(~tag_valid[w], victim.eq(w))
+
+        # Miss handling state (victim way, its tag, line burst counters)
+        way        = Signal(max=max(nways, 2))
+        way_tag    = Signal(tbits)
+        cmd_count  = Signal(lbits + 1)
+        data_count = Signal(lbits + 1)
+        refilled   = Signal()
+        evict      = Signal()
+        if write_back:
+            self.comb += evict.eq(Array(tag_valid)[victim] & Array(tag_dirty)[victim])
+
+        # Wishbone data ----------------------------------------------------------------------------
+        rdata      = Signal(data_width)
+        evict_data = Signal(data_width)
+        self.comb += [
+            rdata.eq(Array(datas[w].dat_r for w in range(nways))[hit_way]),
+            evict_data.eq(Array(datas[w].dat_r for w in range(nways))[way]),
+            master.dat_r.eq(Array(rdata[32*i:32*(i + 1)] for i in range(ratio))[offset]),
+            master.err.eq(0),
+        ]
+        wdata = Replicate(master.dat_w, ratio)
+        wmask = Signal(data_width//8)
+        self.comb += wmask.eq(master.sel << Cat(Replicate(0, 2), offset))
+
+        # Counters ---------------------------------------------------------------------------------
+        hits_inc       = Signal()
+        misses_inc     = Signal()
+        writebacks_inc = Signal()
+        for counter, inc in [(self.hits, hits_inc), (self.misses, misses_inc),
+                             (self.writebacks, writebacks_inc)]:
+            self.sync += [
+                If(self.clear.re,
+                    counter.status.eq(0)
+                ).Elif(inc,
+                    counter.status.eq(counter.status + 1)
+                )
+            ]
+
+        # FSM --------------------------------------------------------------------------------------
+        self.submodules.fsm = fsm = FSM(reset_state="IDLE")
+        self.comb += [
+            data_adr.eq(line_adr(lword)),
+            data_dat.eq(wdata),
+        ]
+        fsm.act("IDLE",
+            If(master.cyc & master.stb,
+                NextState("TEST")
+            )
+        )
+        hit_write = [If(hit_way == w, datas[w].we.eq(wmask)) for w in range(nways)]
+        if write_back:
+            hit_write += [If(hit_way == w,
+                tags[w].we.eq(1),
+                tags[w].dat_w.eq(Cat(tag, 1, 1))
+            ) for w in range(nways)]
+            hit_ack   = 1
+            hit_next  = []
+            miss_next = If(evict,
+                NextState("EVICT-PREPARE")
+            ).Else(
+                NextState("REFILL")
+            )
+        else:
+            hit_ack   = ~master.we
+            hit_next  = [If(master.we, NextState("WRITE-THROUGH"))]
+            miss_next = If(master.we,
+                NextState("WRITE-THROUGH")
+            ).Else(
+                NextState("REFILL")
+            )
+        fsm.act("TEST",
+            NextValue(way, victim),
+            NextValue(way_tag, Array(t.dat_r[:tbits] for t in tags)[victim]),
+            NextValue(cmd_count, 0),
+            NextValue(data_count, 0),
+            If(hit,
+                hits_inc.eq(~refilled),
+                If(master.we,
+                    *hit_write
+                ),
+                If(hit_ack,
+                    master.ack.eq(1),
+                    NextValue(refilled, 0),
+                    NextState("IDLE")
+                ),
+                *hit_next
+            ).Else(
+                misses_inc.eq(1),
+                NextValue(refilled, 1),
+                miss_next
+            )
+        )
+        # Write-back of the victim line: port commands and data (read ahead from the memory) are
+        # issued in parallel.
+        fsm.act("EVICT-PREPARE",
+            data_adr.eq(line_adr(Constant(0, lbits + 1))),
+            NextState("EVICT")
+        )
+        fsm.act("EVICT",
+            port.cmd.valid.eq(cmd_count != line_words),
+            port.cmd.we.eq(1),
+            port.cmd.addr.eq(port_adr(cmd_count, way_tag)),
+            port.wdata.valid.eq(data_count != line_words),
+            port.wdata.data.eq(evict_data),
+            port.wdata.we.eq(2**len(port.wdata.we) - 1),
+            If(port.cmd.valid & port.cmd.ready,
+                NextValue(cmd_count, cmd_count + 1)
+            ),
+            If(port.wdata.valid & port.wdata.ready,
+                data_adr.eq(line_adr(data_count + 1)),
+                NextValue(data_count, data_count + 1)
+            ).Else(
+                data_adr.eq(line_adr(data_count))
+            ),
+            If((cmd_count == line_words) & (data_count == line_words),
+                writebacks_inc.eq(1),
+                NextValue(cmd_count, 0),
+                NextValue(data_count, 0),
+                NextState("REFILL")
+            )
+        )
+        # Line fill: read commands issued back-to-back, read data written to the victim way.
+        fsm.act("REFILL",
+            port.cmd.valid.eq(cmd_count != line_words),
+            port.cmd.we.eq(0),
+            port.cmd.addr.eq(port_adr(cmd_count, tag)),
+            port.rdata.ready.eq(1),
+            data_adr.eq(line_adr(data_count)),
+            data_dat.eq(port.rdata.data),
+            If(port.cmd.valid & port.cmd.ready,
+                NextValue(cmd_count, cmd_count + 1)
+            ),
+            If(port.rdata.valid,
+                *[If(way == w, datas[w].we.eq(2**len(datas[w].we) - 1)) for w in range(nways)],
+                NextValue(data_count, data_count + 1),
+                If(data_count == (line_words - 1),
+                    *[If(way == w,
+                        tags[w].we.eq(1),
+                        tags[w].dat_w.eq(Cat(tag, 1, 0))
+                    ) for w in range(nways)],
+                    *([rr_port.we.eq(1), rr_port.dat_w.eq(way + 1)] if nways > 1 else []),
+                    NextState("LOOKUP")
+                )
+            )
+        )
+        fsm.act("LOOKUP",
+            NextState("TEST")
+        )
+        # Write-through (single port word with byte enables), acked when the data is accepted.
+        fsm.act("WRITE-THROUGH",
+            port.cmd.valid.eq(cmd_count == 0),
+            port.cmd.we.eq(1),
+            port.cmd.addr.eq(port_adr(lword, tag)),
+            port.wdata.valid.eq(1),
+            port.wdata.data.eq(wdata),
+            port.wdata.we.eq(wmask),
+            If(port.cmd.valid & port.cmd.ready,
+                NextValue(cmd_count, 1)
+            ),
+            If(port.wdata.valid & port.wdata.ready,
+                master.ack.eq(1),
+                NextValue(refilled, 0),
+                NextState("IDLE")
+            )
+        )
@@ -0,0 +1,122 @@
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+from migen import *
+from migen.genlib.fifo import SyncFIFO
+
+from litex.soc.interconnect.csr import *
+
+from litedram.common import LiteDRAMNativePort
+
+# Latency Histogram --------------------------------------------------------------------------------
+
+class LatencyHistogram(Module, AutoCSR):
+    """Read latency histogram of a LiteDRAM native port
+
+    Inserted between a port and the requester (self.port): read commands are timestamped when
+    accepted by the port and the latency (in sys_clk cycles) is measured when the read data is
+    returned (in order) to the requester. Latencies are binned in nbins bins of 2**bin_shift cycles
+    (last bin: all latencies above), count/sum/min/max are also measured (mean = sum/count).
+
+    Up to depth reads can be outstanding, read commands are stalled above. Statistics are cleared
+    with the reset CSR and are not saturated (32-bit bins/count).
+    """
+    def __init__(self, port, nbins=64, bin_shift=2, depth=32):
+        self.port  = LiteDRAMNativePort(
+            mode          = port.mode,
+            address_width = port.address_width,
+            data_width    = port.data_width,
+            clock_domain  = port.clock_domain,
+            id            = port.id)
+        self.nbins     = nbins
+        self.bin_shift = bin_shift
+
+        self.reset = CSR()
+        self.count = CSRStatus(32)
+        self.sum   = CSRStatus(64)
+        self.min   = CSRStatus(32, reset=2**32-1)
+        self.max   = CSRStatus(32)
+        for n in range(nbins):
+            setattr(self, "bin{}".format(n), CSRStatus(32, name="bin{}".format(n)))
+
+        # # #
+
+        # Timestamp read commands ------------------------------------------------------------------
+        timer      = Signal(32)
+        timestamps = SyncFIFO(len(timer), depth)
+        self.submodules += timestamps
+        stall = ~self.port.cmd.we & ~timestamps.writable
+        self.sync += timer.eq(timer + 1)
+        self.comb += [
+            self.port.cmd.connect(port.cmd, omit={"valid", "ready"}),
+            port.cmd.valid.eq(self.port.cmd.valid & ~stall),
+            self.port.cmd.ready.eq(port.cmd.ready & ~stall),
+            self.port.wdata.connect(port.wdata),
+            port.rdata.connect(self.port.rdata),
+            port.flush.eq(self.port.flush),
+            self.port.lock.eq(port.lock),
+
+            timestamps.we.eq(port.cmd.valid & port.cmd.ready & ~port.cmd.we),
+            timestamps.din.eq(timer),
+            timestamps.re.eq(port.rdata.valid & port.rdata.ready),
+        ]
+
+        # Measure latency (registered) -------------------------------------------------------------
+        latency       = Signal(32)
+        latency_valid = Signal()
+        self.sync += [
+            latency_valid.eq(port.rdata.valid & port.rdata.ready),
+            latency.eq(timer - timestamps.dout),
+        ]
+
+        # Statistics -------------------------------------------------------------------------------
+        bins   = Array(getattr(self, "bin{}".format(n)).status for n in range(nbins))
+        bin_id = Signal(max=nbins)
+        self.comb += [
+            If(latency[bin_shift:] >= (nbins - 1),
+                bin_id.eq(nbins - 1)
+            ).Else(
+                bin_id.eq(latency[bin_shift:])
+            )
+        ]
+        self.sync += [
+            If(self.reset.re,
+                self.count.status.eq(0),
+                self.sum.status.eq(0),
+                self.min.status.eq(2**32-1),
+                self.max.status.eq(0),
+                [b.eq(0) for b in bins]
+            ).Elif(latency_valid,
+                self.count.status.eq(self.count.status + 1),
+                self.sum.status.eq(self.sum.status + latency),
+                If(latency < self.min.status,
+                    self.min.status.eq(latency)
+                ),
+                If(latency > self.max.status,
+                    self.max.status.eq(latency)
+                ),
+                bins[bin_id].eq(bins[bin_id] + 1)
+            )
+        ]
+
+# Host ---------------------------------------------------------------------------------------------
+
+def histogram_stats(bins, bin_shift, count, total, minimum, maximum, percentiles=[50, 90, 99]):
+    """Statistics of a LatencyHistogram readout (in cycles), percentiles are given as the upper
+    bound of the bin they fall in (max for the last bin). Without latencies (count = 0), stats are
+    zeros (min/max CSRs are not meaningful), without bins percentiles are zeros."""
+    if count == 0:
+        minimum, maximum = 0, 0
+    stats = {"count": count, "min": minimum, "max": maximum, "mean": total/count if count else 0}
+    if count == 0 or len(bins) == 0:
+        stats.update({"p{}".format(percentile): 0 for percentile in percentiles})
+        return stats
+    for percentile in percentiles:
+        cumulated = 0
+        for n, b in enumerate(bins):
+            cumulated += b
+            if 100*cumulated >= percentile*count:
+                break
+        upper = maximum if n == len(bins) - 1 else min((n + 1)*2**bin_shift - 1, maximum)
+        stats["p{}".format(percentile)] = upper
+    return stats
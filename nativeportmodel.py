@@ -0,0 +1,81 @@
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+import random
+
+from migen.sim import passive
+
+# Native Port Memory Model -------------------------------------------------------------------------
+
+@passive
+def port_memory(port, mem, stats=None, latency=8, ready=1.0, wdata_ready=1.0, ordered=False,
+    geom=None, seed=42):
+    """LiteDRAM native port model with memory (byte enables), for Migen simulations
+
+    Random cmd.ready (ready) and wdata.ready (wdata_ready), read data returned latency cycles after
+    the command, write data consumed in order. With ordered, accesses are executed in command order:
+    read data is returned after the write data of the previous writes and with the memory content
+    at the time of the command.
+
+    stats (optional) counts the commands (reads, writes), and if present in stats: turnarounds
+    (direction changes) and row_switches (access to a bank with another row than the previous
+    access to this bank, geom: (colbits, bankbits) of ROW_BANK_COL addresses).
+    """
+    prng    = random.Random(seed)
+    reads   = []
+    writes  = []
+    history = {}
+    cycle   = 0
+    wseq    = 0
+    last_we = None
+    rows    = {}
+
+    def count(name):
+        if stats is not None and name in stats:
+            stats[name] += 1
+
+    def value(addr, seq):
+        if not ordered:
+            return mem.get(addr, 0)
+        return ([0] + [v for s, v in history.get(addr, []) if s < seq])[-1]
+
+    while True:
+        rdata_valid = len(reads) > 0 and reads[0][0] <= cycle
+        if ordered and rdata_valid:
+            rdata_valid = len(writes) == 0 or writes[0][1] >= reads[0][2]
+        yield port.cmd.ready.eq(prng.random() < ready)
+        yield port.rdata.valid.eq(rdata_valid)
+        yield port.rdata.data.eq(value(*reads[0][1:]) if rdata_valid else 0)
+        yield port.wdata.ready.eq(len(writes) > 0 and (wdata_ready >= 1.0 or
+            prng.random() < wdata_ready))
+        yield
+        cycle += 1
+        if (yield port.cmd.valid) and (yield port.cmd.ready):
+            addr = (yield port.cmd.addr)
+            we   = (yield port.cmd.we)
+            if we:
+                writes.append((addr, wseq))
+                wseq += 1
+            else:
+                reads.append((cycle + latency, addr, wseq))
+            count("writes" if we else "reads")
+            if last_we is not None and we != last_we:
+                count("turnarounds")
+            last_we = we
+            if geom is not None:
+                colbits, bankbits = geom
+                bank, row = (addr >> colbits) % 2**bankbits, addr >> (colbits + bankbits)
+                if rows.get(bank, row) != row:
+                    count("row_switches")
+                rows[bank] = row
+        if (yield port.rdata.valid) and (yield port.rdata.ready):
+            reads.pop(0)
+        if (yield port.wdata.valid) and (yield port.wdata.ready):
+            addr, seq = writes.pop(0)
+            we   = (yield port.wdata.we)
+            data = (yield port.wdata.data)
+            for i in range(len(port.wdata.we)):
+                if we & (1 << i):
+                    mask = 0xff << 8*i
+                    mem[addr] = (mem.get(addr, 0) & ~mask) | (data & mask)
+            history.setdefault(addr, []).append((seq, mem.get(addr, 0)))
@@ -0,0 +1,191 @@
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+from migen import *
+from migen.genlib.fifo import SyncFIFO
+
+from litex.soc.interconnect.csr import *
+from litex.soc.interconnect.axi import AXIInterface
+
+from litedram.common import LiteDRAMNativePort
+from litedram.frontend.axi import LiteDRAMAXI2Native
+
+# QoS Arbiter --------------------------------------------------------------------------------------
+
+class QoSArbiter(Module, AutoCSR):
+    """Priority arbiter of nports native ports (self.ports) on a LiteDRAM native port
+
+    Commands are granted to the requesting port with the highest priority (port<n>_priority, ties
+    are served round-robin), ports with port<n>_max_outstanding accesses in flight (commands not
+    yet completed by their read/write data) are not eligible, so a port can't fill the controller
+    queues. Read/write data are routed back in command order.
+
+    Per port counters (cleared with clear): reads/writes (native port words transferred, bandwidth
+    = words*port bytes/cycles) and stalls (cycles with a command waiting).
+    """
+    def __init__(self, port, nports=4, max_outstanding=16):
+        self.port  = port
+        self.ports = ports = [LiteDRAMNativePort("both", port.address_width, port.data_width)
+            for n in range(nports)]
+
+        self.clear = CSR()
+        for n in range(nports):
+            prefix = "port{}_".format(n)
+            csrs   = [
+                CSRStorage(4, name=prefix + "priority"),
+                CSRStorage(bits_for(max_outstanding), reset=max_outstanding,
+                    name=prefix + "max_outstanding"),
+                CSRStatus(32, name=prefix + "reads"),
+                CSRStatus(32, name=prefix + "writes"),
+                CSRStatus(32, name=prefix + "stalls"),
+            ]
+            for csr in csrs:
+                setattr(self, csr.name, csr)
+
+        # # #
+
+        priority = [getattr(self, "port{}_priority".format(n)).storage for n in range(nports)]
+        limit    = [getattr(self, "port{}_max_outstanding".format(n)).storage for n in range(nports)]
+
+        # Data routing FIFOs (port of each read/write command in flight) ---------------------------
+        fifo_depth = nports*max_outstanding
+        rd_fifo = SyncFIFO(max(bits_for(nports - 1), 1), fifo_depth)
+        wr_fifo = SyncFIFO(max(bits_for(nports - 1), 1), fifo_depth)
+        self.submodules += rd_fifo, wr_fifo
+
+        # Eligible ports ---------------------------------------------------------------------------
+        outstanding = [Signal(max=max_outstanding + 1) for n in range(nports)]
+        eligible    = Signal(nports)
+        for n in range(nports):
+            self.comb += eligible[n].eq(ports[n].cmd.valid &
+                (outstanding[n] < limit[n]) &
+                rd_fifo.writable & wr_fifo.writable)
+
+        # Arbitration: highest priority, then first port after the last granted one ---------------
+        last     = Signal(max=max(nports, 2))
+        selected = Signal(max=max(nports, 2))
+        found    = Signal()
+        best     = Signal(max=max(nports, 2))
+        best_key = Signal(bits_for(nports) + 4)
+        keys     = []
+        for n in range(nports):
+            # Round-robin rank: ports after the last granted one are preferred.
+            rr  = Signal(bits_for(nports))
+            key = Signal(bits_for(nports) + 4)
+            self.comb += [
+                If(last < n,
+                    rr.eq(nports - n + last)
+                ).Else(
+                    rr.eq(last - n)
+                ),
+                key.eq(Cat(rr, priority[n])),
+            ]
+            keys.append(key)
+        # Comparator chain.
+        chain = [(Constant(0), Constant(0, len(best_key)), Constant(0))]
+        for n in range(nports):
+            prev_found, prev_key, prev_best = chain[-1]
+            take      = Signal()
+            new_found = Signal()
+            new_key   = Signal(len(best_key))
+            new_best  = Signal(max=max(nports, 2))
+            self.comb += [
+                take.eq(eligible[n] & (~prev_found | (keys[n] > prev_key))),
+                new_found.eq(prev_found | eligible[n]),
+                new_key.eq(Mux(take, keys[n], prev_key)),
+                new_best.eq(Mux(take, n, prev_best)),
+            ]
+            chain.append((new_found, new_key, new_best))
+        self.comb += [
+            found.eq(chain[-1][0]),
+            best_key.eq(chain[-1][1]),
+            best.eq(chain[-1][2]),
+        ]
+
+        # Grant is held while the command waits (stable command stream).
+        locked = Signal()
+        grant  = Signal(max=max(nports, 2))
+        self.comb += [
+            selected.eq(Mux(locked, grant, best)),
+            port.cmd.valid.eq(Mux(locked, 1, found)),
+            port.cmd.we.eq(Array(p.cmd.we for p in ports)[selected]),
+            port.cmd.addr.eq(Array(p.cmd.addr for p in ports)[selected]),
+            port.cmd.last.eq(1),
+        ]
+        for n in range(nports):
+            self.comb += ports[n].cmd.ready.eq(port.cmd.valid & port.cmd.ready & (selected == n))
+        cmd_done = Signal()
+        self.comb += cmd_done.eq(port.cmd.valid & port.cmd.ready)
+        self.sync += [
+            locked.eq(port.cmd.valid & ~port.cmd.ready),
+            If(port.cmd.valid,
+                grant.eq(selected)
+            ),
+            If(cmd_done,
+                last.eq(selected)
+            )
+        ]
+        self.comb += [
+            rd_fifo.we.eq(cmd_done & ~port.cmd.we),
+            rd_fifo.din.eq(selected),
+            wr_fifo.we.eq(cmd_done & port.cmd.we),
+            wr_fifo.din.eq(selected),
+        ]
+
+        # Write data -------------------------------------------------------------------------------
+        wr_port = wr_fifo.dout
+        self.comb += [
+            port.wdata.valid.eq(wr_fifo.readable & Array(p.wdata.valid for p in ports)[wr_port]),
+            port.wdata.data.eq(Array(p.wdata.data for p in ports)[wr_port]),
+            port.wdata.we.eq(Array(p.wdata.we for p in ports)[wr_port]),
+            wr_fifo.re.eq(port.wdata.valid & port.wdata.ready),
+        ]
+        for n in range(nports):
+            self.comb += ports[n].wdata.ready.eq(wr_fifo.readable & (wr_port == n) & port.wdata.ready)
+
+        # Read data --------------------------------------------------------------------------------
+        rd_port = rd_fifo.dout
+        self.comb += [
+            port.rdata.ready.eq(rd_fifo.readable & Array(p.rdata.ready for p in ports)[rd_port]),
+            rd_fifo.re.eq(port.rdata.valid & port.rdata.ready),
+        ]
+        for n in range(nports):
+            self.comb += [
+                ports[n].rdata.valid.eq(rd_fifo.readable & (rd_port == n) & port.rdata.valid),
+                ports[n].rdata.data.eq(port.rdata.data),
+            ]
+
+        # Outstanding accesses / Counters ----------------------------------------------------------
+        for n in range(nports):
+            issued    = ports[n].cmd.valid & ports[n].cmd.ready
+            completed = ((ports[n].rdata.valid & ports[n].rdata.ready) |
+                         (ports[n].wdata.valid & ports[n].wdata.ready))
+            self.sync += outstanding[n].eq(outstanding[n] + issued - completed)
+            for name, inc in [
+                ("reads",  ports[n].rdata.valid & ports[n].rdata.ready),
+                ("writes", ports[n].wdata.valid & ports[n].wdata.ready),
+                ("stalls", ports[n].cmd.valid & ~ports[n].cmd.ready)]:
+                counter = getattr(self, "port{}_{}".format(n, name)).status
+                self.sync += [
+                    If(self.clear.re,
+                        counter.eq(0)
+                    ).Elif(inc,
+                        counter.eq(counter + 1)
+                    )
+                ]
+
+# AXI QoS Frontend ---------------------------------------------------------------------------------
+
+class AXIQoSFrontend(Module, AutoCSR):
+    """nports AXI4 slave ports (self.axi) on a LiteDRAM native port with QoS arbitration
+
+    Each AXI port is converted to a native port (LiteDRAMAXI2Native) arbitrated by a QoSArbiter
+    (priority, outstanding limit and bandwidth counters per port).
+    """
+    def __init__(self, port, nports=4, max_outstanding=16, base_address=0x00000000, id_width=4):
+        self.submodules.arbiter = arbiter = QoSArbiter(port, nports, max_outstanding)
+        self.axi = []
+        for n in range(nports):
+            axi = AXIInterface(data_width=port.data_width, address_width=32, id_width=id_width)
+            self.submodules += LiteDRAMAXI2Native(axi, arbiter.ports[n], base_address=base_address)
+            self.axi.append(axi)
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+# Parallel regression of simulated USDDR4MIGPHY configurations (LiteDRAM + MIG PHY-only model).
+# ./regression.py
+# ./regression.py --databits=16 --data-rates=1600,2400 --jobs=8 --report=regression.json
+
+import os
+import sys
+import csv
+import json
+import time
+import random
+import argparse
+import functools
+import itertools
+import traceback
+import multiprocessing
+
+from migen import *
+from migen.sim import passive
+
+from litedram.modules import EDY4016A
+
+from usddr4migphy import get_ddr4_cl_cwl
+from bench_usddr4migphy import BenchSoC, phases_configs, new_stats, wait_calibration
+from bench_usddr4migphy import access_generator, data_monitor
+
+# Configurations -----------------------------------------------------------------------------------
+
+regression_phases_configs = dict(phases_configs)
+regression_phases_configs["rd0/3-wr0/3"] = dict(rdphase=0, rdcmdphase=3, wrphase=0, wrcmdphase=3)
+
+regression_matrix = {
+    "databits":  [16, 32, 64],
+    "data_rate": [1600, 2133, 2400],
+    "phases":    list(regression_phases_configs.keys()),
+    "nranks":    [1, 2],
+}
+
+def regression_configs(matrix):
+    keys = list(matrix.keys())
+    for values in itertools.product(*[matrix[k] for k in keys]):
+        yield dict(zip(keys, values))
+
+def config_name(config):
+    return "{}b-{}-{}-{}r".format(config["databits"], config["data_rate"], config["phases"],
+        config["nranks"])
+
+# Generators ---------------------------------------------------------------------------------------
+
+def check_generator(soc, port, datas, results, nlatency=8):
+    """Writes datas to sequential addresses and reads them back (pipelined), then measures the
+    read latency (cmd accepted to rdata, in sys_clk cycles) of nlatency isolated reads."""
+    yield from wait_calibration(soc)
+    yield port.wdata.we.eq(2**len(port.wdata.we) - 1)
+    yield port.rdata.ready.eq(1)
+
+    # Writes
+    for addr, data in enumerate(datas):
+        yield port.cmd.valid.eq(1)
+        yield port.cmd.we.eq(1)
+        yield port.cmd.addr.eq(addr)
+        yield
+        while not (yield port.cmd.ready):
+            yield
+        yield port.cmd.valid.eq(0)
+        yield port.wdata.valid.eq(1)
+        yield port.wdata.data.eq(data)
+        yield
+        while not (yield port.wdata.ready):
+            yield
+        yield port.wdata.valid.eq(0)
+
+    # Reads (pipelined), read data is collected by read_collector.
+    for addr in range(len(datas)):
+        yield port.cmd.valid.eq(1)
+        yield port.cmd.we.eq(0)
+        yield port.cmd.addr.eq(addr)
+        yield
+        while not (yield port.cmd.ready):
+            yield
+    yield port.cmd.valid.eq(0)
+    while len(results["rdata"]) < len(datas):
+        yield
+
+    # Latency (isolated reads)
+    for i in range(nlatency):
+        yield port.cmd.valid.eq(1)
+        yield port.cmd.addr.eq(i)
+        yield
+        while not (yield port.cmd.ready):
+            yield
+        yield port.cmd.valid.eq(0)
+        start = results["cycle"]
+        while len(results["rdata"]) < len(datas) + i + 1:
+            yield
+        results["latency"].append(results["rdata"][-1][0] - start)
+
+@passive
+def read_collector(port, results):
+    while True:
+        if (yield port.rdata.valid) and (yield port.rdata.ready):
+            results["rdata"].append((results["cycle"], (yield port.rdata.data)))
+        results["cycle"] += 1
+        yield
+
+@passive
+def underflow_monitor(soc, results):
+    while True:
+        for name in ["rd_underflow", "wr_underflow"]:
+            results[name] |= (yield getattr(soc.phy, name).status)
+        yield
+
+@passive
+def cycles_counter(stats):
+    while True:
+        if stats["run"]:
+            stats["cycles"] += 1
+        yield
+
+# Run ----------------------------------------------------------------------------------------------
+
+def run_config(config, n=32, seed=42):
+    """Build and run the simulation of a configuration, returns a result dict (runs in a pool
+    worker)."""
+    result = dict(name=config_name(config), **config)
+    start  = time.time()
+    try:
+        data_rate    = config["data_rate"]
+        sys_clk_freq = int(data_rate*1e6/8)
+        result["cl"], result["cwl"] = get_ddr4_cl_cwl(EDY4016A(sys_clk_freq, "1:4"), data_rate)
+        try:
+            soc_kwargs = dict(
+                databits     = config["databits"],
+                nranks       = config["nranks"],
+                data_rate    = data_rate,
+                sys_clk_freq = sys_clk_freq,
+                **regression_phases_configs[config["phases"]])
+            soc = BenchSoC(**soc_kwargs)
+        except AssertionError:
+            result["status"] = "unsupported"
+            return result
+
+        # Functional check: write/read-back and read latency.
+        prng    = random.Random(seed)
+        datas   = [prng.randrange(2**len(soc.port.wdata.data)) for _ in range(n)]
+        results = {"cycle": 0, "rdata": [], "latency": [], "rd_underflow": 0, "wr_underflow": 0}
+        run_simulation(soc, [
+            check_generator(soc, soc.port, datas, results),
+            read_collector(soc.port, results),
+            underflow_monitor(soc, results)])
+        errors = sum(data != rdata for data, (cycle, rdata) in zip(datas, results["rdata"][:n]))
+        result["errors"]       = errors
+        result["rd_underflow"] = results["rd_underflow"]
+        result["wr_underflow"] = results["wr_underflow"]
+        result["latency_min"]  = min(results["latency"])
+        result["latency_max"]  = max(results["latency"])
+        result["latency_ns"]   = 1e9*sum(results["latency"])/len(results["latency"])/sys_clk_freq
+
+        # Bandwidth: random accesses, 50% writes.
+        soc   = BenchSoC(**soc_kwargs)
+        stats = new_stats()
+        run_simulation(soc, [
+            access_generator(soc, soc.port, stats, n, write_ratio=0.5, seed=seed),
+            data_monitor(soc.port, stats),
+            cycles_counter(stats)])
+        bytes_cycle = n*len(soc.port.wdata.data)//8/stats["cycles"]
+        result["bytes_cycle"] = bytes_cycle
+        result["gbps"]        = bytes_cycle*sys_clk_freq/1e9
+
+        failed = errors or results["rd_underflow"] or results["wr_underflow"]
+        result["status"] = "fail" if failed else "pass"
+    except Exception:
+        result["status"] = "error"
+        result["error"]  = traceback.format_exc().strip().splitlines()[-1]
+    finally:
+        result["duration"] = time.time() - start
+    return result
+
+# Report -------------------------------------------------------------------------------------------
+
+report_fields = ["name", "status", "databits", "data_rate", "cl", "cwl", "phases", "nranks",
+    "errors", "rd_underflow", "wr_underflow", "latency_min", "latency_max", "latency_ns",
+    "bytes_cycle", "gbps", "duration", "error"]
+
+def format_result(result):
+    if result["status"] in ["pass", "fail"]:
+        return "{:>26s} {:>11s} {:>5d} {:>6.1f}/{:<4d} {:>8.1f} {:>8.2f} {:>7.1f}s".format(
+            result["name"], result["status"].upper(), result["errors"],
+            result["latency_ns"], result["latency_max"], result["bytes_cycle"], result["gbps"],
+            result["duration"])
+    return "{:>26s} {:>11s} {}".format(result["name"], result["status"].upper(),
+        result.get("error", ""))
+
+def write_report(filename, results):
+    if filename.endswith(".json"):
+        with open(filename, "w") as f:
+            json.dump(results, f, indent=1)
+    else:
+        with open(filename, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=report_fields, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(results)
+
+# Main ---------------------------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="USDDR4MIGPHY simulation regression")
+    parser.add_argument("--databits",   default=None, help="data widths (default=16,32,64)")
+    parser.add_argument("--data-rates", default=None, help="data rates (default=1600,2133,2400)")
+    parser.add_argument("--phases",     default=None, help="DFI phases configs (default=all)")
+    parser.add_argument("--nranks",     default=None, help="rank counts (default=1,2)")
+    parser.add_argument("--n",          default=32,   help="accesses per test (default=32)")
+    parser.add_argument("--jobs",       default=None, help="parallel jobs (default=cpu count)")
+    parser.add_argument("--report",     default="regression.csv",
+        help="report file, .csv or .json (default=regression.csv)")
+    args = parser.parse_args()
+
+    matrix = dict(regression_matrix)
+    for key, arg, cast in [("databits",  args.databits,   int),
+                           ("data_rate", args.data_rates, int),
+                           ("phases",    args.phases,     str),
+                           ("nranks",    args.nranks,     int)]:
+        if arg is not None:
+            matrix[key] = [cast(v) for v in arg.split(",")]
+    configs = list(regression_configs(matrix))
+    jobs    = os.cpu_count() if args.jobs is None else int(args.jobs)
+
+    print("Running {} configurations on {} jobs...".format(len(configs), jobs))
+    print("{:>26s} {:>11s} {:>5s} {:>11s} {:>8s} {:>8s} {:>8s}".format(
+        "CONFIG", "STATUS", "ERRS", "LAT NS/MAX", "B/CYCLE", "GB/S", "TIME"))
+    start   = time.time()
+    results = []
+    with multiprocessing.Pool(jobs) as pool:
+        for result in pool.imap_unordered(functools.partial(run_config, n=int(args.n)), configs):
+            print(format_result(result))
+            results.append(result)
+    results.sort(key=lambda r: configs.index({k: r[k] for k in matrix.keys()}))
+    write_report(args.report, results)
+
+    summary = {s: sum(r["status"] == s for r in results)
+        for s in ["pass", "fail", "error", "unsupported"]}
+    print("{pass} passed, {fail} failed, {error} errors, {unsupported} unsupported".format(**summary),
+        "in {:.1f}s, report: {}".format(time.time() - start, args.report))
+    sys.exit(int(summary["fail"] + summary["error"] > 0))
+
+if __name__ == "__main__":
+    main()
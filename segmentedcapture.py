@@ -0,0 +1,248 @@
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+from migen import *
+
+from litex.soc.interconnect.csr import *
+from litex.soc.interconnect import wishbone
+
+# Segmented Capture --------------------------------------------------------------------------------
+
+class SegmentedCapture(Module, AutoCSR):
+    """Multi-segment signal capture
+
+    Captures nsegments windows of depth samples of fields (list of (name, signal)), each window
+    on a trigger ((data & trigger_mask) == trigger_value, rising edge of the match with
+    trigger_edge) with offset samples before the trigger. Segments are captured back-to-back
+    (the next segment is armed as soon as the previous one is complete) and a timestamp (cycles
+    from start) is stored with each trigger, so intermittent events are caught without host
+    round trips between them.
+
+    The capture memory is read-only mapped on self.bus (Wishbone) to be uploaded in bursts:
+    - samples: nsegments*depth samples of words_per_sample 32-bit words (LSB word first),
+      segment n at sample n*depth, stored circularly (see trigger position).
+    - info (after samples): 2 words per segment: timestamp, trigger position in the segment.
+    The fields layout is exported at the end of the build to csr_csv (LiteScope-like csv).
+    """
+    def __init__(self, fields, depth=64, nsegments=16, csr_csv="segments.csv"):
+        assert depth == 2**log2_int(depth) and nsegments == 2**log2_int(nsegments)
+        self.fields     = fields
+        self.depth      = depth
+        self.nsegments  = nsegments
+        self.data_width = data_width = sum(len(s) for name, s in fields)
+        self.words      = words = 2**log2_int(-(-data_width//32), need_pow2=False)
+        self.csr_csv    = csr_csv
+        self.bus        = bus = wishbone.Interface()
+        self.size       = 4*(nsegments*depth*words + 2*nsegments) # bytes
+
+        self.start         = CSR()
+        self.done          = CSRStatus()
+        self.offset        = CSRStorage(log2_int(depth))
+        self.length        = CSRStorage(bits_for(nsegments), reset=nsegments)
+        self.count         = CSRStatus(bits_for(nsegments))
+        self.trigger_mask  = CSRStorage(data_width)
+        self.trigger_value = CSRStorage(data_width)
+        self.trigger_edge  = CSRStorage()
+
+        # # #
+
+        # Sampling/Trigger -------------------------------------------------------------------------
+        data    = Signal(data_width)
+        match   = Signal()
+        match_d = Signal()
+        hit     = Signal()
+        timer   = Signal(32)
+        self.sync += [
+            data.eq(Cat(*[s for name, s in fields])),
+            match_d.eq(match),
+            If(self.start.re,
+                timer.eq(0)
+            ).Else(
+                timer.eq(timer + 1)
+            )
+        ]
+        self.comb += [
+            match.eq((data & self.trigger_mask.storage) == self.trigger_value.storage),
+            hit.eq(match & (~self.trigger_edge.storage | ~match_d)),
+        ]
+
+        # Memories ---------------------------------------------------------------------------------
+        samples = Memory(32*words, nsegments*depth)
+        info    = Memory(64, nsegments)
+        samples_wr = samples.get_port(write_capable=True)
+        samples_rd = samples.get_port()
+        info_wr    = info.get_port(write_capable=True)
+        info_rd    = info.get_port()
+        self.specials += samples, info, samples_wr, samples_rd, info_wr, info_rd
+
+        # Capture ----------------------------------------------------------------------------------
+        segment   = Signal(bits_for(nsegments))
+        wp        = Signal(log2_int(depth))
+        count     = Signal(log2_int(depth) + 1)
+        post      = Signal(log2_int(depth) + 1)
+        tp        = Signal(log2_int(depth))
+        timestamp = Signal(32)
+        self.comb += [
+            samples_wr.adr.eq(Cat(wp, segment[:log2_int(nsegments)] if nsegments > 1 else [])),
+            samples_wr.dat_w.eq(data),
+            info_wr.adr.eq(segment),
+            info_wr.dat_w.eq(Cat(timestamp, tp)),
+            self.count.status.eq(segment),
+        ]
+
+        fsm = FSM(reset_state="IDLE")
+        self.submodules += fsm
+        fsm.act("IDLE",
+            self.done.status.eq(1),
+            If(self.start.re,
+                NextValue(segment, 0),
+                NextValue(wp, 0),
+                NextValue(count, 0),
+                NextState("PRE")
+            )
+        )
+        fsm.act("PRE",
+            samples_wr.we.eq(1),
+            NextValue(wp, wp + 1),
+            If(count != self.offset.storage,
+                NextValue(count, count + 1)
+            ).Elif(hit,
+                NextValue(tp, wp),
+                NextValue(timestamp, timer),
+                NextValue(post, depth - 1 - self.offset.storage),
+                If(self.offset.storage == (depth - 1),
+                    NextState("NEXT")
+                ).Else(
+                    NextState("POST")
+                )
+            )
+        )
+        fsm.act("POST",
+            samples_wr.we.eq(1),
+            NextValue(wp, wp + 1),
+            NextValue(post, post - 1),
+            If(post == 1,
+                NextState("NEXT")
+            )
+        )
+        fsm.act("NEXT",
+            info_wr.we.eq(1),
+            NextValue(segment, segment + 1),
+            NextValue(wp, 0),
+            NextValue(count, 0),
+            If(segment == (self.length.storage - 1),
+                NextState("IDLE")
+            ).Else(
+                NextState("PRE")
+            )
+        )
+
+        # Wishbone (read-only) ---------------------------------------------------------------------
+        samples_words = nsegments*depth*words
+        word      = Signal(max=max(words, 2))
+        info_word = Signal()
+        sel       = Signal()
+        self.comb += [
+            samples_rd.adr.eq(bus.adr[log2_int(words):]),
+            info_rd.adr.eq(bus.adr[1:]),
+        ]
+        self.sync += [
+            word.eq(bus.adr[:log2_int(words)] if words > 1 else 0),
+            info_word.eq(bus.adr[0]),
+            sel.eq(bus.adr[log2_int(samples_words)]),
+            bus.ack.eq(bus.cyc & bus.stb & ~bus.ack),
+        ]
+        self.comb += [
+            If(sel,
+                bus.dat_r.eq(Mux(info_word, info_rd.dat_r[32:], info_rd.dat_r[:32]))
+            ).Else(
+                bus.dat_r.eq(Array(samples_rd.dat_r[32*i:32*(i + 1)] for i in range(words))[word])
+            )
+        ]
+
+    def export_csv(self, filename):
+        r  = "config,None,data_width,{}\n".format(self.data_width)
+        r += "config,None,depth,{}\n".format(self.depth)
+        r += "config,None,nsegments,{}\n".format(self.nsegments)
+        r += "config,None,words,{}\n".format(self.words)
+        for name, s in self.fields:
+            r += "signal,0,{},{}\n".format(name, len(s))
+        with open(filename, "w") as f:
+            f.write(r)
+
+    def do_exit(self, vns):
+        if self.csr_csv is not None:
+            self.export_csv(self.csr_csv)
+
+# Driver -------------------------------------------------------------------------------------------
+
+class SegmentedCaptureDriver:
+    """Host driver of a SegmentedCapture (RemoteClient + BatchClient)"""
+    def __init__(self, wb, bus, name, csr_csv="segments.csv"):
+        self.wb     = wb
+        self.bus    = bus
+        self.name   = name
+        self.fields = []
+        self.config = {}
+        with open(csr_csv) as f:
+            for line in f.readlines():
+                t, group, key, value = line.strip().split(",")
+                if t == "config":
+                    self.config[key] = int(value)
+                else:
+                    self.fields.append((key, int(value)))
+        self.base = getattr(wb.mems, name).base
+
+    def reg(self, name):
+        return getattr(self.wb.regs, self.name + "_" + name)
+
+    def encode(self, cond):
+        mask, value, shift = 0, 0, 0
+        for name, width in self.fields:
+            if name in cond:
+                mask  |= (2**width - 1) << shift
+                value |= cond[name] << shift
+            shift += width
+        return mask, value
+
+    def decode(self, data):
+        sample = {}
+        for name, width in self.fields:
+            sample[name] = data & (2**width - 1)
+            data >>= width
+        return sample
+
+    def run(self, cond={}, edge=True, offset=8, nsegments=None):
+        mask, value = self.encode(cond)
+        self.offset = offset
+        self.bus.queue(self.reg("offset"), offset)
+        self.bus.queue(self.reg("length"), self.config["nsegments"] if nsegments is None else nsegments)
+        self.bus.queue(self.reg("trigger_mask"), mask)
+        self.bus.queue(self.reg("trigger_value"), value)
+        self.bus.queue(self.reg("trigger_edge"), int(edge))
+        self.bus.queue(self.reg("start"), 1)
+        self.bus.flush()
+
+    def wait(self, timeout=None):
+        self.bus.poll(self.reg("done"), timeout=timeout)
+
+    def upload(self):
+        """Returns the captured segments: list of (timestamp, samples), samples from -offset to
+        depth - offset - 1 relative to the trigger."""
+        depth, words = self.config["depth"], self.config["words"]
+        nsegments,   = self.bus.read_regs(self.reg("count"))
+        datas = self.bus.read(self.base, nsegments*depth*words)
+        infos = self.bus.read(self.base + 4*self.config["nsegments"]*depth*words, 2*nsegments)
+        return unroll_segments(datas, infos, depth, words, self.offset, self.decode)
+
+def unroll_segments(datas, infos, depth, words, offset, decode=lambda data: data):
+    segments = []
+    for n in range(len(infos)//2):
+        timestamp, tp = infos[2*n], infos[2*n + 1]
+        samples = []
+        for i in range(depth):
+            row  = n*depth + (tp - offset + i)%depth
+            data = sum(datas[row*words + w] << (32*w) for w in range(words))
+            samples.append(decode(data))
+        segments.append((timestamp, samples))
+    return segments
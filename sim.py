@@ -4,8 +4,20 @@
 # License: BSD
 
 # ./sim.py --trace --trace-start=1000000
-
+# Builds are cached: re-running with only a different trace window and/or memtest sizes reuses the
+# Verilator build (./sim.py --rebuild to force a full build).
+
+import os
+import sys
+import json
+import glob
+import hashlib
 import argparse
+import subprocess
+
+import migen
+import litex
+import litedram
 
 from migen import *
 from migen.genlib.io import CRG
@@ -20,8 +32,12 @@ from litex.soc.integration.builder import *
 from litex.soc.cores import uart
 
 from litedram.modules import EDY4016A
+from litedram.frontend.bist import LiteDRAMBISTGenerator
+from litedram.frontend.bist import LiteDRAMBISTChecker
 
 from usddr4migphy import USDDR4MIGPHY
+from dmafrontend import DMAFrontend, DMAStreamWindow
+from soc_sdram_l2 import SoCSDRAML2
 
 # IOs ----------------------------------------------------------------------------------------------
 
@@ -81,13 +97,22 @@ class Platform(SimPlatform):
 
 # Simulation SoC -----------------------------------------------------------------------------------
 
-class SimSoC(SoCSDRAM):
-    def __init__(self, **kwargs):
+class SimSoC(SoCSDRAML2):
+    mem_map = {
+        "sdram_dma_window": 0x31000000,
+    }
+    mem_map.update(SoCSDRAML2.mem_map)
+
+    def __init__(self, calib_delay=1000, memtest_data_size=1024, memtest_addr_size=1024,
+        l2_line_words=1, l2_ways=1, l2_write_back=True, **kwargs):
         platform     = Platform()
         sys_clk_freq = int(1e6)
 
         # SoCSDRAM ---------------------------------------------------------------------------------
-        SoCSDRAM.__init__(self, platform, clk_freq=sys_clk_freq,
+        SoCSDRAML2.__init__(self, platform, clk_freq=sys_clk_freq,
+            l2_line_words       = l2_line_words,
+            l2_ways             = l2_ways,
+            l2_write_back       = l2_write_back,
             integrated_rom_size = 0x8000,
             ident               = "LiteX Simulation", ident_version=True,
             with_uart           = False,
@@ -101,9 +126,10 @@ class SimSoC(SoCSDRAM):
         self.add_csr("uart")
         self.add_interrupt("uart")
 
-        # DDR4 PHY ---------------------------------------------------------------------------------
+        # DDR4 PHY (with MIG PHY-only model) -------------------------------------------------------
         self.submodules.ddr4_phy = ddr4_phy = USDDR4MIGPHY(platform, platform.request("ddram"),
-            simulation=True)
+            simulation = True,
+            sim_model  = {"calib_delay": calib_delay})
         self.add_csr("ddr4_phy")
 
         # SDRAM ------------------------------------------------------------------------------------
@@ -111,9 +137,118 @@ class SimSoC(SoCSDRAM):
         self.register_sdram(ddr4_phy,
                             sdram_module.geom_settings,
                             sdram_module.timing_settings,
-                            main_ram_size_limit=0x40000000)
-        self.add_constant("MEMTEST_DATA_SIZE", 1024)
-        self.add_constant("MEMTEST_ADDR_SIZE", 1024)
+                            main_ram_size_limit = 0x40000000)
+        self.add_constant("MEMTEST_DATA_SIZE", memtest_data_size)
+        self.add_constant("MEMTEST_ADDR_SIZE", memtest_addr_size)
+
+        # SDRAM BIST -------------------------------------------------------------------------------
+        sdram_generator_port = self.sdram.crossbar.get_port()
+        sdram_checker_port   = self.sdram.crossbar.get_port()
+        self.submodules.sdram_generator = LiteDRAMBISTGenerator(sdram_generator_port)
+        self.add_csr("sdram_generator")
+        self.submodules.sdram_checker   = LiteDRAMBISTChecker(sdram_checker_port)
+        self.add_csr("sdram_checker")
+
+        # SDRAM DMA (simulated stream: Wishbone window) --------------------------------------------
+        self.submodules.sdram_dma = DMAFrontend(
+            write_port = self.sdram.crossbar.get_port(mode="write"),
+            read_port  = self.sdram.crossbar.get_port(mode="read"))
+        self.add_csr("sdram_dma")
+        self.submodules.sdram_dma_window = DMAStreamWindow(self.sdram_dma.data_width)
+        self.comb += [
+            self.sdram_dma_window.source.connect(self.sdram_dma.sink),
+            self.sdram_dma.source.connect(self.sdram_dma_window.sink),
+        ]
+        self.register_mem("sdram_dma_window", self.mem_map["sdram_dma_window"],
+            self.sdram_dma_window.bus, self.sdram_dma_window.size)
+
+# Build Cache --------------------------------------------------------------------------------------
+
+def sim_sources_hash(packages):
+    """Content hash of the local modules used by the simulation (test scripts are not included)
+    and of the packages' sources."""
+    h     = hashlib.sha256()
+    local = os.path.dirname(os.path.abspath(__file__))
+    files = sorted(os.path.abspath(m.__file__) for m in list(sys.modules.values())
+        if getattr(m, "__file__", None) is not None and
+           os.path.dirname(os.path.abspath(m.__file__)) == local)
+    for package in packages:
+        for root, subdirs, names in os.walk(os.path.dirname(os.path.abspath(package.__file__))):
+            subdirs[:] = sorted(d for d in subdirs if d != "__pycache__")
+            files += [os.path.join(root, n) for n in sorted(names)
+                if not n.endswith((".pyc", ".o", ".so"))]
+    for f in files:
+        h.update(f.encode())
+        with open(f, "rb") as fd:
+            h.update(fd.read())
+    return h.hexdigest()
+
+class SimBuildCache:
+    """Verilator build cache of a gateware directory
+
+    The build key is a content hash of the sources and of the build parameters; a build with the
+    same key is reused. Parameters not affecting the Verilator model are applied to the cached
+    build:
+    - trace window: sim_init.cpp is regenerated and the model incrementally rebuilt (Verilator
+      skips identical sources, only sim_init.cpp is recompiled and the binary relinked).
+    - BIOS (memtest sizes): the ROM init file ($readmemh'd at simulation start) is rewritten.
+      When the ROM is not initialized from a file, the BIOS constants are part of the key.
+    """
+    def __init__(self, gateware_dir, key):
+        self.gateware_dir = gateware_dir
+        self.filename     = os.path.join(gateware_dir, "sim_cache.json")
+        self.key          = key
+        self.entry        = {}
+        if os.path.exists(self.filename):
+            with open(self.filename) as f:
+                self.entry = json.load(f)
+
+    def valid(self, bios_key):
+        if self.entry.get("key", None) != self.key:
+            return False
+        if self.entry.get("rom_init", None) is None and self.entry.get("bios_key", None) != bios_key:
+            return False
+        return any(os.path.isfile(f) and os.access(f, os.X_OK)
+            for f in glob.glob(os.path.join(self.gateware_dir, "obj_dir", "V*")))
+
+    def save(self, vns, soc, bios_key, trace_window):
+        rom_init = vns.get_name(soc.rom.mem) + ".init"
+        if not os.path.exists(os.path.join(self.gateware_dir, rom_init)):
+            rom_init = None
+        self.entry = {
+            "key":          self.key,
+            "bios_key":     bios_key,
+            "rom_init":     rom_init,
+            "trace_window": trace_window,
+        }
+        with open(self.filename, "w") as f:
+            json.dump(self.entry, f, indent=1)
+
+    def update_rom(self, soc):
+        if self.entry["rom_init"] is None:
+            return
+        mem = soc.rom.mem
+        fmt = "{:0" + str(mem.width//4) + "X}\n"
+        with open(os.path.join(self.gateware_dir, self.entry["rom_init"]), "w") as f:
+            f.write("".join(fmt.format(d) for d in mem.init))
+
+    def update_trace(self, soc, trace, trace_window):
+        if self.entry["trace_window"] == trace_window:
+            return
+        from litex.build.sim.verilator import _generate_sim_cpp
+        cwd = os.getcwd()
+        os.chdir(self.gateware_dir)
+        try:
+            _generate_sim_cpp(soc.platform, trace, *trace_window)
+            build_script = glob.glob("build_*.sh")[0]
+            with open(build_script) as f:
+                script = "".join(l for l in f.readlines() if not l.startswith("rm -rf obj_dir"))
+            subprocess.check_call(["bash", "-c", script])
+        finally:
+            os.chdir(cwd)
+        self.entry["trace_window"] = trace_window
+        with open(self.filename, "w") as f:
+            json.dump(self.entry, f, indent=1)
 
 # Build --------------------------------------------------------------------------------------------
 
@@ -129,11 +264,29 @@ def main():
                         help="cycle to start VCD tracing")
     parser.add_argument("--trace-end", default=-1,
                         help="cycle to end VCD tracing")
-    parser.add_argument("--opt-level", default="O0",
-                        help="compilation optimization level")
+    parser.add_argument("--opt-level", default="O3",
+                        help="compilation optimization level (default=O3)")
+    parser.add_argument("--calib-delay", default=1000,
+                        help="MIG model calibration delay in sys_clk cycles (default=1000)")
+    parser.add_argument("--memtest-data-size", default=1024,
+                        help="BIOS memtest data size in bytes (default=1024)")
+    parser.add_argument("--memtest-addr-size", default=1024,
+                        help="BIOS memtest address size in bytes (default=1024)")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="force a full build (ignore the build cache)")
+    parser.add_argument("--l2-line-words", default=1,
+                        help="L2 cache line size in native port words (default=1)")
+    parser.add_argument("--l2-ways", default=1,
+                        help="L2 cache associativity (default=1)")
+    parser.add_argument("--l2-write-through", action="store_true",
+                        help="L2 cache write-through (default=write-back)")
     args = parser.parse_args()
 
     soc_kwargs = soc_sdram_argdict(args)
+    soc_kwargs.update(
+        l2_line_words = int(args.l2_line_words),
+        l2_ways       = int(args.l2_ways),
+        l2_write_back = not args.l2_write_through)
     builder_kwargs = builder_argdict(args)
 
     sim_config = SimConfig(default_clk="sys_clk")
@@ -150,17 +303,42 @@ def main():
 
     # SoC ------------------------------------------------------------------------------------------
 
-    soc = SimSoC(**soc_kwargs)
+    bios_kwargs = {
+        "memtest_data_size": int(args.memtest_data_size),
+        "memtest_addr_size": int(args.memtest_addr_size),
+    }
+    soc = SimSoC(calib_delay=int(args.calib_delay), **bios_kwargs, **soc_kwargs)
+
+    # Build Cache ----------------------------------------------------------------------------------
+    key = hashlib.sha256(json.dumps({
+        "sources":     sim_sources_hash([migen, litex, litedram]),
+        "soc":         soc_kwargs,
+        "calib_delay": int(args.calib_delay),
+        "sim_config":  sim_config.get_json(),
+        "threads":     int(args.threads),
+        "opt_level":   args.opt_level,
+        "trace":       args.trace,
+    }, sort_keys=True, default=str).encode()).hexdigest()
+    bios_key     = json.dumps(bios_kwargs, sort_keys=True)
+    trace_window = [int(args.trace_start), int(args.trace_end)]
 
     # Build/Run ------------------------------------------------------------------------------------
     builder_kwargs["csr_csv"] = "csr.csv"
     builder = Builder(soc, **builder_kwargs)
-    vns = builder.build(run=False, threads=args.threads, sim_config=sim_config,
-        opt_level=args.opt_level,
-        trace=args.trace, trace_start=int(args.trace_start), trace_end=int(args.trace_end))
-    builder.build(build=False, threads=args.threads, sim_config=sim_config,
+    build_kwargs = dict(threads=args.threads, sim_config=sim_config,
         opt_level=args.opt_level,
-        trace=args.trace, trace_start=int(args.trace_start), trace_end=int(args.trace_end))
+        trace=args.trace, trace_start=trace_window[0], trace_end=trace_window[1])
+    cache = SimBuildCache(builder.gateware_dir, key)
+    if not args.rebuild and cache.valid(bios_key):
+        print("Using cached simulation build ({})".format(key[:16]))
+        # Software/ROM only, the Verilator model is reused.
+        builder.build(build=False, run=False, **build_kwargs)
+        cache.update_rom(soc)
+        cache.update_trace(soc, args.trace, trace_window)
+    else:
+        vns = builder.build(run=False, **build_kwargs)
+        cache.save(vns, soc, bios_key, trace_window)
+    builder.build(build=False, **build_kwargs)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,53 @@
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+from litex.soc.interconnect import wishbone
+from litex.soc.integration.soc_sdram import SoCSDRAM
+
+from litedram.core import LiteDRAMCore
+
+from l2cache import L2Cache
+
+# SoCSDRAM with L2Cache ----------------------------------------------------------------------------
+
+class SoCSDRAML2(SoCSDRAM):
+    """SoCSDRAM with an L2Cache between main_ram and a native port of the crossbar
+
+    Replaces the direct-mapped wishbone.Cache (one native port word lines) of SoCSDRAM: l2_size as
+    for SoCSDRAM, l2_line_words/l2_ways/l2_write_back are the L2Cache parameters. register_sdram
+    keeps the SoCSDRAM signature.
+    """
+    def __init__(self, platform, clk_freq, l2_line_words=1, l2_ways=1, l2_write_back=True,
+        **kwargs):
+        SoCSDRAM.__init__(self, platform, clk_freq, **kwargs)
+        self.l2_line_words = l2_line_words
+        self.l2_ways       = l2_ways
+        self.l2_write_back = l2_write_back
+
+    def register_sdram(self, phy, geom_settings, timing_settings, main_ram_size_limit=None,
+        **kwargs):
+        assert not self._sdram_phy
+        self._sdram_phy.append(phy) # encapsulate in list to prevent CSR scanning
+
+        # LiteDRAM core
+        self.submodules.sdram = LiteDRAMCore(phy, geom_settings, timing_settings, self.clk_freq,
+            **kwargs)
+
+        # Main RAM
+        main_ram_size = 2**(geom_settings.bankbits +
+                            geom_settings.rowbits +
+                            geom_settings.colbits)*phy.settings.databits//8
+        if main_ram_size_limit is not None:
+            main_ram_size = min(main_ram_size, main_ram_size_limit)
+        wb_sdram = wishbone.Interface()
+        self.add_wb_sdram_if(wb_sdram)
+        self.register_mem("main_ram", self.mem_map["main_ram"], wb_sdram, main_ram_size)
+
+        # L2 Cache
+        self.submodules.l2_cache = L2Cache(self._wb_sdram, self.sdram.crossbar.get_port(),
+            size       = int(self.l2_size),
+            line_words = self.l2_line_words,
+            nways      = self.l2_ways,
+            write_back = self.l2_write_back)
+        self.add_csr("l2_cache")
+        self.add_constant("L2_SIZE", int(self.l2_size))
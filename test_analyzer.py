@@ -6,8 +6,11 @@ import time
 from litex import RemoteClient
 from litescope import LiteScopeAnalyzerDriver
 
+from hostbatch import BatchClient
+
 wb = RemoteClient(debug=False)
 wb.open()
+bus = BatchClient(wb)
 
 # # #
 
@@ -29,11 +32,11 @@ else:
 
 # FPGA ID ------------------------------------------------------------------------------------------
 fpga_id = ""
-for i in range(256):
-    c = chr(wb.read(wb.bases.identifier_mem + 4*i) & 0xff)
-    fpga_id += c
+for data in bus.read(wb.bases.identifier_mem, 256):
+    c = chr(data & 0xff)
     if c == "\0":
         break
+    fpga_id += c
 print("FPGA: " + fpga_id)
 
 # Analyzer dump ------------------------------------------------------------------------------------
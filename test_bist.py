@@ -1,22 +1,46 @@
 #!/usr/bin/env python3
 
 import sys
+import csv
+import json
 import time
+import argparse
 
 from litex import RemoteClient
 
+from hostbatch import BatchClient
+from ddr4addressmapping import address_mappings
+from trafficgenerator import traffic_patterns
+
+parser = argparse.ArgumentParser(description="DDR4 BIST tests/benchmarks")
+parser.add_argument("mode", nargs="?", default="test",
+    choices=["test", "mappings", "bench", "patterns", "wbuffer"],
+    help="test (write/read loop), mappings (address mappings), bench (write/read/mixed sweep), "
+         "patterns (traffic generator patterns) or wbuffer (mixed traffic through the write "
+         "buffer)")
+parser.add_argument("--lengths",      default="16,64,256", help="bench lengths in mB (default=16,64,256)")
+parser.add_argument("--increment",    default=256,         help="bench base increment in mB (default=256)")
+parser.add_argument("--random",       action="store_true", help="test/bench with random addresses "
+                                                                "(can repeat: read errors expected)")
+parser.add_argument("--transactions", default=2**20,       help="patterns transactions (default=1M)")
+parser.add_argument("--write-ratio",  default=None,        help="patterns ratio of writes (default=0, wbuffer: 0.5)")
+parser.add_argument("--outstanding",  default=None,        help="patterns max outstanding accesses")
+parser.add_argument("--output",       default=None,        help="bench/patterns results file (.csv or .json)")
+args = parser.parse_args()
+
 wb = RemoteClient()
 wb.open()
+bus = BatchClient(wb)
 
 # # #
 
 # FPGA ID ------------------------------------------------------------------------------------------
 fpga_id = ""
-for i in range(256):
-    c = chr(wb.read(wb.bases.identifier_mem + 4*i) & 0xff)
-    fpga_id += c
+for data in bus.read(wb.bases.identifier_mem, 256):
+    c = chr(data & 0xff)
     if c == "\0":
         break
+    fpga_id += c
 print("FPGA: " + fpga_id)
 
 # Check DDR4 calibration ---------------------------------------------------------------------------
@@ -32,55 +56,194 @@ kB = 1024
 mB = 1024*kB
 gB = 1024*mB
 
+main_ram_size = wb.mems.main_ram.size
+port_bytes    = 64 # Native port data width: 64-bit DDR4, BL8.
+
 wb.regs.sdram_dfii_control.write(1) # hardware control
 
+# BIST random CSR: data (bit 0) and addr (bit 1) fields. Random addresses (PRBS31) are masked to
+# end - base (a power of 2) and can repeat: a repeated address holds the data of its last write
+# and is reported as read errors.
+bist_random_addr = 0b10
+
 class Generator:
     def __init__(self, name):
-        for r in ["reset", "base", "length", "start", "done", "ticks",
+        for r in ["reset", "base", "end", "length", "start", "done", "ticks",
                   "random"]:
             setattr(self, r, getattr(wb.regs, name + "_" + r))
 
-    def init(self, base, length, random=False):
+    def queue(self, base, length, random=False):
         self.write_length = length
-        self.reset.write(1)
-        self.reset.write(0)
-        self.base.write(base)
-        self.length.write(length)
-        self.random.write(int(random))
-        self.start.write(1)
+        bus.queue(self.reset, 1)
+        bus.queue(self.reset, 0)
+        bus.queue(self.base, base)
+        bus.queue(self.end, base + length)
+        bus.queue(self.length, length)
+        bus.queue(self.random, bist_random_addr if random else 0)
+        bus.queue(self.start, 1)
+
+    def init(self, base, length, random=False):
+        self.queue(base, length, random)
+        bus.flush()
 
     def wait(self):
-        while(not self.done.read()):
-            pass
-        ticks = self.ticks.read()
+        bus.poll(self.done)
+        ticks, = bus.read_regs(self.ticks)
+        self.write_ticks = ticks
         speed = wb.constants.config_clock_frequency*self.write_length/ticks
         return speed
 
 
 class Checker:
     def __init__(self, name):
-        for r in ["reset", "base", "length", "start", "done", "errors", "ticks",
+        for r in ["reset", "base", "end", "length", "start", "done", "errors", "ticks",
                   "random"]:
             setattr(self, r, getattr(wb.regs, name + "_" + r))
 
-    def init(self, base, length, random=False):
+    def queue(self, base, length, random=False):
         self.read_length = length
-        self.reset.write(1)
-        self.reset.write(0)
-        self.base.write(base)
-        self.length.write(length)
-        self.random.write(int(random))
-        self.start.write(1)
+        bus.queue(self.reset, 1)
+        bus.queue(self.reset, 0)
+        bus.queue(self.base, base)
+        bus.queue(self.end, base + length)
+        bus.queue(self.length, length)
+        bus.queue(self.random, bist_random_addr if random else 0)
+        bus.queue(self.start, 1)
+
+    def init(self, base, length, random=False):
+        self.queue(base, length, random)
+        bus.flush()
 
     def wait(self):
-        while(not self.done.read()):
-            pass
-        ticks = self.ticks.read()
+        bus.poll(self.done)
+        ticks, errors = bus.read_regs(self.ticks, self.errors)
+        self.read_ticks = ticks
         speed = wb.constants.config_clock_frequency*self.read_length/ticks
-        errors = self.errors.read()
         return speed, errors
 
 
+class Traffic:
+    def __init__(self, name):
+        for r in ["pattern", "base", "end", "length", "stride", "page_hit", "write_ratio",
+                  "outstanding", "start", "done", "ticks", "reads", "writes"]:
+            setattr(self, r, getattr(wb.regs, name + "_" + r))
+
+    def init(self, pattern, base, end, length, stride=0, page_hit=0, write_ratio=0,
+        outstanding=None):
+        self.transactions = length
+        bus.queue(self.pattern, traffic_patterns.index(pattern))
+        bus.queue(self.base, base)
+        bus.queue(self.end, end)
+        bus.queue(self.length, length)
+        bus.queue(self.stride, stride)
+        bus.queue(self.page_hit, int(page_hit*256))
+        bus.queue(self.write_ratio, int(write_ratio*256))
+        if outstanding is not None:
+            bus.queue(self.outstanding, outstanding)
+        bus.queue(self.start, 1)
+        bus.flush()
+
+    def wait(self):
+        bus.poll(self.done)
+        ticks, reads, writes = bus.read_regs(self.ticks, self.reads, self.writes)
+        speed = wb.constants.config_clock_frequency*self.transactions/ticks
+        return speed, reads, writes
+
+
+def bench_wbuffer(traffic, length, write_ratio, outstanding):
+    """Mixed traffic through the write buffer: bypass (raw controller), pass-through (writes
+    drained as soon as posted, reads in order) vs batched writes (high/low watermarks) with/without
+    read reordering. Turnarounds are the read/write direction changes seen by the PHY (performance
+    counters). The write buffer is left bypassed."""
+    print("\nBenchmarking write buffer (write ratio {:.2f})...".format(write_ratio))
+    print("-"*40)
+    print("       PATTERN          CONFIG  SPEED(gB/s)  TURNAROUNDS  COMBINED  REORDERED  FLUSHES")
+    patterns = [
+        ("linear",       dict(pattern="linear")),
+        ("page hit 90%", dict(pattern="page", page_hit=0.9)),
+        ("page hit 50%", dict(pattern="page", page_hit=0.5)),
+    ]
+    configs = [
+        ("bypass",          dict(bypass=1)),
+        ("pass-through",    dict(bypass=0, high_watermark=1,  low_watermark=0, reorder=0)),
+        ("batched",         dict(bypass=0, high_watermark=12, low_watermark=4, reorder=0)),
+        ("batched+reorder", dict(bypass=0, high_watermark=12, low_watermark=4, reorder=1)),
+    ]
+    turnaround_regs = [wb.regs.ddr4_phy_rd_to_wr, wb.regs.ddr4_phy_wr_to_rd]
+    counter_regs    = [getattr(wb.regs, "sdram_wbuffer_" + name)
+        for name in ["combined", "reordered", "flushes"]]
+    def turnarounds():
+        bus.queue(wb.regs.ddr4_phy_snapshot, 1)
+        bus.flush()
+        return sum(bus.read_regs(*turnaround_regs))
+    results = []
+    for pattern, pattern_config in patterns:
+        for name, config in configs:
+            for reg, value in config.items():
+                bus.queue(getattr(wb.regs, "sdram_wbuffer_" + reg), value)
+            bus.queue(wb.regs.sdram_wbuffer_clear, 1)
+            bus.flush()
+            start = turnarounds()
+            traffic.init(base=0, end=main_ram_size, length=length, write_ratio=write_ratio,
+                outstanding=outstanding, **pattern_config)
+            speed, reads, writes = traffic.wait()
+            # Buffered writes drained before reconfiguring.
+            bus.poll(wb.regs.sdram_wbuffer_level, 0)
+            result = {
+                "pattern":     pattern,
+                "config":      name,
+                "length":      length,
+                "write_ratio": write_ratio,
+                "gBps":        speed*port_bytes/gB,
+                "turnarounds": turnarounds() - start,
+            }
+            result.update(zip(["combined", "reordered", "flushes"], bus.read_regs(*counter_regs)))
+            results.append(result)
+            print("{:>14s} {:>15s} {:12.2f} {:12d} {:9d} {:10d} {:8d}".format(
+                pattern, name, result["gBps"], result["turnarounds"], result["combined"],
+                result["reordered"], result["flushes"]))
+    bus.queue(wb.regs.sdram_wbuffer_bypass, 1)
+    bus.flush()
+    return results
+
+
+def bench_patterns(traffic, length, write_ratio, outstanding):
+    print("\nBenchmarking traffic patterns...")
+    print("-"*40)
+    print("       PATTERN  SPEED(gB/s)   MT/s      READS     WRITES")
+    configs = [
+        ("linear",       dict(pattern="linear")),
+        ("random",       dict(pattern="random")),
+        ("strided 4kB",  dict(pattern="strided", stride=4*kB)),
+        ("page hit 90%", dict(pattern="page", page_hit=0.9)),
+        ("page hit 50%", dict(pattern="page", page_hit=0.5)),
+        ("page hit 10%", dict(pattern="page", page_hit=0.1)),
+    ]
+    # Raw controller behaviour: traffic generator connected to its port (write buffer bypassed).
+    bus.poll(wb.regs.sdram_wbuffer_level, 0)
+    bus.queue(wb.regs.sdram_wbuffer_bypass, 1)
+    bus.flush()
+    results = []
+    for name, config in configs:
+        traffic.init(base=0, end=main_ram_size, length=length, write_ratio=write_ratio,
+            outstanding=outstanding, **config)
+        speed, reads, writes = traffic.wait()
+        result = {
+            "pattern":     name,
+            "length":      length,
+            "write_ratio": write_ratio,
+            "outstanding": outstanding,
+            "gBps":        speed*port_bytes/gB,
+            "mtps":        speed/1e6,
+            "reads":       reads,
+            "writes":      writes,
+        }
+        results.append(result)
+        print("{:>14s} {:12.2f} {:6.1f} {:10d} {:10d}".format(
+            name, result["gBps"], result["mtps"], reads, writes))
+    return results
+
+
 class BIST:
     def __init__(self, generator, checker):
         self.generator = generator
@@ -133,14 +296,17 @@ class BIST:
         i = 0
 
         while True:
+            # wrap to main_ram
+            if base + offset + length > main_ram_size:
+                offset = 0
+
             # write
-            self.generator.init(base, length, random)
+            self.generator.init(base + offset, length, random)
             write_speed = self.generator.wait()
 
             # read
-            #self.checker.init(base, length, random)
-            #read_speed, read_errors = self.checker.wait()
-            read_speed, read_errors = 0, 0
+            self.checker.init(base + offset, length, random)
+            read_speed, read_errors = self.checker.wait()
 
             # infos
             if i%10 == 0:
@@ -153,12 +319,127 @@ class BIST:
                 8*read_speed/gB,
                 tested_length//mB,
                 tested_errors))
-            #exit()
 
             offset += increment
 
+    def bench(self, lengths, increment, random=False):
+        """Write, read and mixed bandwidths over main_ram.
+
+        For each length, the base is swept over main_ram by increment. At each base, region A
+        (base) is written by the generator (write) then read back by the checker (read), then the
+        checker reads region A again while the generator concurrently writes region B (base +
+        length, disjoint) (mixed). Mixed bandwidth is (length*2)/max(ticks): the generator and the
+        checker are started from the host a few packets apart, so lengths have to be large compared
+        to a packet round trip. Speeds are in gB/s (bytes)."""
+        print("\nBenchmarking Writes/Reads/Mixed...")
+        print("-"*40)
+        print("  BASE(mB) LENGTH(mB)  W(gB/s)  R(gB/s) MW(gB/s) MR(gB/s)  M(gB/s)      ERRORS")
+        results = []
+        for length in lengths:
+            base = 0
+            while base + 2*length <= main_ram_size:
+                # write
+                self.generator.init(base, length, random)
+                write_speed = self.generator.wait()
+
+                # read
+                self.checker.init(base, length, random)
+                read_speed, read_errors = self.checker.wait()
+
+                # mixed
+                self.checker.queue(base, length, random)
+                self.generator.queue(base + length, length, random)
+                bus.flush()
+                mixed_write_speed = self.generator.wait()
+                mixed_read_speed, mixed_read_errors = self.checker.wait()
+                mixed_ticks = max(self.generator.write_ticks, self.checker.read_ticks)
+                mixed_speed = wb.constants.config_clock_frequency*2*length/mixed_ticks
+
+                result = {
+                    "base":             base,
+                    "length":           length,
+                    "increment":        increment,
+                    "random":           int(random),
+                    "write_gBps":       write_speed/gB,
+                    "read_gBps":        read_speed/gB,
+                    "mixed_write_gBps": mixed_write_speed/gB,
+                    "mixed_read_gBps":  mixed_read_speed/gB,
+                    "mixed_gBps":       mixed_speed/gB,
+                    "errors":           read_errors + mixed_read_errors,
+                }
+                results.append(result)
+                print("{:10d} {:10d} {:8.2f} {:8.2f} {:8.2f} {:8.2f} {:8.2f} {:11d}".format(
+                    base//mB, length//mB,
+                    result["write_gBps"],
+                    result["read_gBps"],
+                    result["mixed_write_gBps"],
+                    result["mixed_read_gBps"],
+                    result["mixed_gBps"],
+                    result["errors"]))
+                base += increment
+        return results
+
+    def bench_mappings(self, base, length):
+        print("\nBenchmarking address mappings...")
+        print("-"*40)
+        print("           MAPPING W_SPEED(gBps) R_SPEED(gBps)      ERRORS")
+        for sel, mapping in enumerate(address_mappings):
+            bus.queue(wb.regs.sdram_generator_mapping_sel, sel)
+            bus.queue(wb.regs.sdram_checker_mapping_sel, sel)
+            bus.flush()
+
+            # write
+            self.generator.init(base, length)
+            write_speed = self.generator.wait()
+
+            # read
+            self.checker.init(base, length)
+            read_speed, read_errors = self.checker.wait()
+
+            # infos
+            print("{:>18s} {:13.2f} {:13.2f} {:11d}".format(
+                mapping,
+                8*write_speed/gB,
+                8*read_speed/gB,
+                read_errors))
+        bus.queue(wb.regs.sdram_generator_mapping_sel, 0)
+        bus.queue(wb.regs.sdram_checker_mapping_sel, 0)
+        bus.flush()
+
+def write_results(filename, results):
+    if filename.endswith(".json"):
+        with open(filename, "w") as f:
+            json.dump({"fpga_id": fpga_id, "results": results}, f, indent=4)
+    else:
+        with open(filename, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+            writer.writeheader()
+            writer.writerows(results)
+
+if args.mode in ["patterns", "wbuffer"]:
+    bench = {"patterns": bench_patterns, "wbuffer": bench_wbuffer}[args.mode]
+    write_ratio = {"patterns": 0.0, "wbuffer": 0.5}[args.mode]
+    results = bench(Traffic("sdram_traffic"),
+        length      = int(args.transactions),
+        write_ratio = write_ratio if args.write_ratio is None else float(args.write_ratio),
+        outstanding = None if args.outstanding is None else int(args.outstanding))
+    if args.output is not None:
+        write_results(args.output, results)
+    wb.close()
+    exit(0)
+
 bist = BIST(Generator("sdram_generator"), Checker("sdram_checker"))
-bist.test(0x00000000, 2048*mB, 0, False)
+if args.mode == "mappings":
+    bist.bench_mappings(0x00000000, 128*mB)
+elif args.mode == "bench":
+    results = bist.bench(
+        lengths   = [int(length)*mB for length in args.lengths.split(",")],
+        increment = int(args.increment)*mB,
+        random    = args.random)
+    if args.output is not None:
+        write_results(args.output, results)
+else:
+    bist.test(0x00000000, main_ram_size, 0, False)
 
 # # #
 
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+import time
+import argparse
+
+from litex import RemoteClient
+
+from litedram.modules import EDY4016A
+
+from hostbatch import BatchClient
+from usddr4migphy import perf_counters
+
+parser = argparse.ArgumentParser(description="DDR4 PHY performance counters (live)")
+parser.add_argument("--interval", default=1.0, help="update interval in s (default=1)")
+parser.add_argument("--count",    default=0,   help="number of updates (default=0: forever)")
+args = parser.parse_args()
+
+wb = RemoteClient()
+wb.open()
+bus = BatchClient(wb)
+
+# # #
+
+# FPGA ID ------------------------------------------------------------------------------------------
+fpga_id = ""
+for data in bus.read(wb.bases.identifier_mem, 256):
+    c = chr(data & 0xff)
+    if c == "\0":
+        break
+    fpga_id += c
+print("FPGA: " + fpga_id)
+
+# Performance counters -----------------------------------------------------------------------------
+gB         = 1024*1024*1024
+port_bytes = 64 # Data per CAS: 64-bit DDR4, BL8.
+
+clk_freq = wb.constants.config_clock_frequency
+timings  = EDY4016A(clk_freq, "1:4").timing_settings # sys_clk cycles.
+regs     = [getattr(wb.regs, "ddr4_phy_" + name) for name in perf_counters]
+
+def snapshot():
+    wb.regs.ddr4_phy_snapshot.write(1)
+    return dict(zip(perf_counters, bus.read_regs(*regs)))
+
+# Utilization: the data bus is busy 4 tCK (1 sys_clk) per CAS (BL8). Refresh and write-to-read
+# overheads are estimated from the counts with the module timings (tRFC/tWTR).
+print("  GB/S   UTIL   IDLE  ACT/CAS  RD->WR/S  WR->RD/S  REF/S  REF_OVH  WTR_OVH")
+last = snapshot()
+n    = 0
+while int(args.count) == 0 or n < int(args.count):
+    time.sleep(float(args.interval))
+    values = snapshot()
+    delta  = {name: values[name] - last[name] for name in perf_counters}
+    last   = values
+    n     += 1
+    cycles = delta["cycles"]
+    cas    = delta["rd_cas"] + delta["wr_cas"]
+    secs   = cycles/clk_freq
+    print("{:6.2f} {:5.1f}% {:5.1f}% {:8.2f} {:9.0f} {:9.0f} {:6.0f} {:7.1f}% {:7.1f}%".format(
+        cas*port_bytes/secs/gB,
+        100*cas/cycles,
+        100*delta["idle"]/cycles,
+        delta["act"]/cas if cas else 0,
+        delta["rd_to_wr"]/secs,
+        delta["wr_to_rd"]/secs,
+        delta["ref"]/secs,
+        100*delta["ref"]*timings.tRFC/cycles,
+        100*delta["wr_to_rd"]*timings.tWTR/cycles))
+
+# # #
+
+wb.close()
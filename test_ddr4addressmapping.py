@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+# Migen simulation of DDR4AddressMapping: ./test_ddr4addressmapping.py
+
+import unittest
+
+from migen import *
+
+from litedram.common import LiteDRAMNativePort
+
+from ddr4addressmapping import DDR4AddressMapping, address_mappings
+
+# Test DDR4AddressMapping --------------------------------------------------------------------------
+
+class TestDDR4AddressMapping(unittest.TestCase):
+    colbits  = 7
+    bankbits = 3
+    bgbits   = 1
+
+    def mapped_addresses(self, addresses):
+        port = LiteDRAMNativePort("both", address_width=self.colbits + self.bankbits + 4, data_width=32)
+        dut  = DDR4AddressMapping(port, self.colbits, self.bankbits, self.bgbits, address_mappings)
+        mapped = {mapping: [] for mapping in address_mappings}
+
+        def generator(dut):
+            for sel, mapping in enumerate(address_mappings):
+                yield dut.sel.storage.eq(sel)
+                for addr in addresses:
+                    yield dut.port.cmd.addr.eq(addr)
+                    yield
+                    mapped[mapping].append((yield port.cmd.addr))
+
+        run_simulation(dut, generator(dut))
+        return mapped
+
+    def decode(self, addr):
+        col  = addr & (2**self.colbits - 1)
+        bank = (addr >> self.colbits) & (2**self.bankbits - 1)
+        return col, bank >> (self.bankbits - self.bgbits)
+
+    def test_mappings(self):
+        addresses = list(range(2**(self.colbits + self.bankbits + 1)))
+        mapped    = self.mapped_addresses(addresses)
+        # Default mapping is the LiteDRAM mapping.
+        self.assertEqual(mapped["ROW_BANK_COL"], addresses)
+        for mapping, addrs in mapped.items():
+            # Mappings are bijective.
+            self.assertEqual(sorted(addrs), addresses)
+            # Linear accesses rotate over the bank groups (except with the LiteDRAM mapping).
+            bgs = [self.decode(addr)[1] for addr in addrs[:8]]
+            if mapping == "ROW_BANK_COL":
+                self.assertEqual(bgs, [0]*8)
+            else:
+                self.assertEqual(bgs, [0, 1]*4)
+
+if __name__ == "__main__":
+    unittest.main()
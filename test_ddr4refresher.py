@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+# Migen simulation of DDR4Refresher: ./test_ddr4refresher.py
+
+import unittest
+from types import SimpleNamespace
+
+from migen import *
+from migen.sim import passive
+
+from litedram.modules import EDY4016A
+
+from ddr4refresher import DDR4Refresher, DDR4RefresherCSRs, ddr4_fgr_timings, fgr_modes, get_fgr_mr3
+
+# Test DDR4Refresher -------------------------------------------------------------------------------
+
+tREFI = 64
+tRFC  = 12
+tRP   = 3
+
+ref_duration = 1 + 2 + 1 + tRP + 1 + tRFC # IDLE, WAIT-BANK-MACHINES, PRE, tRP, REF, tRFC.
+
+fgr_timings = {"1x": (tREFI, tRFC), "2x": (tREFI//2, 8), "4x": (tREFI//4, 5)}
+
+def refresher_settings(tZQCS=None):
+    return SimpleNamespace(
+        geom         = SimpleNamespace(addressbits=17, bankbits=3),
+        phy          = SimpleNamespace(nranks=1),
+        timing       = SimpleNamespace(tREFI=tREFI, tRFC=tRFC, tRP=tRP, tZQCS=tZQCS),
+        with_refresh = True)
+
+@passive
+def controller_model(dut, commands):
+    """Multiplexer model: grants the refresher one cycle after its request, logs the commands."""
+    cycle = 0
+    while True:
+        valid = (yield dut.cmd.valid)
+        if valid and (yield dut.cmd.ready):
+            ras, cas, we = (yield dut.cmd.ras), (yield dut.cmd.cas), (yield dut.cmd.we)
+            cmd = {(1, 0, 1): "pre", (1, 1, 0): "ref", (0, 0, 1): "zqcs"}.get((ras, cas, we), None)
+            if cmd is not None:
+                commands.append((cycle, cmd))
+        if (yield dut.cmd.last):
+            commands.append((cycle, "last"))
+        yield dut.cmd.ready.eq(valid)
+        yield
+        cycle += 1
+
+class TestDDR4Refresher(unittest.TestCase):
+    def refresher_test(self, busy, cycles, fgr=0, postpone=8, pull_in=0, tZQCS=None, zqcs_freq=1e0):
+        dut      = DDR4Refresher(refresher_settings(tZQCS), clk_freq=1e3, zqcs_freq=zqcs_freq,
+            fgr_timings=fgr_timings)
+        commands = []
+        values   = {}
+
+        def generator(dut):
+            yield dut.fgr.storage.eq(fgr)
+            yield dut.postpone.storage.eq(postpone)
+            yield dut.pull_in.storage.eq(pull_in)
+            for cycle in range(cycles):
+                yield dut.busy.eq(busy(cycle))
+                yield
+            for name in ["refreshes", "postponed", "forced", "pulled_in", "max_pending"]:
+                values[name] = (yield getattr(dut, name).status)
+
+        run_simulation(dut, [generator(dut), controller_model(dut, commands)])
+        refs = [cycle for cycle, cmd in commands if cmd == "ref"]
+        self.assertEqual(values["refreshes"], len(refs))
+        # Refresh sequence: PRE, REF tRP (+1) later, done tRFC after REF.
+        for (c0, cmd0), (c1, cmd1), (c2, cmd2) in zip(commands, commands[1:], commands[2:]):
+            if cmd1 == "ref":
+                self.assertEqual(cmd0, "pre")
+                self.assertEqual(c1 - c0, tRP + 1)
+                self.assertIn(cmd2, ["last", "zqcs"])
+                if cmd2 == "last":
+                    self.assertEqual(c2 - c1, fgr_timings[fgr_modes[fgr]][1])
+        return refs, values, commands
+
+    def test_refresh_idle(self):
+        refs, values, commands = self.refresher_test(lambda cycle: 0, 10*tREFI + tREFI//2)
+        self.assertEqual(len(refs), 10)
+        self.assertEqual([b - a for a, b in zip(refs, refs[1:])], [tREFI]*9)
+        self.assertEqual(values["postponed"], 0)
+        self.assertEqual(values["forced"], 0)
+        self.assertEqual(values["pulled_in"], 0)
+        self.assertEqual(values["max_pending"], 1)
+
+    def test_refresh_postponed(self):
+        # Continuous traffic: refreshes are postponed up to 8, the 9th owed refresh is forced and
+        # then one refresh per tREFI keeps 8 postponed.
+        refs, values, commands = self.refresher_test(lambda cycle: 1, 20*tREFI + tREFI//2)
+        self.assertEqual(len(refs), 20 - 8)
+        self.assertGreater(refs[0], 9*tREFI)
+        self.assertEqual(values["postponed"], 20)
+        self.assertEqual(values["forced"], 12)
+        self.assertEqual(values["max_pending"], 9)
+
+    def test_refresh_no_postponing(self):
+        refs, values, commands = self.refresher_test(lambda cycle: 1, 10*tREFI + tREFI//2,
+            postpone=0)
+        self.assertEqual(len(refs), 10)
+        self.assertEqual(values["max_pending"], 1)
+
+    def test_refresh_burst(self):
+        # Traffic burst of 5 tREFI: postponed refreshes are issued as soon as the burst ends.
+        end = 5*tREFI + tREFI//2
+        refs, values, commands = self.refresher_test(lambda cycle: cycle < end, 8*tREFI + tREFI//2)
+        self.assertEqual(len(refs), 8)
+        self.assertTrue(all(c >= end for c in refs[:5]))
+        self.assertLessEqual(refs[4] - refs[0], 4*ref_duration)
+        self.assertEqual(values["postponed"], 5)
+        self.assertEqual(values["forced"], 0)
+        self.assertEqual(values["max_pending"], 5)
+
+    def test_refresh_pull_in(self):
+        refs, values, commands = self.refresher_test(lambda cycle: 0, 10*tREFI + tREFI//2,
+            pull_in=4)
+        self.assertEqual(len(refs), 10 + 4)
+        self.assertLessEqual(refs[3], 4*ref_duration)
+        self.assertEqual(values["pulled_in"], 14)
+
+    def test_refresh_fgr(self):
+        for fgr, ratio in [(1, 2), (2, 4)]:
+            # tREFI timer restarts with the FGR mode period after the first (1x) period.
+            refs, values, commands = self.refresher_test(lambda cycle: 0, 8*tREFI + tREFI//2,
+                fgr=fgr)
+            self.assertGreaterEqual(len(refs), 7*ratio + 1)
+            self.assertEqual(set(b - a for a, b in zip(refs, refs[1:])), {tREFI//ratio})
+            # Postponing limit is scaled (8 tREFI in 1x mode).
+            refs, values, commands = self.refresher_test(lambda cycle: 1, 12*tREFI + tREFI//8,
+                fgr=fgr)
+            self.assertEqual(values["max_pending"], 8*ratio + 1)
+
+    def test_zqcs(self):
+        refs, values, commands = self.refresher_test(lambda cycle: 0, 6*tREFI + tREFI//2,
+            tZQCS=16, zqcs_freq=1e3/(2*tREFI))
+        zqcs = [c for c, cmd in commands if cmd == "zqcs"]
+        self.assertEqual(len(zqcs), 2)
+        for c in zqcs:
+            self.assertEqual(c - max(r for r in refs if r < c), fgr_timings["1x"][1] + 1)
+
+    def test_fgr_timings(self):
+        timings = ddr4_fgr_timings(EDY4016A, 200e6, "1:4")
+        self.assertAlmostEqual(timings["1x"][0]/2, timings["2x"][0], delta=1)
+        self.assertTrue(timings["1x"][1] > timings["2x"][1] > timings["4x"][1])
+
+    def test_refresher_csrs(self):
+        # The CSR module holds the refresher CSRs (same objects and names) and no logic.
+        refresher = DDR4Refresher(refresher_settings(), clk_freq=1e3, fgr_timings=fgr_timings)
+        csrs      = DDR4RefresherCSRs(refresher)
+        self.assertEqual(sorted(csrs.get_csrs(), key=lambda csr: csr.name),
+                         sorted(refresher.get_csrs(), key=lambda csr: csr.name))
+        self.assertEqual(csrs.get_fragment().sync, {})
+
+    def test_fgr_mr3(self):
+        # Only the FGR field (A8:A6) is replaced.
+        mr3 = 0b11_01_000_1_1_0_1_10 # A12:A11, A10:A9, A8:A6, A5, A4, A3, A2, A1:A0.
+        self.assertEqual(get_fgr_mr3("4x", mr3), 0b11_01_010_1_1_0_1_10)
+        self.assertEqual(get_fgr_mr3("2x", get_fgr_mr3("4x", mr3)), 0b11_01_001_1_1_0_1_10)
+        self.assertEqual(get_fgr_mr3("1x"), 0)
+
+if __name__ == "__main__":
+    unittest.main()
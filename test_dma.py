@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+import time
+import random
+import argparse
+
+from litex import RemoteClient
+
+from hostbatch import BatchClient
+from dmafrontend import DMADriver
+
+parser = argparse.ArgumentParser(description="DDR4 DMA bulk load/dump benchmark")
+parser.add_argument("--base",   default="0x0",    help="DRAM base address in bytes (default=0)")
+parser.add_argument("--length", default="0x4000", help="transfer length in bytes (default=16KB)")
+parser.add_argument("--seed",   default=42,       help="data seed (default=42)")
+args = parser.parse_args()
+
+wb = RemoteClient()
+wb.open()
+bus = BatchClient(wb)
+
+# # #
+
+# FPGA ID ------------------------------------------------------------------------------------------
+fpga_id = ""
+for data in bus.read(wb.bases.identifier_mem, 256):
+    c = chr(data & 0xff)
+    if c == "\0":
+        break
+    fpga_id += c
+print("FPGA: " + fpga_id)
+
+# Check DDR4 calibration ---------------------------------------------------------------------------
+if wb.regs.ddr4_phy_calib_done.read() != 1:
+    print("DDR4 calibration failed, exiting.")
+    wb.close()
+    exit(0)
+else:
+    print("DDR4 calibration successful, continue.")
+
+# DMA load/dump ------------------------------------------------------------------------------------
+kB = 1024
+mB = 1024*kB
+
+wb.regs.sdram_dfii_control.write(1) # hardware control
+
+base     = int(args.base, 0)
+length   = int(args.length, 0)
+prng     = random.Random(int(args.seed))
+datas    = [prng.randrange(2**32) for _ in range(length//4)]
+dma      = DMADriver(wb, bus)
+
+def bench(name, transfer):
+    start    = time.time()
+    result   = transfer()
+    duration = time.time() - start
+    print("{:>14s}: {:d}KB in {:.3f}s: {:.3f}MB/s".format(
+        name, length//kB, duration, length/duration/mB))
+    return result
+
+# Through the DMA window vs through main_ram (Wishbone/L2).
+main_ram = wb.mems.main_ram.base + base
+bench("dma load",      lambda: dma.load(base, datas))
+rdatas = bench("dma dump", lambda: dma.dump(base, length//4))
+bench("main_ram write", lambda: bus.write(main_ram, datas))
+bench("main_ram read",  lambda: bus.read(main_ram, length//4))
+
+errors = sum(data != rdata for data, rdata in zip(datas, rdatas))
+print("errors: {:d}/{:d}".format(errors, len(datas)))
+
+# # #
+
+wb.close()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+# Migen simulation of DMAFrontend/DMAStreamWindow: ./test_dmafrontend.py
+
+import unittest
+import random
+
+from migen import *
+
+from litedram.common import LiteDRAMNativePort
+
+from dmafrontend import DMAFrontend, DMAStreamWindow
+from nativeportmodel import port_memory
+
+# Test DMAFrontend ---------------------------------------------------------------------------------
+
+def new_ports(data_width=64):
+    return [LiteDRAMNativePort(mode, address_width=16, data_width=data_width)
+        for mode in ["write", "read"]]
+
+def dma_write(dma, base, datas, valid=1.0, seed=42):
+    prng = random.Random(seed)
+    yield dma.wr_base.storage.eq(base)
+    yield dma.wr_length.storage.eq(len(datas))
+    yield
+    yield dma.wr_start.re.eq(1)
+    yield
+    yield dma.wr_start.re.eq(0)
+    for data in datas:
+        while prng.random() >= valid:
+            yield
+        yield dma.sink.valid.eq(1)
+        yield dma.sink.data.eq(data)
+        yield
+        while not (yield dma.sink.ready):
+            yield
+        yield dma.sink.valid.eq(0)
+    while not (yield dma.wr_done.status):
+        yield
+    return (yield dma.wr_ticks.status)
+
+def dma_read(dma, base, length, datas, ready=1.0, seed=42):
+    prng = random.Random(seed)
+    yield dma.rd_base.storage.eq(base)
+    yield dma.rd_length.storage.eq(length)
+    yield
+    yield dma.rd_start.re.eq(1)
+    yield
+    yield dma.rd_start.re.eq(0)
+    yield
+    while not (yield dma.rd_done.status):
+        yield dma.source.ready.eq(prng.random() < ready)
+        yield
+        if (yield dma.source.valid) and (yield dma.source.ready):
+            datas.append((yield dma.source.data))
+    yield dma.source.ready.eq(0)
+    return (yield dma.rd_ticks.status)
+
+class TestDMAFrontend(unittest.TestCase):
+    def dma_test(self, length=64, base=0x100, valid=1.0, ready=1.0, port_ready=1.0, latency=8):
+        write_port, read_port = new_ports()
+        dut   = DMAFrontend(write_port, read_port)
+        mem   = {}
+        prng  = random.Random(42)
+        datas = [prng.randrange(2**64) for _ in range(length)]
+        rdatas = []
+        ticks  = {}
+
+        def generator(dut):
+            ticks["wr"] = yield from dma_write(dut, base, datas, valid)
+            # Let the DMA writer FIFO drain to the port.
+            for i in range(32):
+                yield
+            ticks["rd"] = yield from dma_read(dut, base, length, rdatas, ready)
+
+        run_simulation(dut, [generator(dut),
+            port_memory(write_port, mem, latency=latency, ready=port_ready, seed=1),
+            port_memory(read_port,  mem, latency=latency, ready=port_ready, seed=2)])
+        self.assertEqual([mem.get(base//8 + i) for i in range(length)], datas)
+        self.assertEqual(rdatas, datas)
+        return ticks
+
+    def test_dma(self):
+        self.dma_test()
+
+    def test_dma_backpressure(self):
+        self.dma_test(valid=0.5, ready=0.5, port_ready=0.6)
+
+    def test_dma_line_rate(self):
+        # Continuous streams and ports: one port word per cycle after the pipeline fill (read
+        # latency covered by the DMA reader FIFO).
+        length = 128
+        ticks  = self.dma_test(length=length, latency=8)
+        self.assertLessEqual(ticks["wr"], length + 4)
+        self.assertLessEqual(ticks["rd"], length + 8 + 8)
+        # Read latency above the FIFO depth: throughput limited to fifo_depth words per latency.
+        ticks  = self.dma_test(length=length, latency=32)
+        self.assertGreater(ticks["rd"], 2*length)
+
+    def test_dma_zero_length(self):
+        write_port, read_port = new_ports()
+        dut = DMAFrontend(write_port, read_port)
+
+        def generator(dut):
+            yield dut.wr_start.re.eq(1)
+            yield dut.rd_start.re.eq(1)
+            yield
+            yield dut.wr_start.re.eq(0)
+            yield dut.rd_start.re.eq(0)
+            yield
+            self.assertEqual((yield dut.wr_done.status), 1)
+            self.assertEqual((yield dut.rd_done.status), 1)
+
+        run_simulation(dut, generator(dut))
+
+# Test DMAStreamWindow -----------------------------------------------------------------------------
+
+class DMAWindowDUT(Module):
+    def __init__(self):
+        write_port, read_port = new_ports()
+        self.write_port, self.read_port = write_port, read_port
+        self.submodules.dma    = DMAFrontend(write_port, read_port)
+        self.submodules.window = DMAStreamWindow(write_port.data_width)
+        self.comb += [
+            self.window.source.connect(self.dma.sink),
+            self.dma.source.connect(self.window.sink),
+        ]
+
+class TestDMAStreamWindow(unittest.TestCase):
+    def test_window(self):
+        dut    = DMAWindowDUT()
+        mem    = {}
+        prng   = random.Random(42)
+        words  = [prng.randrange(2**32) for _ in range(32)]
+        rwords = []
+
+        def generator(dut):
+            yield dut.dma.wr_base.storage.eq(0)
+            yield dut.dma.wr_length.storage.eq(len(words)//2)
+            yield dut.dma.rd_base.storage.eq(0)
+            yield dut.dma.rd_length.storage.eq(len(words)//2)
+            yield
+            yield dut.dma.wr_start.re.eq(1)
+            yield
+            yield dut.dma.wr_start.re.eq(0)
+            for i, word in enumerate(words):
+                yield from dut.window.bus.write(i, word)
+            while not (yield dut.dma.wr_done.status):
+                yield
+            for i in range(32):
+                yield
+            yield dut.dma.rd_start.re.eq(1)
+            yield
+            yield dut.dma.rd_start.re.eq(0)
+            for i in range(len(words)):
+                rwords.append((yield from dut.window.bus.read(i)))
+
+        run_simulation(dut, [generator(dut),
+            port_memory(dut.write_port, mem, seed=1),
+            port_memory(dut.read_port,  mem, seed=2)])
+        # First word in the LSBs.
+        self.assertEqual(mem[0], words[0] | (words[1] << 32))
+        self.assertEqual(rwords, words)
+
+if __name__ == "__main__":
+    unittest.main()
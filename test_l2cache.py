@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+# Migen simulation of L2Cache: ./test_l2cache.py
+
+import unittest
+import random
+
+from migen import *
+
+from litex.soc.interconnect import wishbone
+
+from litedram.common import LiteDRAMNativePort
+
+from l2cache import L2Cache
+from nativeportmodel import port_memory
+
+# Test L2Cache -------------------------------------------------------------------------------------
+
+class TestL2Cache(unittest.TestCase):
+    data_width = 64
+
+    def cache_test(self, accesses, size=256, line_words=1, nways=1, write_back=True):
+        master = wishbone.Interface()
+        port   = LiteDRAMNativePort("both", address_width=16, data_width=self.data_width)
+        dut    = L2Cache(master, port, size=size, line_words=line_words, nways=nways,
+            write_back=write_back)
+        mem    = {}
+        stats  = {"reads": 0, "writes": 0}
+        values = {}
+        ratio  = self.data_width//32
+        model  = {}
+        errors = []
+
+        def dram_word(adr):
+            return (mem.get(adr//ratio, 0) >> 32*(adr%ratio)) & 0xffffffff
+
+        def generator(dut):
+            for we, adr, data, sel in accesses:
+                if we:
+                    yield from master.write(adr, data, sel)
+                    old = model.get(adr, 0)
+                    for i in range(4):
+                        if sel & (1 << i):
+                            mask = 0xff << 8*i
+                            old  = (old & ~mask) | (data & mask)
+                    model[adr] = old
+                else:
+                    rdata = (yield from master.read(adr))
+                    if rdata != model.get(adr, 0):
+                        errors.append(("read", adr, rdata, model.get(adr, 0)))
+            yield
+            for name in ["hits", "misses", "writebacks"]:
+                values[name] = (yield getattr(dut, name).status)
+
+        run_simulation(dut, [generator(dut), port_memory(port, mem, stats, ready=0.7, wdata_ready=0.7)])
+        self.assertEqual(errors, [])
+        if not write_back:
+            # Write-through: DRAM is up to date.
+            self.assertEqual({adr: dram_word(adr) for adr in model}, model)
+        self.assertEqual(values["hits"] + values["misses"], len(accesses))
+        return values, stats
+
+    def random_accesses(self, n, words, seed=42):
+        prng = random.Random(seed)
+        accesses = []
+        for i in range(n):
+            accesses.append((prng.random() < 0.5, prng.randrange(words), prng.randrange(2**32),
+                prng.choice([0b1111, 0b1111, 0b0001, 0b0110, 0b1000])))
+        # Read back everything at the end (forces evictions and refills of all lines).
+        for adr in range(words):
+            accesses.append((0, adr, 0, 0))
+        return accesses
+
+    def test_direct_mapped(self):
+        values, stats = self.cache_test(self.random_accesses(256, 256))
+        self.assertGreater(values["writebacks"], 0)
+
+    def test_lines(self):
+        values, stats = self.cache_test(self.random_accesses(256, 256), size=512, line_words=4)
+        # Refills are line bursts.
+        self.assertEqual(stats["reads"], 4*values["misses"])
+
+    def test_associative(self):
+        for nways in [2, 4]:
+            self.cache_test(self.random_accesses(256, 256), size=512, line_words=2, nways=nways)
+
+    def test_write_through(self):
+        values, stats = self.cache_test(self.random_accesses(256, 256), size=512, line_words=2,
+            nways=2, write_back=False)
+        self.assertEqual(values["writebacks"], 0)
+
+    def test_hits(self):
+        # Working set fits in the cache: only the first access to each line misses.
+        words    = 128
+        accesses = [(0, adr, 0, 0) for adr in range(words)]*2
+        for size, line_words, nways in [(512, 1, 1), (512, 4, 1), (1024, 2, 4)]:
+            values, stats = self.cache_test(accesses, size, line_words, nways)
+            line_32bit_words = line_words*self.data_width//32
+            self.assertEqual(values["misses"], words//line_32bit_words)
+            self.assertEqual(values["writebacks"], 0)
+
+    def test_conflicts(self):
+        # 2 lines mapping to the same set: thrashing when direct mapped, hits with 2 ways.
+        words    = 256//4
+        accesses = [(0, adr, 0, 0) for adr in [0, words]*8]
+        values, stats = self.cache_test(accesses, size=256, nways=1)
+        self.assertEqual(values["misses"], 16)
+        values, stats = self.cache_test(accesses, size=256, nways=2)
+        self.assertEqual(values["misses"], 2)
+
+if __name__ == "__main__":
+    unittest.main()
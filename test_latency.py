@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+import argparse
+
+from litex import RemoteClient
+
+from hostbatch import BatchClient
+from latencyhistogram import histogram_stats
+
+parser = argparse.ArgumentParser(description="DDR4 read latency histogram (BIST checker)")
+parser.add_argument("--base",      default=0,   help="base address in mB (default=0)")
+parser.add_argument("--length",    default=128, help="length in mB (default=128)")
+parser.add_argument("--random",    action="store_true", help="random addresses")
+parser.add_argument("--bin-shift", default=2,   help="histogram bins of 2**bin_shift cycles (default=2)")
+args = parser.parse_args()
+
+wb = RemoteClient()
+wb.open()
+bus = BatchClient(wb)
+
+# # #
+
+# FPGA ID ------------------------------------------------------------------------------------------
+fpga_id = ""
+for data in bus.read(wb.bases.identifier_mem, 256):
+    c = chr(data & 0xff)
+    if c == "\0":
+        break
+    fpga_id += c
+print("FPGA: " + fpga_id)
+
+# Check DDR4 calibration ---------------------------------------------------------------------------
+if wb.regs.ddr4_phy_calib_done.read() != 1:
+    print("DDR4 calibration failed, exiting.")
+    wb.close()
+    exit(0)
+else:
+    print("DDR4 calibration successful, continue.")
+
+# Measure read latency -----------------------------------------------------------------------------
+mB = 1024*1024
+
+wb.regs.sdram_dfii_control.write(1) # hardware control
+
+base   = int(args.base)*mB
+length = int(args.length)*mB
+for name in ["sdram_generator", "sdram_checker"]:
+    if name == "sdram_checker":
+        wb.regs.sdram_checker_latency_reset.write(1)
+    bus.queue(getattr(wb.regs, name + "_reset"), 1)
+    bus.queue(getattr(wb.regs, name + "_reset"), 0)
+    bus.queue(getattr(wb.regs, name + "_base"), base)
+    bus.queue(getattr(wb.regs, name + "_end"), base + length)
+    bus.queue(getattr(wb.regs, name + "_length"), length)
+    bus.queue(getattr(wb.regs, name + "_random"), int(args.random))
+    bus.queue(getattr(wb.regs, name + "_start"), 1)
+    bus.flush()
+    bus.poll(getattr(wb.regs, name + "_done"))
+
+# Download histogram -------------------------------------------------------------------------------
+nbins = 0
+while hasattr(wb.regs, "sdram_checker_latency_bin{}".format(nbins)):
+    nbins += 1
+values = bus.read_regs(
+    wb.regs.sdram_checker_latency_count,
+    wb.regs.sdram_checker_latency_sum,
+    wb.regs.sdram_checker_latency_min,
+    wb.regs.sdram_checker_latency_max,
+    *[getattr(wb.regs, "sdram_checker_latency_bin{}".format(n)) for n in range(nbins)])
+count, total, minimum, maximum, bins = values[0], values[1], values[2], values[3], values[4:]
+
+# Print histogram ----------------------------------------------------------------------------------
+bin_shift = int(args.bin_shift)
+cycle_ns  = 1e9/wb.constants.config_clock_frequency
+stats     = histogram_stats(bins, bin_shift, count, total, minimum, maximum)
+print("\nRead latency (sys_clk cycles, {:.2f}ns):".format(cycle_ns))
+print("-"*40)
+for name in ["count", "min", "max", "mean", "p50", "p90", "p99"]:
+    if name == "count":
+        print("{:>6s}: {:d}".format(name, stats[name]))
+    else:
+        print("{:>6s}: {:8.2f} ({:.1f}ns)".format(name, stats[name], stats[name]*cycle_ns))
+print("")
+peak = max(bins + [1])
+for n, b in enumerate(bins):
+    if b == 0:
+        continue
+    low  = n*2**bin_shift
+    high = "+" if n == nbins - 1 else "-{}".format((n + 1)*2**bin_shift - 1)
+    print("{:>5d}{:<5s} {:10d} {}".format(low, high, b, "#"*(50*b//peak)))
+
+# # #
+
+wb.close()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+# Migen simulation of LatencyHistogram (LiteDRAM + USDDR4MIGPHY model): ./test_latencyhistogram.py
+
+import unittest
+import random
+
+from migen import *
+
+from litedram.modules import EDY4016A
+from litedram.core import LiteDRAMCore
+
+from usddr4migphy import USDDR4MIGPHY
+from usddr4migphymodel import ddr4_model_pads
+from latencyhistogram import LatencyHistogram, histogram_stats
+
+# Test LatencyHistogram ----------------------------------------------------------------------------
+
+class DUT(Module):
+    def __init__(self, sys_clk_freq=int(200e6), **kwargs):
+        self.submodules.phy = phy = USDDR4MIGPHY(None, ddr4_model_pads(16),
+            simulation = True,
+            databits   = 16,
+            sim_model  = {"calib_delay": 16, "mem_depth": 64})
+        module = EDY4016A(sys_clk_freq, "1:4")
+        self.submodules.core = core = LiteDRAMCore(phy,
+            module.geom_settings,
+            module.timing_settings,
+            sys_clk_freq)
+        self.submodules.histogram = LatencyHistogram(core.crossbar.get_port(), **kwargs)
+
+class TestLatencyHistogram(unittest.TestCase):
+    def histogram_test(self, n=32, seed=42, **kwargs):
+        dut       = DUT(**kwargs)
+        port      = dut.histogram.port
+        prng      = random.Random(seed)
+        latencies = []
+        values    = {}
+
+        def generator(dut):
+            while not (yield dut.phy.calib_done.status):
+                yield
+            yield dut.core.dfii._control.storage.eq(0b1111) # Hardware control.
+            yield port.rdata.ready.eq(1)
+            timestamps = []
+            cycle      = 0
+            reads      = 0
+            while len(latencies) < n:
+                # Random reads, with random gaps.
+                if reads < n and prng.random() < 0.5:
+                    yield port.cmd.valid.eq(1)
+                    yield port.cmd.we.eq(0)
+                    yield port.cmd.addr.eq(prng.randrange(2**len(port.cmd.addr)))
+                else:
+                    yield port.cmd.valid.eq(0)
+                yield
+                cycle += 1
+                if (yield port.cmd.valid) and (yield port.cmd.ready):
+                    timestamps.append(cycle)
+                    reads += 1
+                if (yield port.rdata.valid) and (yield port.rdata.ready):
+                    latencies.append(cycle - timestamps.pop(0))
+            yield port.cmd.valid.eq(0)
+            for _ in range(4):
+                yield
+            for name in ["count", "sum", "min", "max"]:
+                values[name] = (yield getattr(dut.histogram, name).status)
+            values["bins"] = []
+            for i in range(dut.histogram.nbins):
+                values["bins"].append((yield getattr(dut.histogram, "bin{}".format(i)).status))
+
+        run_simulation(dut, generator(dut))
+        return dut.histogram, latencies, values
+
+    def test_histogram(self):
+        histogram, latencies, values = self.histogram_test(nbins=16, bin_shift=2)
+        self.assertEqual(values["count"], len(latencies))
+        self.assertEqual(values["sum"],   sum(latencies))
+        self.assertEqual(values["min"],   min(latencies))
+        self.assertEqual(values["max"],   max(latencies))
+        bins = [0]*histogram.nbins
+        for latency in latencies:
+            bins[min(latency >> histogram.bin_shift, histogram.nbins - 1)] += 1
+        self.assertEqual(values["bins"], bins)
+
+    def test_histogram_stats(self):
+        # 98 latencies of 10 cycles, 2 of 33 cycles (bins of 4 cycles).
+        bins = [0]*16
+        bins[2] = 98
+        bins[8] = 2
+        stats = histogram_stats(bins, 2, 100, 98*10 + 2*33, 10, 33)
+        self.assertEqual(stats["mean"], 10.46)
+        self.assertEqual(stats["p50"], 11)
+        self.assertEqual(stats["p99"], 33)
+        # Last bin: upper bound is max.
+        bins = [0]*16
+        bins[15] = 1
+        self.assertEqual(histogram_stats(bins, 2, 1, 200, 200, 200)["p99"], 200)
+        # Empty histogram (min CSR at its reset value) or no bins.
+        stats = histogram_stats([0]*16, 2, 0, 0, 2**32-1, 0)
+        self.assertEqual((stats["mean"], stats["min"], stats["max"], stats["p99"]), (0, 0, 0, 0))
+        self.assertEqual(histogram_stats([], 2, 0, 0, 2**32-1, 0)["p50"], 0)
+        self.assertEqual(histogram_stats([], 2, 3, 30, 8, 12)["p50"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+# Migen simulation of QoSArbiter/AXIQoSFrontend: ./test_qosarbiter.py
+
+import unittest
+import random
+
+from migen import *
+from migen.sim import passive
+
+from litedram.common import LiteDRAMNativePort
+
+from qosarbiter import QoSArbiter, AXIQoSFrontend
+from nativeportmodel import port_memory
+
+# Test QoSArbiter ----------------------------------------------------------------------------------
+
+def port_master(port, accesses, results, gap=0):
+    """Native port master: issues accesses ((we, addr, data), gap cycles between commands),
+    drives write data in command order and records read data and per access latency (command
+    presented to data returned)."""
+    pending   = []
+    cycle     = 0
+    issue     = 0
+    presented = None
+    yield port.rdata.ready.eq(1)
+    while issue < len(accesses) or pending:
+        if issue < len(accesses) and cycle >= issue*(gap + 1):
+            we, addr, data = accesses[issue]
+            if presented is None:
+                presented = cycle
+            yield port.cmd.valid.eq(1)
+            yield port.cmd.we.eq(we)
+            yield port.cmd.addr.eq(addr)
+        else:
+            yield port.cmd.valid.eq(0)
+        writes = [p for p in pending if p[0]]
+        yield port.wdata.valid.eq(len(writes) > 0)
+        yield port.wdata.data.eq(writes[0][2] if writes else 0)
+        yield port.wdata.we.eq(2**len(port.wdata.we) - 1)
+        yield
+        cycle += 1
+        if (yield port.cmd.valid) and (yield port.cmd.ready):
+            we, addr, data = accesses[issue]
+            pending.append((we, addr, data, presented))
+            issue    += 1
+            presented = None
+        if (yield port.wdata.valid) and (yield port.wdata.ready):
+            p = writes[0]
+            pending.remove(p)
+            results.append(("w", p[1], p[2], cycle - p[3]))
+        if (yield port.rdata.valid) and (yield port.rdata.ready):
+            p = [p for p in pending if not p[0]][0]
+            pending.remove(p)
+            results.append(("r", p[1], (yield port.rdata.data), cycle - p[3]))
+    yield port.cmd.valid.eq(0)
+    yield port.wdata.valid.eq(0)
+
+@passive
+def outstanding_monitor(port, peak):
+    outstanding = 0
+    while True:
+        yield
+        if (yield port.cmd.valid) and (yield port.cmd.ready):
+            outstanding += 1
+        if (yield port.rdata.valid) and (yield port.rdata.ready):
+            outstanding -= 1
+        if (yield port.wdata.valid) and (yield port.wdata.ready):
+            outstanding -= 1
+        peak[0] = max(peak[0], outstanding)
+
+class TestQoSArbiter(unittest.TestCase):
+    def arbiter_test(self, traffic, priorities=None, limits=None, latency=8, ready=1.0):
+        nports = len(traffic)
+        port   = LiteDRAMNativePort("both", address_width=16, data_width=32)
+        dut    = QoSArbiter(port, nports=nports, max_outstanding=16)
+        mem    = {}
+        results = [[] for n in range(nports)]
+        peaks   = [[0] for n in range(nports)]
+        values  = {}
+
+        done    = [False]*nports
+
+        def master(n):
+            # Wait for the configuration.
+            yield
+            yield
+            accesses, gap = traffic[n]
+            yield from port_master(dut.ports[n], accesses, results[n], gap)
+            done[n] = True
+
+        def generator(dut):
+            for n in range(nports):
+                if priorities is not None:
+                    yield getattr(dut, "port{}_priority".format(n)).storage.eq(priorities[n])
+                if limits is not None:
+                    yield getattr(dut, "port{}_max_outstanding".format(n)).storage.eq(limits[n])
+            while not all(done):
+                yield
+            for i in range(4):
+                yield
+            for n in range(nports):
+                for name in ["reads", "writes", "stalls"]:
+                    values[(n, name)] = (yield getattr(dut, "port{}_{}".format(n, name)).status)
+
+        generators = [generator(dut), port_memory(port, mem, latency=latency, ready=ready)]
+        generators += [master(n) for n in range(nports)]
+        generators += [outstanding_monitor(dut.ports[n], peaks[n]) for n in range(nports)]
+        run_simulation(dut, generators)
+        for n in range(nports):
+            accesses = traffic[n][0]
+            self.assertEqual(len(results[n]), len(accesses))
+            self.assertEqual(values[(n, "reads")],  sum(not we for we, _, _ in accesses))
+            self.assertEqual(values[(n, "writes")], sum(we     for we, _, _ in accesses))
+        return results, values, [peak[0] for peak in peaks]
+
+    def test_routing(self):
+        # Each port writes then reads back its own region: data routed to the right port.
+        prng    = random.Random(42)
+        traffic = []
+        for n in range(3):
+            datas    = [prng.randrange(2**32) for _ in range(16)]
+            accesses  = [(1, 0x100*n + i, data) for i, data in enumerate(datas)]
+            accesses += [(0, 0x100*n + i, 0) for i in range(16)]
+            traffic.append((accesses, 0))
+        results, values, peaks = self.arbiter_test(traffic, ready=0.6)
+        for n in range(3):
+            datas  = [data for we, addr, data in traffic[n][0] if we]
+            rdatas = [data for kind, addr, data, latency in results[n] if kind == "r"]
+            self.assertEqual(rdatas, datas)
+
+    def test_round_robin(self):
+        # Saturating ports with equal priority: commands interleaved, same stalls.
+        traffic = [([(0, 0x100*n + i, 0) for i in range(32)], 0) for n in range(2)]
+        results, values, peaks = self.arbiter_test(traffic, limits=[16, 16])
+        self.assertLessEqual(abs(values[(0, "stalls")] - values[(1, "stalls")]), 2)
+
+    def test_priority(self):
+        # High priority port never waits for the low priority one.
+        traffic = [([(0, 0x100*n + i, 0) for i in range(32)], 0) for n in range(2)]
+        results, values, peaks = self.arbiter_test(traffic, priorities=[0, 1], limits=[16, 16])
+        self.assertEqual(values[(1, "stalls")], 0)
+        self.assertGreaterEqual(values[(0, "stalls")], 32)
+
+    def test_max_outstanding(self):
+        # Reads (writes complete as soon as the write data is consumed).
+        traffic = [([(0, 0x100*n + i, 0) for i in range(32)], 0) for n in range(2)]
+        results, values, peaks = self.arbiter_test(traffic, limits=[2, 5], latency=16)
+        self.assertEqual(peaks, [2, 5])
+
+    def test_latency_isolation(self):
+        # Sparse reads on port 0 against 2 streaming ports on a loaded controller (cmd.ready 50%):
+        # with a higher priority, port 0 only waits for the controller, not for the other ports.
+        traffic  = [([(0, i, 0) for i in range(16)], 15)]
+        traffic += [([(n % 2, 0x100*n + i, i) for i in range(128)], 0) for n in [1, 2]]
+        latencies = {}
+        for name, priorities in [("equal", [0, 0, 0]), ("high", [1, 0, 0])]:
+            results, values, peaks = self.arbiter_test(traffic, priorities, latency=16, ready=0.5)
+            latencies[name] = [latency for kind, addr, data, latency in results[0]]
+        mean = {name: sum(l)/len(l) for name, l in latencies.items()}
+        self.assertLess(mean["high"] + 1, mean["equal"])
+
+# Test AXIQoSFrontend ------------------------------------------------------------------------------
+
+def axi_write(axi, addr, data):
+    yield axi.aw.valid.eq(1)
+    yield axi.aw.addr.eq(addr)
+    yield axi.aw.len.eq(0)
+    yield axi.aw.size.eq(log2_int(len(axi.w.data)//8))
+    yield axi.aw.burst.eq(0b01)
+    yield axi.w.valid.eq(1)
+    yield axi.w.data.eq(data)
+    yield axi.w.strb.eq(2**len(axi.w.strb) - 1)
+    yield axi.w.last.eq(1)
+    yield axi.b.ready.eq(1)
+    aw_done, w_done = False, False
+    while not (aw_done and w_done):
+        yield
+        if (yield axi.aw.ready):
+            aw_done = True
+            yield axi.aw.valid.eq(0)
+        if (yield axi.w.ready):
+            w_done = True
+            yield axi.w.valid.eq(0)
+    while not (yield axi.b.valid):
+        yield
+    yield
+    yield axi.b.ready.eq(0)
+
+def axi_read(axi, addr):
+    yield axi.ar.valid.eq(1)
+    yield axi.ar.addr.eq(addr)
+    yield axi.ar.len.eq(0)
+    yield axi.ar.size.eq(log2_int(len(axi.r.data)//8))
+    yield axi.ar.burst.eq(0b01)
+    yield axi.r.ready.eq(1)
+    yield
+    while not (yield axi.ar.ready):
+        yield
+    yield axi.ar.valid.eq(0)
+    while not (yield axi.r.valid):
+        yield
+    data = (yield axi.r.data)
+    yield
+    yield axi.r.ready.eq(0)
+    return data
+
+class TestAXIQoSFrontend(unittest.TestCase):
+    def test_axi(self):
+        port = LiteDRAMNativePort("both", address_width=16, data_width=32)
+        dut  = AXIQoSFrontend(port, nports=2)
+        mem  = {}
+        prng = random.Random(42)
+        datas  = [[prng.randrange(2**32) for _ in range(8)] for n in range(2)]
+        rdatas = [[] for n in range(2)]
+
+        def master(n):
+            for i, data in enumerate(datas[n]):
+                yield from axi_write(dut.axi[n], 4*(0x100*n + i), data)
+            for i in range(len(datas[n])):
+                rdatas[n].append((yield from axi_read(dut.axi[n], 4*(0x100*n + i))))
+
+        run_simulation(dut, [master(0), master(1), port_memory(port, mem, ready=0.7)])
+        self.assertEqual(rdatas, datas)
+        self.assertEqual(mem[0x100 + 7], datas[1][7])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+import time
+import argparse
+
+from litex import RemoteClient
+
+from hostbatch import BatchClient
+from ddr4refresher import fgr_modes, mig_mr3, get_fgr_mr3
+
+parser = argparse.ArgumentParser(description="DDR4 refresh management (FGR mode, postponing, counters)")
+parser.add_argument("--fgr",      default=None, choices=fgr_modes, help="Fine Granularity Refresh mode")
+parser.add_argument("--mr3",      default=mig_mr3,
+    help="MR3 programmed by the MIG, FGR field replaced (default=0x{:04x})".format(mig_mr3))
+parser.add_argument("--postpone", default=None, help="max postponed refreshes (1x mode, max 8)")
+parser.add_argument("--pull-in",  default=None, help="refreshes issued in advance when idle")
+parser.add_argument("--interval", default=1.0,  help="update interval in s (default=1)")
+parser.add_argument("--count",    default=0,    help="number of updates (default=0: forever)")
+args = parser.parse_args()
+
+wb = RemoteClient()
+wb.open()
+bus = BatchClient(wb)
+
+# # #
+
+# FPGA ID ------------------------------------------------------------------------------------------
+fpga_id = ""
+for data in bus.read(wb.bases.identifier_mem, 256):
+    c = chr(data & 0xff)
+    if c == "\0":
+        break
+    fpga_id += c
+print("FPGA: " + fpga_id)
+
+# Fine Granularity Refresh -------------------------------------------------------------------------
+dfii_cs  = 0b000001
+dfii_we  = 0b000010
+dfii_cas = 0b000100
+dfii_ras = 0b001000
+
+def dfii_command(command, address=0, bank=0):
+    bus.queue(wb.regs.sdram_dfii_pi0_address,  address)
+    bus.queue(wb.regs.sdram_dfii_pi0_baddress, bank)
+    bus.queue(wb.regs.sdram_dfii_pi0_command,  command)
+    bus.queue(wb.regs.sdram_dfii_pi0_command_issue, 1)
+
+if args.fgr is not None:
+    # Switch the DRAM (MR3, bank 3) and the refresher to the new mode with the controller stopped:
+    # software control (cke/odt/reset_n), precharge all, MRS, back to hardware control. The MRS
+    # rewrites the whole MR3: the other fields are kept from the MIG setting (--mr3).
+    mr3 = get_fgr_mr3(args.fgr, int(str(args.mr3), 0))
+    bus.queue(wb.regs.sdram_dfii_control, 0b1110)
+    dfii_command(dfii_ras | dfii_we | dfii_cs, address=2**10)
+    dfii_command(dfii_ras | dfii_cas | dfii_we | dfii_cs, address=mr3, bank=3)
+    bus.queue(wb.regs.sdram_refresher_fgr, fgr_modes.index(args.fgr))
+    bus.queue(wb.regs.sdram_dfii_control, 0b1111)
+    bus.flush()
+if args.postpone is not None:
+    wb.regs.sdram_refresher_postpone.write(int(args.postpone))
+if args.pull_in is not None:
+    wb.regs.sdram_refresher_pull_in.write(int(args.pull_in))
+
+fgr, postpone, pull_in = bus.read_regs(wb.regs.sdram_refresher_fgr,
+    wb.regs.sdram_refresher_postpone, wb.regs.sdram_refresher_pull_in)
+print("FGR: {}, postpone: {} ({} refreshes), pull-in: {}".format(
+    fgr_modes[fgr], postpone, postpone << fgr, pull_in))
+
+# Refresh counters ---------------------------------------------------------------------------------
+counters = ["refreshes", "postponed", "forced", "pulled_in", "max_pending"]
+regs     = [getattr(wb.regs, "sdram_refresher_" + name) for name in counters]
+clk_freq = wb.constants.config_clock_frequency
+
+print("  REF/S  POSTPONED/S  FORCED/S  PULLED_IN/S  MAX_PENDING")
+last  = dict(zip(counters, bus.read_regs(*regs)))
+start = time.time()
+n     = 0
+while int(args.count) == 0 or n < int(args.count):
+    time.sleep(float(args.interval))
+    values = dict(zip(counters, bus.read_regs(*regs)))
+    now    = time.time()
+    delta  = {name: (values[name] - last[name]) & 0xffffffff for name in counters}
+    secs   = now - start
+    last   = values
+    start  = now
+    n     += 1
+    print("{:7.0f} {:12.0f} {:9.0f} {:12.0f} {:12d}".format(
+        delta["refreshes"]/secs,
+        delta["postponed"]/secs,
+        delta["forced"]/secs,
+        delta["pulled_in"]/secs,
+        values["max_pending"]))
+
+# # #
+
+wb.close()
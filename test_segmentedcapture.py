@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+# Migen simulation of SegmentedCapture and DFI decoder tests: ./test_segmentedcapture.py
+
+import unittest
+
+from migen import *
+
+from segmentedcapture import SegmentedCapture, unroll_segments
+from dfidecoder import decode_dfi
+
+# Test SegmentedCapture ----------------------------------------------------------------------------
+
+class DUT(Module):
+    def __init__(self, **kwargs):
+        self.counter = counter = Signal(16)
+        self.event   = event   = Signal()
+        wide = Signal(40)
+        div  = Signal(4)
+        self.sync += [
+            counter.eq(counter + 1),
+            div.eq(Mux(div == 12, 0, div + 1)),
+        ]
+        self.comb += [
+            event.eq(div == 0), # counter%13 == 0.
+            wide.eq(counter*0x1234567),
+        ]
+        self.fields = [("event", event), ("counter", counter), ("wide", wide)]
+        self.submodules.capture = SegmentedCapture(self.fields, csr_csv=None, **kwargs)
+
+class TestSegmentedCapture(unittest.TestCase):
+    def capture_test(self, depth=8, nsegments=4, offset=2, edge=1, length=None):
+        dut = DUT(depth=depth, nsegments=nsegments)
+        capture  = dut.capture
+        segments = []
+
+        def decode(data):
+            sample = {}
+            for name, s in dut.fields:
+                sample[name] = data & (2**len(s) - 1)
+                data >>= len(s)
+            return sample
+
+        def generator(dut):
+            yield capture.offset.storage.eq(offset)
+            if length is not None:
+                yield capture.length.storage.eq(length)
+            yield capture.trigger_mask.storage.eq(0b1)
+            yield capture.trigger_value.storage.eq(0b1)
+            yield capture.trigger_edge.storage.eq(edge)
+            yield
+            yield capture.start.re.eq(1)
+            yield
+            yield capture.start.re.eq(0)
+            yield
+            while not (yield capture.done.status):
+                yield
+            count = (yield capture.count.status)
+            datas = []
+            for adr in range(count*depth*capture.words):
+                datas.append((yield from capture.bus.read(adr)))
+            infos = []
+            for adr in range(2*count):
+                infos.append((yield from capture.bus.read(nsegments*depth*capture.words + adr)))
+            segments.extend(unroll_segments(datas, infos, depth, capture.words, offset, decode))
+
+        run_simulation(dut, generator(dut))
+        return capture, segments
+
+    def test_segments(self):
+        capture, segments = self.capture_test()
+        self.assertEqual(capture.words, 2)
+        self.assertEqual(len(segments), 4)
+        for timestamp, samples in segments:
+            self.assertEqual(len(samples), 8)
+            # Trigger at offset, consecutive samples.
+            self.assertEqual(samples[2]["event"], 1)
+            self.assertEqual(samples[2]["counter"]%13, 0)
+            for i, sample in enumerate(samples):
+                self.assertEqual(sample["counter"], samples[0]["counter"] + i)
+                self.assertEqual(sample["wide"], (sample["counter"]*0x1234567) & (2**40 - 1))
+        # Segments on consecutive events, timestamps match the events spacing.
+        for (t0, s0), (t1, s1) in zip(segments, segments[1:]):
+            self.assertEqual(s1[2]["counter"] - s0[2]["counter"], 13)
+            self.assertEqual(t1 - t0, 13)
+
+    def test_segments_length(self):
+        capture, segments = self.capture_test(offset=7, length=2)
+        self.assertEqual(len(segments), 2)
+        for timestamp, samples in segments:
+            self.assertEqual(samples[7]["event"], 1)
+
+    def test_segments_level(self):
+        # Level trigger: event is never high on 2 consecutive cycles, use offset 0 so that each
+        # segment is armed immediately.
+        capture, segments = self.capture_test(offset=0, edge=0)
+        for timestamp, samples in segments:
+            self.assertEqual(samples[0]["event"], 1)
+
+# Test DFI Decoder ---------------------------------------------------------------------------------
+
+def dfi_sample(phases):
+    sample = {}
+    for n in range(4):
+        cmd, bank, address = phases.get(n, ("nop", 0, 0))
+        ras_n, cas_n, we_n = {"nop": (1, 1, 1), "act": (0, 1, 1), "rd": (1, 0, 1),
+            "wr": (1, 0, 0), "pre": (0, 1, 0), "ref": (0, 0, 1)}[cmd]
+        sample.update({
+            "p{}_cs_n".format(n):    int(cmd == "nop"),
+            "p{}_act_n".format(n):   1,
+            "p{}_ras_n".format(n):   ras_n,
+            "p{}_cas_n".format(n):   cas_n,
+            "p{}_we_n".format(n):    we_n,
+            "p{}_bank".format(n):    bank,
+            "p{}_address".format(n): address,
+        })
+    return sample
+
+class TestDFIDecoder(unittest.TestCase):
+    def test_decode(self):
+        samples = [
+            dfi_sample({3: ("act", 0b110, 0x1234)}),
+            dfi_sample({}),
+            dfi_sample({0: ("rd", 0b110, 0x0408), 2: ("wr", 0b001, 0x0010)}),
+            dfi_sample({1: ("pre", 0, 0x400), 3: ("ref", 0, 0)}),
+        ]
+        trace = decode_dfi(samples, start=10)
+        self.assertEqual([(e["tck"], e["cmd"]) for e in trace],
+            [(43, "ACT"), (48, "RD"), (50, "WR"), (53, "PRE"), (55, "REF")])
+        self.assertEqual((trace[0]["bg"], trace[0]["ba"], trace[0]["row"]), (1, 2, 0x1234))
+        self.assertEqual((trace[1]["col"], trace[1]["ap"]), (0x008, 1))
+        self.assertEqual((trace[2]["bg"], trace[2]["ba"], trace[2]["col"], trace[2]["ap"]), (0, 1, 0x010, 0))
+        self.assertEqual(trace[3]["ap"], 1) # Precharge all.
+        # ACT from act_n (PHY side).
+        sample = dfi_sample({0: ("nop", 0, 0x20)})
+        sample.update({"p0_cs_n": 0, "p0_act_n": 0, "p0_ras_n": 0, "p0_cas_n": 0, "p0_we_n": 0})
+        self.assertEqual([(e["cmd"], e["row"]) for e in decode_dfi([sample])], [("ACT", 0x20)])
+
+if __name__ == "__main__":
+    unittest.main()
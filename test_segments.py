@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+import argparse
+
+from litex import RemoteClient
+
+from hostbatch import BatchClient
+from segmentedcapture import SegmentedCaptureDriver
+from dfidecoder import decode_dfi, format_dfi
+
+parser = argparse.ArgumentParser(description="DDR4 segmented DFI capture and command decoding")
+parser.add_argument("trigger", choices=["read", "write", "now"], help="segments trigger")
+parser.add_argument("--offset",   default=8,    help="samples before the trigger (default=8)")
+parser.add_argument("--segments", default=None, help="number of segments (default=all)")
+parser.add_argument("--timeout",  default=10,   help="capture timeout in s (default=10)")
+parser.add_argument("--raw",      action="store_true", help="dump raw samples")
+args = parser.parse_args()
+
+wb = RemoteClient()
+wb.open()
+bus = BatchClient(wb)
+
+# # #
+
+# FPGA ID ------------------------------------------------------------------------------------------
+fpga_id = ""
+for data in bus.read(wb.bases.identifier_mem, 256):
+    c = chr(data & 0xff)
+    if c == "\0":
+        break
+    fpga_id += c
+print("FPGA: " + fpga_id)
+
+# Segmented capture --------------------------------------------------------------------------------
+clk_freq = wb.constants.config_clock_frequency
+offset   = int(args.offset)
+segments = SegmentedCaptureDriver(wb, bus, "segments", "segments.csv")
+cond = {
+    "read":  {"rd_cas": 1},
+    "write": {"wr_cas": 1},
+    "now":   {},
+}[args.trigger]
+segments.run(cond,
+    edge      = args.trigger != "now",
+    offset    = offset,
+    nsegments = None if args.segments is None else int(args.segments))
+segments.wait(timeout=float(args.timeout))
+
+for n, (timestamp, samples) in enumerate(segments.upload()):
+    print("segment {:d} @ {:.3f}us".format(n, timestamp*1e6/clk_freq))
+    if args.raw:
+        for i, sample in enumerate(samples):
+            print("{:4d} ".format(i - offset) + " ".join("{}={:x}".format(k, v)
+                for k, v in sample.items()))
+    print(format_dfi(decode_dfi(samples, start=-offset)))
+
+# # #
+
+wb.close()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+# Migen simulation of TrafficGenerator: ./test_trafficgenerator.py
+
+import unittest
+import random
+
+from migen import *
+from migen.sim import passive
+
+from litedram.common import LiteDRAMNativePort
+
+from trafficgenerator import TrafficGenerator, traffic_patterns
+
+# Test TrafficGenerator ----------------------------------------------------------------------------
+
+@passive
+def port_responder(port, accesses, stats, latency=8, seed=42):
+    """Native port model: random cmd.ready, read data returned latency cycles after the command,
+    write data consumed in order."""
+    prng   = random.Random(seed)
+    reads  = []
+    writes = 0
+    cycle  = 0
+    while True:
+        yield port.cmd.ready.eq(prng.random() < 0.7)
+        yield port.rdata.valid.eq(len(reads) > 0 and reads[0] <= cycle)
+        yield port.wdata.ready.eq(writes > 0)
+        yield
+        cycle += 1
+        if (yield port.cmd.valid) and (yield port.cmd.ready):
+            we = (yield port.cmd.we)
+            accesses.append((we, (yield port.cmd.addr)))
+            if we:
+                writes += 1
+            else:
+                reads.append(cycle + latency)
+        if (yield port.rdata.valid) and (yield port.rdata.ready):
+            reads.pop(0)
+        if (yield port.wdata.valid) and (yield port.wdata.ready):
+            writes -= 1
+        stats["outstanding"] = max(stats["outstanding"], len(reads) + writes)
+
+class TestTrafficGenerator(unittest.TestCase):
+    colbits = 4
+
+    def traffic_test(self, pattern, length=64, base=0x1000, end=0x2000, stride=0, page_hit=0,
+        write_ratio=0, outstanding=None, latency=8):
+        port     = LiteDRAMNativePort("both", address_width=16, data_width=32)
+        dut      = TrafficGenerator(port, self.colbits, depth=8)
+        accesses = []
+        stats    = {"outstanding": 0}
+        values   = {}
+
+        def generator(dut):
+            yield dut.pattern.storage.eq(traffic_patterns.index(pattern))
+            yield dut.base.storage.eq(base)
+            yield dut.end.storage.eq(end)
+            yield dut.length.storage.eq(length)
+            yield dut.stride.storage.eq(stride)
+            yield dut.page_hit.storage.eq(page_hit)
+            yield dut.write_ratio.storage.eq(write_ratio)
+            if outstanding is not None:
+                yield dut.outstanding.storage.eq(outstanding)
+            yield
+            yield dut.start.re.eq(1)
+            yield
+            yield dut.start.re.eq(0)
+            while not (yield dut.done.status):
+                yield
+            for name in ["ticks", "reads", "writes"]:
+                values[name] = (yield getattr(dut, name).status)
+
+        run_simulation(dut, [generator(dut), port_responder(port, accesses, stats, latency)])
+        # Accesses are native port words (4 bytes).
+        self.assertEqual(len(accesses), length)
+        self.assertEqual(values["writes"], sum(we for we, addr in accesses))
+        self.assertEqual(values["reads"],  sum(not we for we, addr in accesses))
+        self.assertGreater(values["ticks"], length)
+        for we, addr in accesses:
+            self.assertTrue(base//4 <= addr < end//4)
+        return [addr - base//4 for we, addr in accesses], values, stats
+
+    def test_linear(self):
+        offsets, values, stats = self.traffic_test("linear", length=4096//4 + 16)
+        self.assertEqual(offsets, [i%(4096//4) for i in range(4096//4 + 16)])
+        self.assertEqual(values["writes"], 0)
+
+    def test_strided(self):
+        offsets, values, stats = self.traffic_test("strided", stride=64*4)
+        self.assertEqual(offsets, [(64*i)%(4096//4) for i in range(64)])
+
+    def test_random(self):
+        offsets, values, stats = self.traffic_test("random", length=128)
+        self.assertGreater(len(set(offsets)), 96)
+
+    def test_page(self):
+        pages = lambda offsets: [o >> self.colbits for o in offsets]
+        for page_hit, low, high in [(256, 1.0, 1.0), (192, 0.6, 0.9), (0, 0.0, 0.1)]:
+            offsets, values, stats = self.traffic_test("page", length=256, page_hit=page_hit)
+            p    = pages(offsets)
+            hits = sum(p[i] == p[i - 1] for i in range(1, len(p)))/(len(p) - 1)
+            self.assertTrue(low <= hits <= high, (page_hit, hits))
+
+    def test_write_ratio(self):
+        offsets, values, stats = self.traffic_test("random", write_ratio=256)
+        self.assertEqual(values["reads"], 0)
+        offsets, values, stats = self.traffic_test("random", length=256, write_ratio=128)
+        self.assertTrue(0.35 <= values["writes"]/256 <= 0.65)
+
+    def test_outstanding(self):
+        for outstanding in [1, 2, 8]:
+            offsets, values, stats = self.traffic_test("random", write_ratio=64,
+                outstanding=outstanding, latency=32)
+            self.assertEqual(stats["outstanding"], outstanding)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,767 @@
+#!/usr/bin/env python3
+
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+# Migen simulation of USDDR4MIGPHY (no Vivado/Verilator needed): ./test_usddr4migphy.py
+
+import os
+import tempfile
+import unittest
+import random
+
+from migen import *
+from migen.sim import passive
+
+from litedram.common import get_sys_latency
+from litedram.modules import EDY4016A
+from litedram.core import LiteDRAMCore
+
+from usddr4migphy import USDDR4MIGPHY, get_ddr4_cl_cwl, get_ddr4_rank_tccd, check_mig_xci
+from usddr4migphy import perf_counters
+from usddr4migphymodel import ddr4_model_pads
+
+# Helpers ------------------------------------------------------------------------------------------
+
+def dfi_to_slots(phases_data, width):
+    """Reference packing of DFI data (2 beats/phase) to MIG data (8 beats/bit, bit-major)."""
+    slots = 0
+    for i in range(width):
+        for beat in range(8):
+            phase, half = beat//2, beat%2
+            bit = (phases_data[phase] >> (half*width + i)) & 0b1
+            slots |= bit << (8*i + beat)
+    return slots
+
+def slots_to_dfi(slots, width, nphases=4):
+    """Reference unpacking of MIG data (8 beats/bit, bit-major) to DFI data (2 beats/phase)."""
+    phases_data = [0]*nphases
+    for i in range(width):
+        for beat in range(8):
+            phase, half = beat//2, beat%2
+            bit = (slots >> (8*i + beat)) & 0b1
+            phases_data[phase] |= bit << (half*width + i)
+    return phases_data
+
+def dbi_encode(slots, width):
+    """Reference DDR4 write DBI of MIG data: bytes with more than 4 zeros are inverted, DBI_n low."""
+    dbi_n = 0
+    for i in range(width//8):
+        for beat in range(8):
+            byte = [(slots >> (8*(8*i + j) + beat)) & 0b1 for j in range(8)]
+            if sum(byte) < 4:
+                for j in range(8):
+                    slots ^= 1 << (8*(8*i + j) + beat)
+            else:
+                dbi_n |= 1 << (8*i + beat)
+    return slots, dbi_n
+
+# MIG/DFI Write Models -----------------------------------------------------------------------------
+
+@passive
+def mig_write_generator(dut, latency, received, requests=None):
+    """MIG write handshake: wrDataEn/wrDataAddr latency cycles after mcWrCAS, data sampled on the
+    next cycle."""
+    cycle   = 0
+    pending = []
+    sample  = False
+    while True:
+        if sample:
+            received.append(((yield dut.wr_data), (yield dut.wr_data_mask)))
+        if (yield dut.mc_wr_cas):
+            pending.append((cycle + latency, (yield dut.wr_buf_adr)))
+        sample = (yield dut.wr_data_en)
+        if sample and requests is not None:
+            requests.append(cycle)
+        if len(pending) and pending[0][0] == cycle + 1:
+            _, adr = pending.pop(0)
+            yield dut.wr_data_en.eq(1)
+            yield dut.wr_data_addr.eq(adr)
+        else:
+            yield dut.wr_data_en.eq(0)
+        yield
+        cycle += 1
+
+@passive
+def dfi_wrdata_generator(dut, write_latency, wrdata):
+    """DFI write data presented write_latency cycles after the write command."""
+    cycle   = 0
+    pending = []
+    wrdata  = iter(wrdata)
+    while True:
+        if (yield dut.mc_wr_cas):
+            pending.append(cycle + write_latency)
+        if len(pending) and pending[0] == cycle + 1:
+            pending.pop(0)
+            data, mask = next(wrdata)
+            for p, phase in enumerate(dut.dfi.phases):
+                yield phase.wrdata.eq(data[p])
+                yield phase.wrdata_mask.eq(mask[p])
+        yield
+        cycle += 1
+
+def dfi_write_commands(dut, gaps):
+    """Issue a DFI write command for each entry of gaps, followed by gap idle cycles."""
+    yield dut.calib_done.status.eq(1)
+    yield
+    wrphase = dut.dfi.phases[dut.settings.wrphase]
+    for gap in gaps:
+        yield wrphase.wrdata_en.eq(1)
+        yield
+        if gap:
+            yield wrphase.wrdata_en.eq(0)
+            for _ in range(gap):
+                yield
+    yield wrphase.wrdata_en.eq(0)
+    for _ in range(32):
+        yield
+
+# DFI Commands -------------------------------------------------------------------------------------
+
+def dfi_cmd(phase, cmd, bank=0, address=0, rank=0):
+    cs, ras_n, cas_n, we_n = {
+        "nop": (0, 1, 1, 1),
+        "act": (1, 0, 1, 1),
+        "rd":  (1, 1, 0, 1),
+        "wr":  (1, 1, 0, 0),
+        "pre": (1, 0, 1, 0),
+        "ref": (1, 0, 0, 1),
+    }[cmd]
+    yield phase.cs_n.eq((2**len(phase.cs_n) - 1) & ~(cs << rank))
+    yield phase.ras_n.eq(ras_n)
+    yield phase.cas_n.eq(cas_n)
+    yield phase.we_n.eq(we_n)
+    yield phase.bank.eq(bank)
+    yield phase.address.eq(address)
+    yield phase.rddata_en.eq(cmd == "rd")
+    yield phase.wrdata_en.eq(cmd == "wr")
+
+@passive
+def dfi_rddata_generator(dut, rddata):
+    while True:
+        if (yield dut.dfi.phases[0].rddata_valid):
+            data = []
+            for phase in dut.dfi.phases:
+                data.append((yield phase.rddata))
+            rddata.append(data)
+        yield
+
+# DFI to MIG Slots Reference Model -----------------------------------------------------------------
+
+def slots_field(values, width):
+    """Reference packing of per-slot values (8 slots) to a MIG slot vector (bit-major)."""
+    return sum(((value >> i) & 0b1) << (8*i + slot)
+        for slot, value in enumerate(values) for i in range(width))
+
+class MIGSlotsModel:
+    """Reference model of the DFI to MIG command packing: DDR4 ACT decoding (act_n, row bits 14-16
+    on we_n/cas_n/ras_n), commands duplicated on both slots of their phase, CAS on odd phases moved
+    to the next slot and, with multiple ranks, CAS delayed to slot 2 on rank switches."""
+    def __init__(self, settings, addressbits=17, babits=2, bgbits=1):
+        self.settings    = settings
+        self.addressbits = addressbits
+        self.babits      = babits
+        self.bgbits      = bgbits
+        self.cas_last       = 0
+        self.cas_rank_last  = 0
+        self.cas_delay_last = 0
+
+    def step(self, phases):
+        """phases: DFI phases fields (dicts) of a cycle, returns the expected MIG signals."""
+        s, nranks = self.settings, self.settings.nranks
+        nop  = dict(cs_n=2**nranks - 1, act_n=1, ras_n=1, cas_n=1, we_n=1)
+        cmds = []
+        for phase in phases:
+            cmd = dict(phase, act_n=1)
+            if not phase["ras_n"] and phase["cas_n"] and phase["we_n"]:
+                cmd.update(act_n=0,
+                    we_n  = (phase["address"] >> 14) & 0b1,
+                    cas_n = (phase["address"] >> 15) & 0b1,
+                    ras_n = (phase["address"] >> 16) & 0b1)
+            cmds.append(cmd)
+
+        # Rank switch
+        cas_en   = phases[s.rdphase]["rddata_en"] | phases[s.wrphase]["wrdata_en"]
+        cas_rank = 0
+        for casphase, cas in [(s.rdphase, "rddata_en"), (s.wrphase, "wrdata_en")]:
+            for r in range(nranks):
+                if phases[casphase][cas] and not (phases[casphase]["cs_n"] >> r) & 0b1:
+                    cas_rank = r
+        cas_delay = (cas_en and self.cas_last and cas_rank != self.cas_rank_last) or \
+                    (cas_en and self.cas_delay_last)
+        self.cas_last       = cas_en
+        self.cas_delay_last = cas_delay
+        if cas_en:
+            self.cas_rank_last = cas_rank
+
+        # CAS moves
+        slots = {"rddata_en": s.rdphase + s.rdphase%2, "wrdata_en": s.wrphase + s.wrphase%2}
+        moved = [dict(cmd) for cmd in cmds]
+        for casphase, cas in [(s.rdphase, "rddata_en"), (s.wrphase, "wrdata_en")]:
+            if casphase%2:
+                move, slot = phases[casphase][cas], casphase + 1
+            elif nranks > 1:
+                move, slot = phases[casphase][cas] and cas_delay, 2
+            else:
+                continue
+            if move:
+                moved[slot]     = dict(cmds[casphase])
+                moved[casphase] = dict(cmds[casphase], **nop)
+                slots[cas]      = slot
+
+        rowbits = self.addressbits - 3
+        slot_cmds = [moved[slot//2] for slot in range(8)]
+        mig = {
+            "mc_act_n":  slots_field([c["act_n"] for c in slot_cmds], 1),
+            "mc_adr":    slots_field([(c["address"] & (2**rowbits - 1)) |
+                (c["we_n"] << rowbits) | (c["cas_n"] << (rowbits + 1)) | (c["ras_n"] << (rowbits + 2))
+                for c in slot_cmds], self.addressbits),
+            "mc_ba":     slots_field([c["bank"] for c in slot_cmds], self.babits),
+            "mc_bg":     slots_field([c["bank"] >> self.babits for c in slot_cmds], self.bgbits),
+            "mc_cs_n":   slots_field([c["cs_n"] for c in slot_cmds], nranks),
+            "mc_odt":    slots_field([phases[slot//2]["odt"] for slot in range(8)], nranks),
+            "mc_cke":    slots_field([phases[slot//2]["cke"] for slot in range(8)], nranks),
+            "mc_rd_cas": phases[s.rdphase]["rddata_en"],
+            "mc_wr_cas": phases[s.wrphase]["wrdata_en"],
+            "win_rank":  cas_rank,
+        }
+        mig["mc_cas_slot"] = 0
+        if mig["mc_rd_cas"]:
+            mig["mc_cas_slot"] = slots["rddata_en"]
+        if mig["mc_wr_cas"]:
+            mig["mc_cas_slot"] = slots["wrdata_en"]
+        return mig
+
+def random_dfi_phases(prng, settings, addressbits=17, bankbits=3):
+    """Random DFI phases of a cycle: non-CAS commands (or NOPs) on all phases, at most one CAS
+    (read or write) on its phase, random ranks, banks, addresses, ODT and CKE."""
+    nranks = settings.nranks
+    phases = []
+    for n in range(settings.nphases):
+        cmd = prng.choice(["nop", "nop", "act", "pre", "ref", "mrs", "zqc"])
+        ras_n, cas_n, we_n = {"nop": (1, 1, 1), "act": (0, 1, 1), "pre": (0, 1, 0),
+            "ref": (0, 0, 1), "mrs": (0, 0, 0), "zqc": (1, 1, 0)}[cmd]
+        phases.append(dict(
+            cs_n      = 2**nranks - 1 if cmd == "nop" else (2**nranks - 1) & ~(1 << prng.randrange(nranks)),
+            ras_n     = ras_n,
+            cas_n     = cas_n,
+            we_n      = we_n,
+            bank      = prng.randrange(2**bankbits),
+            address   = prng.randrange(2**addressbits),
+            odt       = prng.randrange(2**nranks),
+            cke       = prng.randrange(2**nranks),
+            rddata_en = 0,
+            wrdata_en = 0))
+    cas = prng.choice([None, "rddata_en", "wrdata_en"])
+    if cas is not None:
+        phase = phases[settings.rdphase if cas == "rddata_en" else settings.wrphase]
+        phase.update(ras_n=1, cas_n=0, we_n=int(cas == "rddata_en"), **{cas: 1},
+            cs_n=(2**nranks - 1) & ~(1 << prng.randrange(nranks)))
+    return phases
+
+# Test USDDR4MIGPHY --------------------------------------------------------------------------------
+
+class TestUSDDR4MIGPHY(unittest.TestCase):
+    def write_test(self, gaps, mig_latency, databits=64, padbits=64, seed=42, **kwargs):
+        dut  = USDDR4MIGPHY(None, ddr4_model_pads(padbits), simulation=True, sim_model=False,
+            databits=databits, **kwargs)
+        prng = random.Random(seed)
+        wrdata = [([prng.randrange(2**(2*databits))    for p in range(4)],
+                   [prng.randrange(2**(2*databits//8)) for p in range(4)]) for _ in gaps]
+        self.received = []
+        self.requests = []
+
+        def main_generator(dut):
+            yield from dfi_write_commands(dut, gaps)
+            self.wr_underflow = (yield dut.wr_underflow.status)
+
+        run_simulation(dut, [
+            main_generator(dut),
+            dfi_wrdata_generator(dut, dut.settings.write_latency, wrdata),
+            mig_write_generator(dut, mig_latency, self.received, self.requests)])
+        return dut, wrdata
+
+    def lane_mapping_test(self, databits, padbits=64, n=32):
+        dut, wrdata = self.write_test([1]*n, mig_latency=4, databits=databits, padbits=padbits)
+        self.assertEqual(dut.settings.databits, databits)
+        self.assertEqual(dut.settings.dfi_databits, 2*databits)
+        self.assertEqual(len(dut.wr_data), 8*padbits)
+        self.assertEqual(self.received, [
+            (dfi_to_slots(data, databits), dfi_to_slots(mask, databits//8))
+            for data, mask in wrdata])
+
+    def test_lane_mapping_8(self):
+        self.lane_mapping_test(databits=8)
+
+    def test_lane_mapping_16(self):
+        self.lane_mapping_test(databits=16)
+
+    def test_lane_mapping_32(self):
+        self.lane_mapping_test(databits=32)
+
+    def test_lane_mapping_64(self):
+        self.lane_mapping_test(databits=64)
+
+    def test_write_dbi(self):
+        dut, wrdata = self.write_test([1]*32, mig_latency=4, databits=16, write_dbi=True)
+        self.assertEqual(self.received, [dbi_encode(dfi_to_slots(data, 16), 16)
+            for data, mask in wrdata])
+
+    def read_return_test(self, mig_latency, read_latency, databits=64, n=32):
+        dut = USDDR4MIGPHY(None, ddr4_model_pads(), simulation=True, sim_model=False, databits=databits,
+            read_latency=read_latency)
+        rdphase = dut.settings.rdphase
+        prng    = random.Random(42)
+        rd_data = [prng.randrange(2**(8*databits)) for _ in range(n)]
+        cmds    = []
+        valids  = []
+
+        @passive
+        def mig_generator(dut):
+            cycle   = 0
+            pending = []
+            data    = iter(rd_data)
+            while True:
+                if (yield dut.mc_rd_cas):
+                    pending.append(cycle + mig_latency)
+                if len(pending) and pending[0] == cycle + 1:
+                    pending.pop(0)
+                    yield dut.rd_data_en.eq(1)
+                    yield dut.rd_data.eq(next(data))
+                else:
+                    yield dut.rd_data_en.eq(0)
+                yield
+                cycle += 1
+
+        @passive
+        def monitor_generator(dut):
+            cycle = 0
+            while True:
+                if (yield dut.mc_rd_cas):
+                    cmds.append(cycle)
+                if (yield dut.dfi.phases[0].rddata_valid):
+                    rddata = []
+                    for phase in dut.dfi.phases:
+                        rddata.append((yield phase.rddata))
+                    valids.append((cycle, rddata))
+                yield
+                cycle += 1
+
+        def main_generator(dut):
+            yield dut.calib_done.status.eq(1)
+            yield
+            # Back-to-back reads followed by spaced reads.
+            for i in range(n):
+                yield dut.dfi.phases[rdphase].rddata_en.eq(1)
+                yield
+                if i >= n//2:
+                    yield dut.dfi.phases[rdphase].rddata_en.eq(0)
+                    for _ in range(i%4):
+                        yield
+            yield dut.dfi.phases[rdphase].rddata_en.eq(0)
+            for _ in range(read_latency + mig_latency + 8):
+                yield
+            self.rd_latency   = (yield dut.rd_latency.status)
+            self.rd_underflow = (yield dut.rd_underflow.status)
+
+        run_simulation(dut, [main_generator(dut), mig_generator(dut), monitor_generator(dut)])
+        self.assertEqual(len(cmds), n)
+        self.assertEqual(self.rd_latency, mig_latency)
+        return cmds, valids, rd_data
+
+    def test_read_return(self):
+        for mig_latency in [2, 6, 11]:
+            read_latency = mig_latency + 2
+            cmds, valids, rd_data = self.read_return_test(mig_latency, read_latency)
+            self.assertEqual(self.rd_underflow, 0)
+            self.assertEqual([cycle for cycle, _ in valids], [c + read_latency for c in cmds])
+            self.assertEqual([data for _, data in valids], [slots_to_dfi(d, 64) for d in rd_data])
+
+    def test_read_return_underflow(self):
+        self.read_return_test(mig_latency=6, read_latency=7)
+        self.assertEqual(self.rd_underflow, 1)
+
+    def test_write_back_to_back(self):
+        for mig_latency in [2, 3, 5, 8]:
+            n = 64
+            dut, wrdata = self.write_test([0]*n, mig_latency=mig_latency)
+            self.assertEqual(self.wr_underflow, 0)
+            # One burst per cycle, no gaps between bursts.
+            self.assertEqual(self.requests, list(range(self.requests[0], self.requests[0] + n)))
+            self.assertEqual(self.received, [
+                (dfi_to_slots(data, 64), dfi_to_slots(mask, 8)) for data, mask in wrdata])
+
+    def test_write_random_gaps(self):
+        prng = random.Random(0)
+        dut, wrdata = self.write_test([prng.choice([0, 0, 1, 3]) for _ in range(64)], mig_latency=4)
+        self.assertEqual(self.wr_underflow, 0)
+        self.assertEqual(self.received, [
+            (dfi_to_slots(data, 64), dfi_to_slots(mask, 8)) for data, mask in wrdata])
+
+    def test_write_underflow(self):
+        self.write_test([0]*8, mig_latency=1)
+        self.assertEqual(self.wr_underflow, 1)
+
+    def test_cas_odd_phase(self):
+        dut = USDDR4MIGPHY(None, ddr4_model_pads(), simulation=True, sim_model=False,
+            rdphase=1, rdcmdphase=0, wrphase=1, wrcmdphase=3)
+
+        def generator(dut):
+            yield dut.calib_done.status.eq(1)
+            for cmd in ["rd", "wr"]:
+                yield from dfi_cmd(dut.dfi.phases[0], "act", bank=2, address=0x1234)
+                yield from dfi_cmd(dut.dfi.phases[1], cmd,   bank=5, address=0x0120)
+                yield
+                # CAS moved from phase 1 to slot 2, phase 1 slots left idle.
+                self.assertEqual((yield dut.mc_cas_slot), 2)
+                self.assertEqual((yield dut.mc_cs_n), 0b11001100)
+                self.assertEqual((yield dut.mc_act_n), 0b11111100)
+                mc_adr = (yield dut.mc_adr)
+                mc_bg  = (yield dut.mc_bg)
+                mc_ba  = (yield dut.mc_ba)
+                for slot, address, bank in [(0, 0x1234, 2), (4, 0x0120, 5)]:
+                    self.assertEqual(sum(((mc_adr >> (8*i + slot)) & 0b1) << i for i in range(14)),
+                        address & (2**14 - 1))
+                    self.assertEqual(((mc_bg >> slot) & 0b1) << 2 | sum(((mc_ba >> (8*i + slot)) & 0b1) << i
+                        for i in range(2)), bank)
+                self.assertEqual((yield dut.mc_rd_cas), cmd == "rd")
+                self.assertEqual((yield dut.mc_wr_cas), cmd == "wr")
+
+        run_simulation(dut, generator(dut))
+
+    def test_rank_switch(self):
+        dut = USDDR4MIGPHY(None, ddr4_model_pads(nranks=2), simulation=True, sim_model=False)
+
+        def generator(dut):
+            yield dut.calib_done.status.eq(1)
+            # (cmd, rank, expected slot): CASs to a different rank than the CAS of the previous
+            # cycle are delayed to slot 2, as well as the back-to-back CASs following them.
+            # mc_cs_n is rank-major.
+            for cmd, rank, slot in [("rd", 0, 0), ("rd", 1, 2), ("rd", 1, 2), ("wr", 0, 2),
+                                    ("nop", 0, None), ("wr", 1, 0), ("wr", 1, 0), ("wr", 0, 2)]:
+                yield from dfi_cmd(dut.dfi.phases[0], cmd, bank=3, address=0x0040, rank=rank)
+                yield
+                self.assertEqual((yield dut.mc_rd_cas), cmd == "rd")
+                self.assertEqual((yield dut.mc_wr_cas), cmd == "wr")
+                if slot is not None:
+                    cs_n = (2**16 - 1) & ~(0b11 << (8*rank + 2*slot))
+                    self.assertEqual((yield dut.mc_cas_slot), slot)
+                    self.assertEqual((yield dut.mc_cs_n), cs_n)
+                    self.assertEqual((yield dut.win_rank), rank)
+                    self.assertEqual(((yield dut.mc_adr) >> (8*6 + 2*slot)) & 0b1, 1) # Address bit 6.
+                else:
+                    self.assertEqual((yield dut.mc_cs_n), 2**16 - 1)
+            # Rank switch following a delayed CAS: no extra turnaround possible.
+            self.assertEqual((yield dut.rank_switches.status), 1)
+
+        run_simulation(dut, generator(dut))
+
+    def test_perf_counters(self):
+        dut = USDDR4MIGPHY(None, ddr4_model_pads(), simulation=True, sim_model=False,
+            with_counters=True)
+
+        def generator(dut):
+            yield dut.calib_done.status.eq(1)
+            # (cmd, phase) per cycle.
+            commands = [("act", 3), ("wr", 2), ("wr", 2), ("rd", 0), ("nop", 0), ("rd", 0),
+                        ("wr", 2), ("pre", 3), ("ref", 3), ("nop", 0), ("act", 3)]
+            for cmd, phase in commands:
+                yield from dfi_cmd(dut.dfi.phases[phase], cmd, bank=1, address=0x0400)
+                yield
+                yield from dfi_cmd(dut.dfi.phases[phase], "nop")
+            # Two ACTs on the last cycle.
+            yield from dfi_cmd(dut.dfi.phases[1], "act")
+            yield from dfi_cmd(dut.dfi.phases[3], "act")
+            yield
+            yield from dfi_cmd(dut.dfi.phases[1], "nop")
+            yield from dfi_cmd(dut.dfi.phases[3], "nop")
+            yield dut.snapshot.re.eq(1)
+            yield
+            yield dut.snapshot.re.eq(0)
+            yield
+            values = {}
+            for name in perf_counters:
+                values[name] = (yield getattr(dut, name).status)
+            self.assertEqual(values["rd_cas"],   2)
+            self.assertEqual(values["wr_cas"],   3)
+            self.assertEqual(values["act"],      4)
+            self.assertEqual(values["pre"],      1)
+            self.assertEqual(values["ref"],      1)
+            self.assertEqual(values["rd_to_wr"], 1)
+            self.assertEqual(values["wr_to_rd"], 1)
+            self.assertEqual(values["cycles"] - values["idle"], 10)
+            # Counters are free-running, CSRs only updated on snapshot.
+            for _ in range(4):
+                yield
+            self.assertEqual((yield dut.cycles.status), values["cycles"])
+
+        run_simulation(dut, generator(dut))
+
+    def packing_test(self, n, nranks=1, seed=42, **kwargs):
+        dut   = USDDR4MIGPHY(None, ddr4_model_pads(nranks=nranks), simulation=True, sim_model=False,
+            **kwargs)
+        model = MIGSlotsModel(dut.settings)
+        prng  = random.Random(seed)
+        signals = ["mc_act_n", "mc_adr", "mc_ba", "mc_bg", "mc_cs_n", "mc_odt", "mc_cke",
+            "mc_rd_cas", "mc_wr_cas", "mc_cas_slot", "win_rank"]
+        errors  = []
+
+        def generator(dut):
+            yield dut.calib_done.status.eq(1)
+            for cycle in range(n):
+                phases = random_dfi_phases(prng, dut.settings)
+                for phase, fields in zip(dut.dfi.phases, phases):
+                    for name, value in fields.items():
+                        yield getattr(phase, name).eq(value)
+                yield
+                expected = model.step(phases)
+                for name in signals:
+                    value = (yield getattr(dut, name))
+                    if value != expected[name]:
+                        errors.append((cycle, name, value, expected[name]))
+
+        run_simulation(dut, generator(dut))
+        self.assertEqual(errors[:4], [])
+
+    def test_packing_commands(self):
+        self.packing_test(512)
+
+    def test_packing_commands_phases(self):
+        for phases in [dict(rdphase=2, rdcmdphase=1, wrphase=0, wrcmdphase=3),
+                       dict(rdphase=1, rdcmdphase=0, wrphase=1, wrcmdphase=0),
+                       dict(rdphase=1, rdcmdphase=3, wrphase=2, wrcmdphase=0)]:
+            self.packing_test(256, **phases)
+
+    def test_packing_commands_ranks(self):
+        for nranks in [2, 4]:
+            self.packing_test(256, nranks=nranks)
+
+    def test_packing_data(self):
+        prng = random.Random(1)
+        for databits in [8, 16, 32, 64]:
+            gaps = [prng.choice([0, 0, 1, 2, 5]) for _ in range(64)]
+            dut, wrdata = self.write_test(gaps, mig_latency=prng.randrange(2, 9), databits=databits,
+                seed=databits)
+            self.assertEqual(self.wr_underflow, 0)
+            self.assertEqual(self.received, [
+                (dfi_to_slots(data, databits), dfi_to_slots(mask, databits//8))
+                for data, mask in wrdata])
+            mig_latency = prng.randrange(2, 12)
+            cmds, valids, rd_data = self.read_return_test(mig_latency, mig_latency + 2,
+                databits=databits, n=64)
+            self.assertEqual([data for _, data in valids],
+                [slots_to_dfi(d, databits) for d in rd_data])
+
+    def test_unsupported_phases(self):
+        for phases in [dict(rdphase=3, rdcmdphase=0), dict(rdphase=1, rdcmdphase=2),
+                       dict(wrphase=1, wrcmdphase=1)]:
+            with self.assertRaises(AssertionError):
+                USDDR4MIGPHY(None, ddr4_model_pads(), simulation=True, sim_model=False, **phases)
+        # Multi-rank requires CAS on phase 0 with slot 2 free.
+        for phases in [dict(wrphase=2, wrcmdphase=1), dict(rdphase=0, rdcmdphase=2)]:
+            with self.assertRaises(AssertionError):
+                USDDR4MIGPHY(None, ddr4_model_pads(nranks=2), simulation=True, sim_model=False,
+                    **phases)
+
+    def test_unsupported_databits(self):
+        with self.assertRaises(AssertionError):
+            USDDR4MIGPHY(None, ddr4_model_pads(), simulation=True, databits=24)
+        with self.assertRaises(AssertionError):
+            USDDR4MIGPHY(None, ddr4_model_pads(32), simulation=True, databits=64)
+
+    def test_speed_bins(self):
+        for data_rate, cl, cwl in [(1600, 11, 9), (2133, 15, 11), (2400, 16, 12)]:
+            sdram_module = EDY4016A(data_rate*1e6/8, "1:4")
+            self.assertEqual(get_ddr4_cl_cwl(sdram_module, data_rate), (cl, cwl))
+            dut = USDDR4MIGPHY(None, ddr4_model_pads(), simulation=True, sim_model=False,
+                data_rate=data_rate, sdram_module=sdram_module)
+            self.assertEqual((dut.settings.cl, dut.settings.cwl), (cl, cwl))
+        with self.assertRaises(ValueError):
+            get_ddr4_cl_cwl(EDY4016A(125e6, "1:4"), 1000)
+
+    def test_mig_xci(self):
+        xci = os.path.join(os.path.dirname(__file__), "ip", "ddr4_0", "ddr4_0.xci")
+        check_mig_xci(xci, 1600, 11, 9)
+        with self.assertRaises(ValueError):
+            check_mig_xci(xci, 2400, 16, 12)
+
+    def test_mig_xci_dbi(self):
+        # The checked-in XCI is DM_NO_DBI: DM pin used as data mask, DBI not supported.
+        xci = os.path.join(os.path.dirname(__file__), "ip", "ddr4_0", "ddr4_0.xci")
+        for write_dbi, read_dbi in [(True, False), (False, True), (True, True)]:
+            with self.assertRaises(ValueError):
+                check_mig_xci(xci, 1600, 11, 9, write_dbi=write_dbi, read_dbi=read_dbi)
+        # Same XCI with write/read DBI.
+        with open(xci) as f:
+            content = f.read().replace(">DM_NO_DBI<", ">NO_DM_DBI_WR_RD<")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dbi_xci = os.path.join(tmpdir, "ddr4_0.xci")
+            with open(dbi_xci, "w") as f:
+                f.write(content)
+            check_mig_xci(dbi_xci, 1600, 11, 9, write_dbi=True, read_dbi=True)
+            with self.assertRaises(ValueError):
+                check_mig_xci(dbi_xci, 1600, 11, 9)
+
+# Test USDDR4MIGPHYModel ---------------------------------------------------------------------------
+
+class TestUSDDR4MIGPHYModel(unittest.TestCase):
+    def write_read_test(self, databits=64, n=32, nranks=1, read_latency=16, **kwargs):
+        dut = USDDR4MIGPHY(None, ddr4_model_pads(nranks=nranks), simulation=True, databits=databits,
+            read_latency=read_latency, sim_model={"calib_delay": 16}, **kwargs)
+        rdphase, rdcmdphase = dut.settings.rdphase, dut.settings.rdcmdphase
+        wrphase, wrcmdphase = dut.settings.wrphase, dut.settings.wrcmdphase
+        prng     = random.Random(42)
+        accesses = [(prng.randrange(nranks), prng.randrange(8), prng.randrange(2**17),
+            8*prng.randrange(2**7)) for _ in range(n)]
+        wrdata = [([prng.randrange(2**(2*databits)) for p in range(4)], [0]*4) for _ in range(n)]
+        rddata = []
+        values = {}
+
+        def main_generator(dut):
+            while not (yield dut.calib_done.status):
+                yield
+            for cmd, cmdphase, casphase in [("wr", wrcmdphase, wrphase), ("rd", rdcmdphase, rdphase)]:
+                for rank, bank, row, col in accesses:
+                    yield from dfi_cmd(dut.dfi.phases[cmdphase], "act", bank, row, rank)
+                    yield
+                    yield from dfi_cmd(dut.dfi.phases[cmdphase], "nop")
+                    yield from dfi_cmd(dut.dfi.phases[casphase], cmd, bank, col, rank)
+                    yield
+                    yield from dfi_cmd(dut.dfi.phases[casphase], "nop")
+                for _ in range(32):
+                    yield
+            values["rd_latency"]   = (yield dut.rd_latency.status)
+            values["rd_underflow"] = (yield dut.rd_underflow.status)
+            values["raw_hazard"]   = (yield dut.model.raw_hazard)
+
+        run_simulation(dut, [
+            main_generator(dut),
+            dfi_wrdata_generator(dut, dut.settings.write_latency, wrdata),
+            dfi_rddata_generator(dut, rddata)])
+        self.assertEqual(rddata, [data for data, mask in wrdata])
+        self.assertEqual(values["raw_hazard"], 0)
+        return dut, values
+
+    def test_raw_hazard(self):
+        # Read CAS right after a write CAS to the same burst (write still in flight) is flagged,
+        # to another burst it is not.
+        for col, hazard in [(0, 1), (8, 0)]:
+            dut = USDDR4MIGPHY(None, ddr4_model_pads(), simulation=True, databits=16,
+                sim_model={"calib_delay": 16})
+            rdphase, rdcmdphase = dut.settings.rdphase, dut.settings.rdcmdphase
+            wrphase, wrcmdphase = dut.settings.wrphase, dut.settings.wrcmdphase
+            values = {}
+
+            def generator(dut):
+                while not (yield dut.calib_done.status):
+                    yield
+                yield from dfi_cmd(dut.dfi.phases[wrcmdphase], "act", 0, 0)
+                yield
+                yield from dfi_cmd(dut.dfi.phases[wrcmdphase], "nop")
+                yield from dfi_cmd(dut.dfi.phases[wrphase], "wr", 0, 0)
+                yield
+                yield from dfi_cmd(dut.dfi.phases[wrphase], "nop")
+                yield from dfi_cmd(dut.dfi.phases[rdphase], "rd", 0, col)
+                yield
+                yield from dfi_cmd(dut.dfi.phases[rdphase], "nop")
+                for _ in range(4):
+                    yield
+                values["raw_hazard"] = (yield dut.model.raw_hazard)
+
+            run_simulation(dut, generator(dut))
+            self.assertEqual(values["raw_hazard"], hazard)
+
+    def test_write_read(self):
+        self.write_read_test()
+
+    def test_default_read_latency(self):
+        # Default read_latency (CL + 10): covers the read latency measured on the model.
+        dut, values = self.write_read_test(databits=16, n=16, read_latency=None)
+        self.assertEqual(dut.settings.read_latency, get_sys_latency(4, dut.settings.cl) + 10)
+        self.assertLessEqual(values["rd_latency"] + 2, dut.settings.read_latency)
+        self.assertEqual(values["rd_underflow"], 0)
+
+    def test_write_read_phases(self):
+        for phases in [dict(rdphase=2, rdcmdphase=1, wrphase=0, wrcmdphase=3),
+                       dict(rdphase=1, rdcmdphase=0, wrphase=1, wrcmdphase=0)]:
+            self.write_read_test(databits=16, n=16, **phases)
+
+    def test_write_read_dbi(self):
+        self.write_read_test(databits=16, n=16, write_dbi=True, read_dbi=True)
+
+    def test_write_read_ranks(self):
+        self.write_read_test(databits=16, n=32, nranks=2)
+
+    def rank_interleave_test(self, tCCD=None, n=64, nports=4, seed=42):
+        # Random reads to the open rows of both ranks through LiteDRAM (a port only has one bank
+        # in flight: nports ports), returns the CAS commands as (tCK, rank) and the rank_switches
+        # CSR.
+        sys_clk_freq = int(200e6)
+        dut = Module()
+        dut.submodules.phy = phy = USDDR4MIGPHY(None, ddr4_model_pads(16, 2),
+            simulation = True,
+            databits   = 16,
+            sim_model  = {"calib_delay": 16, "mem_depth": 64})
+        module = EDY4016A(sys_clk_freq, "1:4")
+        module.timing_settings.tCCD = get_ddr4_rank_tccd(2, module.timing_settings.tCCD) \
+            if tCCD is None else tCCD
+        dut.submodules.core = core = LiteDRAMCore(phy,
+            module.geom_settings,
+            module.timing_settings,
+            sys_clk_freq)
+        ports = [core.crossbar.get_port() for _ in range(nports)]
+        # Row 0 of all the banks of both ranks (ROW_BANK_COL).
+        addrbits = log2_int(2*2**module.geom_settings.bankbits) + module.geom_settings.colbits - 3
+        prng   = random.Random(seed)
+        cas    = []
+        values = {}
+
+        def port_generator(port):
+            yield port.rdata.ready.eq(1)
+            while len(cas) < n:
+                yield port.cmd.valid.eq(1)
+                yield port.cmd.we.eq(0)
+                yield port.cmd.addr.eq(prng.randrange(2**addrbits))
+                yield
+                while not (yield port.cmd.ready):
+                    yield
+            yield port.cmd.valid.eq(0)
+
+        def main_generator(dut):
+            while not (yield phy.calib_done.status):
+                yield
+            yield core.dfii._control.storage.eq(0b1111) # Hardware control.
+            yield
+            yield from port_generator(ports[0])
+            values["rank_switches"] = (yield phy.rank_switches.status)
+
+        @passive
+        def cas_monitor(dut):
+            cycle = 0
+            while True:
+                if (yield phy.mc_rd_cas) | (yield phy.mc_wr_cas):
+                    cas.append((4*cycle + (yield phy.mc_cas_slot), (yield phy.win_rank)))
+                cycle += 1
+                yield
+
+        run_simulation(dut, [main_generator(dut), cas_monitor(dut)] +
+            [port_generator(port) for port in ports[1:]])
+        return cas, values["rank_switches"]
+
+    def test_rank_interleave(self):
+        # Consecutive CAS commands are at least a BL8 (4 tCK) apart, plus the rank-to-rank
+        # turnaround (2 tCK) on rank switches.
+        def violations(cas):
+            return [(a, b) for a, b in zip(cas, cas[1:])
+                if b[0] - a[0] < 4 + 2*(a[1] != b[1])]
+        cas, rank_switches = self.rank_interleave_test()
+        self.assertTrue(any(a[1] != b[1] for a, b in zip(cas, cas[1:])))
+        self.assertEqual(violations(cas), [])
+        self.assertEqual(rank_switches, 0)
+        # Without the multi-rank tCCD, back-to-back rank switches lose the turnaround.
+        cas, rank_switches = self.rank_interleave_test(tCCD=1)
+        self.assertNotEqual(violations(cas), [])
+        self.assertNotEqual(rank_switches, 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,18 +6,21 @@ import time
 from litex import RemoteClient
 from litescope import LiteScopeAnalyzerDriver
 
+from hostbatch import BatchClient
+
 wb = RemoteClient()
 wb.open()
+bus = BatchClient(wb)
 
 # # #
 
 # FPGA ID ------------------------------------------------------------------------------------------
 fpga_id = ""
-for i in range(256):
-    c = chr(wb.read(wb.bases.identifier_mem + 4*i) & 0xff)
-    fpga_id += c
+for data in bus.read(wb.bases.identifier_mem, 256):
+    c = chr(data & 0xff)
     if c == "\0":
         break
+    fpga_id += c
 print("FPGA: " + fpga_id)
 
 # Check DDR4 calibration ---------------------------------------------------------------------------
@@ -39,27 +42,25 @@ def seed_to_data(seed, random=True):
         return seed
 
 def write_pattern(length, offset=0):
-    for i in range(length):
-        wb.write(wb.mems.main_ram.base + offset + 4*i, seed_to_data(i))
-        time.sleep(0.1)
+    bus.write(wb.mems.main_ram.base + offset, [seed_to_data(i) for i in range(length)])
 
 def check_pattern(length, offset=0, debug=False):
     errors = 0
-    for i in range(length):
+    datas  = bus.read(wb.mems.main_ram.base + offset, length)
+    for i, data in enumerate(datas):
         error = 0
-        if wb.read(wb.mems.main_ram.base + offset + 4*i) != seed_to_data(i):
+        if data != seed_to_data(i):
             error = 1
             if debug:
-                print("{}: 0x{:08x}, 0x{:08x} KO".format(i, wb.read(wb.mems.main_ram.base + offset + 4*i), seed_to_data(i)))
+                print("{}: 0x{:08x}, 0x{:08x} KO".format(i, data, seed_to_data(i)))
         else:
             if debug:
-                print("{}: 0x{:08x}, 0x{:08x} OK".format(i, wb.read(wb.mems.main_ram.base + offset + 4*i), seed_to_data(i)))
+                print("{}: 0x{:08x}, 0x{:08x} OK".format(i, data, seed_to_data(i)))
         errors += error
     return errors
 
 def dump(offset, length):
-    for i in range(length):
-        data = wb.read(wb.mems.main_ram.base + offset + 4*i)
+    for i, data in enumerate(bus.read(wb.mems.main_ram.base + offset, length)):
         print("0x{:08x} ".format(data), end="")
         if (i%8) == 7:
             print("")
@@ -70,11 +71,10 @@ def dump(offset, length):
 #errors = check_pattern(64, offset=offset, debug=True)
 #print("{} errors".format(errors))
 
-for i in range(128):
-    wb.write(wb.mems.main_ram.base + 4*i, i)
+bus.write(wb.mems.main_ram.base, list(range(128)))
 
-for i in range(128):
-    print("%x" %wb.read(wb.mems.main_ram.base + 4*i))
+for data in bus.read(wb.mems.main_ram.base, 128):
+    print("%x" %data)
 
 # # #
 
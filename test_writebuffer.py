@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+# Migen simulation of WriteBuffer: ./test_writebuffer.py
+
+import unittest
+import random
+
+from migen import *
+
+from litedram.common import LiteDRAMNativePort
+
+from writebuffer import WriteBuffer
+from nativeportmodel import port_memory
+
+colbits  = 4
+bankbits = 2
+
+# Test WriteBuffer ---------------------------------------------------------------------------------
+
+def user_master(port, accesses, rdatas, wdata_valid=1.0, rdata_ready=1.0, seed=42):
+    """Issues accesses ((we, addr, data, byte enables)) in order, drives the write data with the
+    command or later (wdata_valid) and records the read data."""
+    prng    = random.Random(seed)
+    issue   = 0
+    wdatas  = []
+    reads   = sum(not we for we, _, _, _ in accesses)
+    while issue < len(accesses) or wdatas or len(rdatas) < reads:
+        current = accesses[issue] if issue < len(accesses) else None
+        yield port.cmd.valid.eq(current is not None)
+        if current is not None:
+            yield port.cmd.we.eq(current[0])
+            yield port.cmd.addr.eq(current[1])
+        # Write data of the oldest write or with the current write command.
+        if wdatas:
+            wdata = wdatas[0]
+        elif current is not None and current[0]:
+            wdata = current[2:]
+        else:
+            wdata = None
+        wdata_presented = wdata is not None and prng.random() < wdata_valid
+        yield port.wdata.valid.eq(wdata_presented)
+        if wdata is not None:
+            yield port.wdata.data.eq(wdata[0])
+            yield port.wdata.we.eq(wdata[1])
+        yield port.rdata.ready.eq(prng.random() < rdata_ready)
+        yield
+        cmd_done   = (yield port.cmd.valid) and (yield port.cmd.ready)
+        wdata_done = (yield port.wdata.valid) and (yield port.wdata.ready)
+        if cmd_done:
+            if current[0]:
+                wdatas.append(current[2:])
+            issue += 1
+        if wdata_done:
+            wdatas.pop(0)
+        if (yield port.rdata.valid) and (yield port.rdata.ready):
+            rdatas.append((yield port.rdata.data))
+    yield port.cmd.valid.eq(0)
+    yield port.wdata.valid.eq(0)
+
+def expected_reads(accesses):
+    model  = {}
+    rdatas = []
+    for we, addr, data, be in accesses:
+        if we:
+            old = model.get(addr, 0)
+            for i in range(4):
+                if be & (1 << i):
+                    mask = 0xff << 8*i
+                    old  = (old & ~mask) | (data & mask)
+            model[addr] = old
+        else:
+            rdatas.append(model.get(addr, 0))
+    return rdatas, model
+
+def address(row, bank, col):
+    return (row << (colbits + bankbits)) | (bank << colbits) | col
+
+class TestWriteBuffer(unittest.TestCase):
+    def buffer_test(self, accesses, high=None, low=None, reorder=1, read_depth=4, latency=8,
+        ready=1.0, wdata_valid=1.0, rdata_ready=1.0, bypass=0):
+        port   = LiteDRAMNativePort("both", address_width=12, data_width=32)
+        dut    = WriteBuffer(port, colbits, bankbits, depth=8, read_depth=read_depth)
+        mem    = {}
+        stats  = {"reads": 0, "writes": 0, "turnarounds": 0, "row_switches": 0}
+        rdatas = []
+        values = {}
+
+        def generator(dut):
+            if high is not None:
+                yield dut.high_watermark.storage.eq(high)
+            if low is not None:
+                yield dut.low_watermark.storage.eq(low)
+            yield dut.reorder.storage.eq(reorder)
+            yield dut.bypass.storage.eq(bypass)
+            yield
+            yield from user_master(dut.port, accesses, rdatas, wdata_valid, rdata_ready)
+            # Let the buffer drain (no reads waiting).
+            for i in range(64):
+                yield
+            for name in ["combined", "reordered", "flushes", "turnarounds"]:
+                values[name] = (yield getattr(dut, name).status)
+
+        run_simulation(dut, [generator(dut), port_memory(port, mem, stats, latency, ready,
+            ordered=True, geom=(colbits, bankbits))])
+        reads, model = expected_reads(accesses)
+        self.assertEqual(rdatas, reads)
+        self.assertEqual({addr: mem.get(addr, 0) for addr in model}, model)
+        if not bypass:
+            self.assertEqual(values["turnarounds"], stats["turnarounds"])
+        return values, stats
+
+    def random_accesses(self, n, addrs, write_ratio=0.5, seed=42):
+        prng = random.Random(seed)
+        return [(int(prng.random() < write_ratio), prng.choice(addrs), prng.randrange(2**32),
+            prng.choice([0b1111, 0b1111, 0b0001, 0b0110])) for i in range(n)]
+
+    def test_consistency(self):
+        # Few addresses: read after write/write after read hazards and combined writes.
+        addrs = [address(row, bank, 0) for row in range(2) for bank in range(2)]
+        for reorder in [0, 1]:
+            values, stats = self.buffer_test(self.random_accesses(256, addrs), reorder=reorder)
+            self.assertGreater(values["combined"], 0)
+            self.assertGreater(values["flushes"], 0)
+
+    def test_backpressure(self):
+        addrs = [address(row, bank, col) for row in range(4) for bank in range(4)
+            for col in range(2)]
+        self.buffer_test(self.random_accesses(256, addrs), ready=0.5, wdata_valid=0.5,
+            rdata_ready=0.5)
+
+    def test_combining(self):
+        # Writes only to 4 addresses on a slow controller: writes combined in the buffer.
+        addrs    = [address(0, bank, 0) for bank in range(4)]
+        accesses = self.random_accesses(128, addrs, write_ratio=1.0)
+        values, stats = self.buffer_test(accesses, ready=0.2)
+        self.assertEqual(stats["writes"] + values["combined"], len(accesses))
+        self.assertGreater(values["combined"], len(accesses)//4)
+
+    def test_batching(self):
+        # Mixed reads/writes to distinct addresses: writes drained in batches.
+        prng     = random.Random(42)
+        addrs    = [address(prng.randrange(8), prng.randrange(4), prng.randrange(16))
+            for i in range(256)]
+        accesses = [(i % 2, addr, i, 0b1111) for i, addr in enumerate(addrs)]
+        values, stats = self.buffer_test(accesses)
+        # Pass-through (writes drained one by one).
+        values_ref, stats_ref = self.buffer_test(accesses, high=1, low=0, reorder=0)
+        self.assertLess(4*stats["turnarounds"], stats_ref["turnarounds"])
+
+    def test_reorder(self):
+        # Reads alternating between 2 rows of the same bank on a slow controller (reads waiting
+        # in the window, in flight reads also use it): row hits issued first.
+        accesses = [(0, address(i % 2, 0, (i//2) % 16), 0, 0) for i in range(64)]
+        values, stats = self.buffer_test(accesses, reorder=1, read_depth=16, ready=0.3)
+        values_ref, stats_ref = self.buffer_test(accesses, reorder=0, read_depth=16, ready=0.3)
+        self.assertGreater(values["reordered"], 0)
+        self.assertEqual(values_ref["reordered"], 0)
+        self.assertLess(2*stats["row_switches"], stats_ref["row_switches"])
+
+    def test_bypass(self):
+        # Accesses forwarded in order, buffer unused.
+        addrs    = [address(row, bank, 0) for row in range(2) for bank in range(2)]
+        accesses = self.random_accesses(128, addrs)
+        values, stats = self.buffer_test(accesses, bypass=1, ready=0.5, wdata_valid=0.5)
+        self.assertEqual(stats["reads"] + stats["writes"], len(accesses))
+        self.assertEqual(stats["turnarounds"],
+            sum(a[0] != b[0] for a, b in zip(accesses, accesses[1:])))
+        self.assertEqual(values["combined"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
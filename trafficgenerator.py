@@ -0,0 +1,131 @@
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+from migen import *
+
+from litex.soc.interconnect.csr import *
+
+from litedram.frontend.bist import LFSR
+
+# Traffic Generator --------------------------------------------------------------------------------
+
+traffic_patterns = ["linear", "random", "strided", "page"]
+
+class TrafficGenerator(Module, AutoCSR):
+    """Read/write traffic generator for a LiteDRAM native port
+
+    Issues length accesses (one native port word each) in [base, end) (bytes, end - base must be
+    a power of two, addresses wrap in this region) with the selected pattern:
+    - linear:  consecutive addresses.
+    - random:  random addresses (LFSR).
+    - strided: addresses incremented by stride (bytes).
+    - page:    page_hit/256 of the accesses stay in the page (row/bank) of the previous access
+               (random column), the others go to a random address (page miss).
+
+    Each access is a write with a probability of write_ratio/256 (256: writes only). Up to
+    outstanding (<= depth) accesses are in flight (write data not yet consumed or read data not
+    yet returned). ticks are the sys_clk cycles from start to the completion of the last access.
+    Write data is not checked (use the BIST for data integrity).
+    """
+    def __init__(self, port, colbits, depth=64):
+        ashift = log2_int(port.data_width//8)
+        awidth = port.address_width + ashift
+
+        self.start       = CSR()
+        self.done        = CSRStatus()
+        self.pattern     = CSRStorage(bits_for(len(traffic_patterns) - 1))
+        self.base        = CSRStorage(awidth)
+        self.end         = CSRStorage(awidth)
+        self.length      = CSRStorage(32)
+        self.stride      = CSRStorage(awidth)
+        self.page_hit    = CSRStorage(9)
+        self.write_ratio = CSRStorage(9)
+        self.outstanding = CSRStorage(bits_for(depth), reset=depth)
+        self.ticks       = CSRStatus(32)
+        self.reads       = CSRStatus(32)
+        self.writes      = CSRStatus(32)
+
+        # # #
+
+        base   = self.base.storage[ashift:]
+        mask   = Signal(port.address_width)
+        stride = self.stride.storage[ashift:]
+        self.comb += mask.eq(self.end.storage[ashift:] - base - 1)
+
+        # Random sources ---------------------------------------------------------------------------
+        lfsr = LFSR(16 + max(port.address_width, 32), n_state=31, taps=[27, 30])
+        self.submodules += lfsr
+        lfsr_hit   = lfsr.o[0:8]
+        lfsr_write = lfsr.o[8:16]
+        lfsr_addr  = lfsr.o[16:]
+
+        # Next access ------------------------------------------------------------------------------
+        offset      = Signal(port.address_width)
+        next_offset = Signal(port.address_width)
+        next_we     = Signal()
+        index       = Signal(32)
+        self.comb += [
+            Case(self.pattern.storage, {
+                traffic_patterns.index("linear"):  next_offset.eq(offset + 1),
+                traffic_patterns.index("random"):  next_offset.eq(lfsr_addr),
+                traffic_patterns.index("strided"): next_offset.eq(offset + stride),
+                traffic_patterns.index("page"):
+                    If(lfsr_hit < self.page_hit.storage,
+                        next_offset.eq(Cat(lfsr_addr[:colbits], offset[colbits:]))
+                    ).Else(
+                        next_offset.eq(lfsr_addr)
+                    ),
+            }),
+            next_we.eq(lfsr_write < self.write_ratio.storage),
+        ]
+
+        # Accesses ---------------------------------------------------------------------------------
+        running  = Signal()
+        pending  = Signal(bits_for(depth))
+        we       = Signal()
+        accepted = Signal()
+        rd_done  = Signal()
+        wr_done  = Signal()
+        self.comb += [
+            port.cmd.valid.eq(running & (index < self.length.storage) &
+                              (pending < self.outstanding.storage)),
+            port.cmd.we.eq(we),
+            port.cmd.addr.eq(base + (offset & mask)),
+            port.wdata.valid.eq(1),
+            port.wdata.we.eq(2**len(port.wdata.we) - 1),
+            port.wdata.data.eq(Replicate(lfsr.o, len(port.wdata.data)//len(lfsr.o) + 1)),
+            port.rdata.ready.eq(1),
+
+            accepted.eq(port.cmd.valid & port.cmd.ready),
+            rd_done.eq(port.rdata.valid & port.rdata.ready),
+            wr_done.eq(port.wdata.valid & port.wdata.ready),
+        ]
+        self.sync += [
+            If(self.start.re,
+                running.eq(1),
+                index.eq(0),
+                offset.eq(0),
+                we.eq(next_we),
+                self.done.status.eq(0),
+                self.ticks.status.eq(0),
+                self.reads.status.eq(0),
+                self.writes.status.eq(0)
+            ).Elif(running,
+                self.ticks.status.eq(self.ticks.status + 1),
+                If(accepted,
+                    index.eq(index + 1),
+                    offset.eq(next_offset),
+                    we.eq(next_we),
+                    If(we,
+                        self.writes.status.eq(self.writes.status + 1)
+                    ).Else(
+                        self.reads.status.eq(self.reads.status + 1)
+                    )
+                ),
+                pending.eq(pending + accepted - rd_done - wr_done),
+                If((index == self.length.storage) & (pending == 0),
+                    running.eq(0),
+                    self.done.status.eq(1)
+                )
+            )
+        ]
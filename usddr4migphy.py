@@ -3,40 +3,160 @@
 
 import os
 import math
+import xml.etree.ElementTree as ET
+from functools import reduce
+from operator import add, and_, or_
 
 from migen import *
 from migen.genlib.misc import BitSlip, WaitTimer
+from migen.genlib.fifo import SyncFIFO
 
 from litex.soc.interconnect.csr import *
 
 from litedram.common import *
 from litedram.phy.dfi import *
+from litedram.modules import EDY4016A
+
+from usddr4migphymodel import USDDR4MIGPHYModel
+
+# DDR4 Speed Bins ---------------------------------------------------------------------------------
+
+# CAS Write Latency (1tCK write preamble) of the DDR4 speed bins, indexed by data rate (MT/s).
+ddr4_cwls = {1600: 9, 1866: 10, 2133: 11, 2400: 12, 2666: 14, 2933: 16, 3200: 16}
+
+def get_ddr4_cl_cwl(sdram_module, data_rate):
+    """Get (CL, CWL) of a DDR4 speed bin, CL is derived from the module tAA (= tRCD on DDR4)."""
+    if data_rate not in ddr4_cwls:
+        raise ValueError("Unsupported DDR4 data rate {}MT/s, supported: {}".format(
+            data_rate, ", ".join(str(r) for r in ddr4_cwls.keys())))
+    tck = 2e3/data_rate
+    tAA = sdram_module.get("tRCD").ns
+    cl  = math.ceil(tAA/tck - 0.025) # JEDEC rounding.
+    return cl, ddr4_cwls[data_rate]
+
+# Multi-Rank Timings -------------------------------------------------------------------------------
+
+def get_ddr4_rank_tccd(nranks, tccd):
+    """LiteDRAM tCCD (sys_clk cycles) for nranks ranks.
+
+    LiteDRAM has no rank-to-rank turnaround (tRTRS) and can issue a CAS on each sys_clk cycle (4
+    tCK, BL8). With nranks > 1, CAS commands are spaced by at least 2 sys_clk cycles (8 tCK): each
+    burst is followed by 4 tCK without data, enough for tRTRS on any rank switch.
+    """
+    return max(tccd, 2) if nranks > 1 else tccd
+
+# MIG XCI ------------------------------------------------------------------------------------------
+
+def get_mig_xci_parameters(filename):
+    """Get the MIG IP configuration parameters of a XCI file (as {name: value} strings)."""
+    spirit     = "{http://www.spiritconsortium.org/XMLSchema/SPIRIT/1685-2009}"
+    parameters = {}
+    for element in ET.parse(filename).iter(spirit + "configurableElementValue"):
+        reference = element.get(spirit + "referenceId")
+        if reference.startswith("PARAM_VALUE."):
+            parameters[reference[len("PARAM_VALUE."):]] = element.text
+    return parameters
+
+# DBI of the MIG DataMask options as (write_dbi, read_dbi), DM is used when write DBI is disabled.
+mig_data_mask_dbi = {
+    "DM_NO_DBI":       (False, False),
+    "DM_DBI_RD":       (False, True),
+    "NO_DM_NO_DBI":    (False, False),
+    "NO_DM_DBI_RD":    (False, True),
+    "NO_DM_DBI_WR":    (True,  False),
+    "NO_DM_DBI_WR_RD": (True,  True),
+}
+
+def check_mig_xci(filename, data_rate, cl, cwl, write_dbi=False, read_dbi=False):
+    """Check that the MIG IP configuration matches the PHY data rate, CL/CWL and DBI."""
+    parameters = get_mig_xci_parameters(filename)
+    xci_period = int(parameters["C0.DDR4_TimePeriod"])
+    xci_cl     = int(parameters["C0.DDR4_CasLatency"])
+    xci_cwl    = int(parameters["C0.DDR4_CasWriteLatency"])
+    errors = []
+    if abs(2e6/data_rate - xci_period) >= 1:
+        errors.append("data rate: {}MT/s (tCK={}ps) vs {:.0f}MT/s (tCK={}ps)".format(
+            data_rate, round(2e6/data_rate), 2e6/xci_period, xci_period))
+    if (cl, cwl) != (xci_cl, xci_cwl):
+        errors.append("CL/CWL: {}/{} vs {}/{}".format(cl, cwl, xci_cl, xci_cwl))
+    xci_data_mask = parameters["C0.DDR4_DataMask"]
+    if mig_data_mask_dbi.get(xci_data_mask) != (write_dbi, read_dbi):
+        errors.append("write/read DBI: {}/{} vs DataMask {}".format(
+            write_dbi, read_dbi, xci_data_mask))
+    if parameters["C0.DDR4_PhyClockRatio"] != "4:1":
+        errors.append("PHY clock ratio: 4:1 vs {}".format(parameters["C0.DDR4_PhyClockRatio"]))
+    if errors:
+        raise ValueError("PHY configuration does not match {} (PHY vs XCI):\n- {}".format(
+            filename, "\n- ".join(errors)))
+    return parameters
 
 # Xilinx Ultrascale DDR4 MIG PHY -------------------------------------------------------------------
 
+perf_counters = ["cycles", "rd_cas", "wr_cas", "act", "pre", "ref", "idle", "rd_to_wr", "wr_to_rd"]
+
 class USDDR4MIGPHY(Module, AutoCSR):
-    def __init__(self, platform, pads, use_dcp=True, simulation=False):
+    def __init__(self, platform, pads, use_dcp=True, simulation=False, databits=None,
+        read_latency=None, write_latency=1, sim_model=True,
+        rdphase=0, rdcmdphase=3, wrphase=None, wrcmdphase=None, write_dbi=False, read_dbi=False,
+        data_rate=1600, sdram_module=None, with_counters=False):
         addressbits = len(pads.a) + 3
         bankbits    = len(pads.ba) + len(pads.bg)
         nranks      = 1 if not hasattr(pads, "cs_n") else len(pads.cs_n)
-        #databits    = len(pads.dq)
-        databits    = 8 # FIXME: to ease debug
+        padbits     = len(pads.dq)
+        databits    = padbits if databits is None else databits
+        rankbits    = log2_int(nranks)
         nphases     = 4
+        assert databits in [8, 16, 32, 64]
+        assert databits <= padbits
+        assert nranks <= 4
 
-        self.calib_done = CSRStatus()
+        self.calib_done   = CSRStatus()
+        self.rd_latency   = CSRStatus(8)
+        self.rd_underflow = CSRStatus()
+        self.wr_underflow = CSRStatus()
+        if nranks > 1:
+            self.rank_switches = CSRStatus(32)
+        if with_counters:
+            self.snapshot = CSR()
+            for name in perf_counters:
+                setattr(self, name, CSRStatus(64, name=name))
 
         # # #
 
+        # DBI: write_dbi/read_dbi must match the DRAM MR5 settings (A11/A12) and so the DataMask
+        # option of the MIG IP (DM_NO_DBI, DM_DBI_RD, NO_DM_DBI_WR, NO_DM_DBI_WR_RD). Write DBI
+        # is encoded here (see Write DBI), read DBI is decoded by the MIG (rdData has no DBI bits).
+        # The DataMask option is checked against write_dbi/read_dbi (check_mig_xci).
+
         # PHY settings -----------------------------------------------------------------------------
-        cl, cwl         = (11, 9)
+        # CL/CWL of the data rate speed bin (must match the MIG IP configuration). write_latency
+        # does not depend on CWL: the MIG requests the data from the write buffer (wrDataEn).
+        if sdram_module is None:
+            sdram_module = EDY4016A(data_rate*1e6/(2*nphases), "1:4")
+        # read_latency defaults to a safe margin over CL (see Read Data Return), to be lowered to
+        # the rd_latency measured on the board + 2.
+        cl, cwl         = get_ddr4_cl_cwl(sdram_module, data_rate)
         cl_sys_latency  = get_sys_latency(nphases, cl)
-        cwl_sys_latency = get_sys_latency(nphases, cwl)
+        if read_latency is None:
+            read_latency = cl_sys_latency + 10 # Safe default, tune with rd_latency measurements.
 
-        # MIG only supports commands on even slots.
-        rdcmdphase, rdphase = 3, 0
-        wrcmdphase, wrphase = 1, 2
+        # MIG only supports CAS commands on even slots: CAS commands issued on phase 1 are moved to
+        # slot 2 (1 tCK later), slot 2 must then be free (not used as the associated cmdphase).
+        # Phase 3 would require moving the CAS to the next cycle and is not supported.
+        # With multiple ranks, CAS commands must be issued on phase 0 with slot 2 free so that they
+        # can be delayed on rank switches (see Rank Switch), writes then default to phase 0.
+        if wrphase is None:
+            wrphase = 2 if nranks == 1 else 0
+        if wrcmdphase is None:
+            wrcmdphase = 1 if nranks == 1 else 3
+        for casphase, cmdphase in [(rdphase, rdcmdphase), (wrphase, wrcmdphase)]:
+            assert casphase in [0, 1, 2]
+            assert cmdphase in range(nphases) and cmdphase != casphase
+            assert not (casphase%2 and cmdphase == casphase + 1)
+            assert not (nranks > 1 and (casphase != 0 or cmdphase == 2))
+        rdslot = rdphase + rdphase%2
+        wrslot = wrphase + wrphase%2
 
-        cwl_sys_latency = cwl_sys_latency - 2 # FIXME
         self.settings = PhySettings(
             memtype       = "DDR4",
             databits      = databits,
@@ -49,8 +169,8 @@ class USDDR4MIGPHY(Module, AutoCSR):
             wrcmdphase    = wrcmdphase,
             cl            = cl,
             cwl           = cwl,
-            read_latency  = cl_sys_latency + 10, # FIXME
-            write_latency = cwl_sys_latency
+            read_latency  = read_latency,
+            write_latency = write_latency
         )
 
         # DFI Interface ----------------------------------------------------------------------------
@@ -58,6 +178,74 @@ class USDDR4MIGPHY(Module, AutoCSR):
         dfi = Interface(addressbits, bankbits, nranks, 2*databits, nphases)
         self.submodules += DDR4DFIMux(self.dfi, dfi)
 
+        # Rank Switch ------------------------------------------------------------------------------
+        # CAS commands to a different rank than the CAS of the previous cycle would only be 4 tCK
+        # apart (BL8), which does not leave time for the rank-to-rank turnaround (tRTRS): these
+        # CAS commands are delayed from slot 0 to slot 2 (2 tCK later). Back-to-back CAS commands
+        # following a delayed CAS are also delayed to keep the 4 tCK BL8 spacing; a rank switch
+        # in such a sequence can't be given the extra turnaround. The turnaround is enforced by
+        # the controller (tCCD from get_ddr4_rank_tccd, no back-to-back CAS commands), so these
+        # delays are not used with LiteDRAM; rank switches without turnaround are counted in
+        # rank_switches (diagnostic, 0 with a correct tCCD). The rank of the CAS is given to the
+        # MIG on winRank.
+        cas_rank        = Signal(max(rankbits, 1))
+        cas_rank_last   = Signal(max(rankbits, 1))
+        cas_last        = Signal()
+        cas_delay       = Signal()
+        cas_delay_last  = Signal()
+        cas_rank_switch = Signal()
+        for casphase, cas in [(rdphase, "rddata_en"), (wrphase, "wrdata_en")]:
+            phase = dfi.phases[casphase]
+            for r in range(nranks):
+                self.comb += If(getattr(phase, cas) & ~phase.cs_n[r], cas_rank.eq(r))
+        cas_en = Signal()
+        self.comb += [
+            cas_en.eq(dfi.phases[rdphase].rddata_en | dfi.phases[wrphase].wrdata_en),
+            cas_rank_switch.eq(cas_en & cas_last & (cas_rank != cas_rank_last)),
+            cas_delay.eq(cas_rank_switch | (cas_en & cas_delay_last)),
+        ]
+        self.sync += [
+            cas_last.eq(cas_en),
+            cas_delay_last.eq(cas_delay),
+            If(cas_en, cas_rank_last.eq(cas_rank)),
+        ]
+        if nranks > 1:
+            self.sync += If(cas_rank_switch & cas_delay_last,
+                self.rank_switches.status.eq(self.rank_switches.status + 1)
+            )
+
+        # Command Packing --------------------------------------------------------------------------
+        # Commands are sent on the slot of their phase, except CAS commands on odd phases that are
+        # moved to the next (even) slot and CAS commands delayed on rank switches.
+        cmd_fields = ["address", "bank", "cas_n", "cs_n", "ras_n", "we_n", "act_n"]
+        cmd_phases = [Record(phase_cmd_description(addressbits, bankbits, nranks))
+            for _ in range(nphases)]
+        for n, cmd_phase in enumerate(cmd_phases):
+            self.comb += [getattr(cmd_phase, name).eq(getattr(dfi.phases[n], name))
+                for name in cmd_fields]
+        rd_slot = Signal(2, reset=rdslot)
+        wr_slot = Signal(2, reset=wrslot)
+        for casphase, cas, cas_slot in [(rdphase, "rddata_en", rd_slot), (wrphase, "wrdata_en", wr_slot)]:
+            phase = dfi.phases[casphase]
+            if casphase%2:
+                move = getattr(phase, cas)
+                slot = casphase + 1
+            elif nranks > 1:
+                move = getattr(phase, cas) & cas_delay
+                slot = 2
+            else:
+                continue
+            src, dst = cmd_phases[casphase], cmd_phases[slot]
+            self.comb += If(move,
+                [getattr(dst, name).eq(getattr(phase, name)) for name in cmd_fields],
+                src.cs_n.eq(2**nranks - 1),
+                src.act_n.eq(1),
+                src.ras_n.eq(1),
+                src.cas_n.eq(1),
+                src.we_n.eq(1),
+                cas_slot.eq(slot),
+            )
+
         # DFI to MC --------------------------------------------------------------------------------
         mc_rd_cas   = Signal()
         mc_wr_cas   = Signal()
@@ -66,107 +254,160 @@ class USDDR4MIGPHY(Module, AutoCSR):
         mc_adr      = Signal(8*addressbits)
         mc_ba       = Signal(8*len(pads.ba))
         mc_bg       = Signal(8*len(pads.bg))
-        mc_cs_n     = Signal(8)
-        mc_odt      = Signal(8)
-        mc_cke      = Signal(8)
+        mc_cs_n     = Signal(8*nranks)
+        mc_odt      = Signal(8*nranks)
+        mc_cke      = Signal(8*nranks)
+        win_rank    = Signal(max(rankbits, 1))
         self.comb += [
             # mc_act_n -----------------------------------------------------------------------------
             mc_act_n.eq(Cat(
-                dfi.phases[0].act_n, dfi.phases[0].act_n,
-                dfi.phases[1].act_n, dfi.phases[1].act_n,
-                dfi.phases[2].act_n, dfi.phases[2].act_n,
-                dfi.phases[3].act_n, dfi.phases[3].act_n)),
+                cmd_phases[0].act_n, cmd_phases[0].act_n,
+                cmd_phases[1].act_n, cmd_phases[1].act_n,
+                cmd_phases[2].act_n, cmd_phases[2].act_n,
+                cmd_phases[3].act_n, cmd_phases[3].act_n)),
             # mc_adr -------------------------------------------------------------------------------
             mc_adr.eq(Cat(
-                (Cat(dfi.phases[0].address[i], dfi.phases[0].address[i],
-                     dfi.phases[1].address[i], dfi.phases[1].address[i],
-                     dfi.phases[2].address[i], dfi.phases[2].address[i],
-                     dfi.phases[3].address[i], dfi.phases[3].address[i])
+                (Cat(cmd_phases[0].address[i], cmd_phases[0].address[i],
+                     cmd_phases[1].address[i], cmd_phases[1].address[i],
+                     cmd_phases[2].address[i], cmd_phases[2].address[i],
+                     cmd_phases[3].address[i], cmd_phases[3].address[i])
                     for i in range(addressbits-3)),
-                Cat(dfi.phases[0].we_n, dfi.phases[0].we_n,
-                    dfi.phases[1].we_n, dfi.phases[1].we_n,
-                    dfi.phases[2].we_n, dfi.phases[2].we_n,
-                    dfi.phases[3].we_n, dfi.phases[3].we_n),
-                Cat(dfi.phases[0].cas_n, dfi.phases[0].cas_n,
-                    dfi.phases[1].cas_n, dfi.phases[1].cas_n,
-                    dfi.phases[2].cas_n, dfi.phases[2].cas_n,
-                    dfi.phases[3].cas_n, dfi.phases[3].cas_n),
-                Cat(dfi.phases[0].ras_n, dfi.phases[0].ras_n,
-                    dfi.phases[1].ras_n, dfi.phases[1].ras_n,
-                    dfi.phases[2].ras_n, dfi.phases[2].ras_n,
-                    dfi.phases[3].ras_n, dfi.phases[3].ras_n))),
+                Cat(cmd_phases[0].we_n, cmd_phases[0].we_n,
+                    cmd_phases[1].we_n, cmd_phases[1].we_n,
+                    cmd_phases[2].we_n, cmd_phases[2].we_n,
+                    cmd_phases[3].we_n, cmd_phases[3].we_n),
+                Cat(cmd_phases[0].cas_n, cmd_phases[0].cas_n,
+                    cmd_phases[1].cas_n, cmd_phases[1].cas_n,
+                    cmd_phases[2].cas_n, cmd_phases[2].cas_n,
+                    cmd_phases[3].cas_n, cmd_phases[3].cas_n),
+                Cat(cmd_phases[0].ras_n, cmd_phases[0].ras_n,
+                    cmd_phases[1].ras_n, cmd_phases[1].ras_n,
+                    cmd_phases[2].ras_n, cmd_phases[2].ras_n,
+                    cmd_phases[3].ras_n, cmd_phases[3].ras_n))),
             # mc_ba --------------------------------------------------------------------------------
             mc_ba.eq(Cat(Cat(
-                dfi.phases[0].bank[i], dfi.phases[0].bank[i],
-                dfi.phases[1].bank[i], dfi.phases[1].bank[i],
-                dfi.phases[2].bank[i], dfi.phases[2].bank[i],
-                dfi.phases[3].bank[i], dfi.phases[3].bank[i])
+                cmd_phases[0].bank[i], cmd_phases[0].bank[i],
+                cmd_phases[1].bank[i], cmd_phases[1].bank[i],
+                cmd_phases[2].bank[i], cmd_phases[2].bank[i],
+                cmd_phases[3].bank[i], cmd_phases[3].bank[i])
                 for i in range(len(pads.ba)))),
             # mc_bg --------------------------------------------------------------------------------
             mc_bg.eq(Cat(Cat(
-                dfi.phases[0].bank[i], dfi.phases[0].bank[i],
-                dfi.phases[1].bank[i], dfi.phases[1].bank[i],
-                dfi.phases[2].bank[i], dfi.phases[2].bank[i],
-                dfi.phases[3].bank[i], dfi.phases[3].bank[i])
+                cmd_phases[0].bank[i], cmd_phases[0].bank[i],
+                cmd_phases[1].bank[i], cmd_phases[1].bank[i],
+                cmd_phases[2].bank[i], cmd_phases[2].bank[i],
+                cmd_phases[3].bank[i], cmd_phases[3].bank[i])
                 for i in range(len(pads.ba), len(pads.ba) + len(pads.bg)))),
             # mc_cs_n ------------------------------------------------------------------------------
-            mc_cs_n.eq(Cat(
-                dfi.phases[0].cs_n, dfi.phases[0].cs_n,
-                dfi.phases[1].cs_n, dfi.phases[1].cs_n,
-                dfi.phases[2].cs_n, dfi.phases[2].cs_n,
-                dfi.phases[3].cs_n, dfi.phases[3].cs_n)),
+            mc_cs_n.eq(Cat(Cat(
+                cmd_phases[0].cs_n[i], cmd_phases[0].cs_n[i],
+                cmd_phases[1].cs_n[i], cmd_phases[1].cs_n[i],
+                cmd_phases[2].cs_n[i], cmd_phases[2].cs_n[i],
+                cmd_phases[3].cs_n[i], cmd_phases[3].cs_n[i])
+                for i in range(nranks))),
             # mc_odt -------------------------------------------------------------------------------
-            mc_odt.eq(Cat(
-                dfi.phases[0].odt, dfi.phases[0].odt,
-                dfi.phases[1].odt, dfi.phases[1].odt,
-                dfi.phases[2].odt, dfi.phases[2].odt,
-                dfi.phases[3].odt, dfi.phases[3].odt)),
+            mc_odt.eq(Cat(Cat(
+                dfi.phases[0].odt[i], dfi.phases[0].odt[i],
+                dfi.phases[1].odt[i], dfi.phases[1].odt[i],
+                dfi.phases[2].odt[i], dfi.phases[2].odt[i],
+                dfi.phases[3].odt[i], dfi.phases[3].odt[i])
+                for i in range(nranks))),
             # mc_cke -------------------------------------------------------------------------------
-            mc_cke.eq(Cat(
-                dfi.phases[0].cke, dfi.phases[0].cke,
-                dfi.phases[1].cke, dfi.phases[1].cke,
-                dfi.phases[2].cke, dfi.phases[2].cke,
-                dfi.phases[3].cke, dfi.phases[3].cke)),
+            mc_cke.eq(Cat(Cat(
+                dfi.phases[0].cke[i], dfi.phases[0].cke[i],
+                dfi.phases[1].cke[i], dfi.phases[1].cke[i],
+                dfi.phases[2].cke[i], dfi.phases[2].cke[i],
+                dfi.phases[3].cke[i], dfi.phases[3].cke[i])
+                for i in range(nranks))),
         ]
         self.comb += [
             If(self.calib_done.status,
                 # Set mc_rd_cas if a read command is present on the DFI interface
                 mc_rd_cas.eq(dfi.phases[rdphase].rddata_en),
-                If(mc_rd_cas, mc_cas_slot.eq(rdphase)),
+                If(mc_rd_cas, mc_cas_slot.eq(rd_slot)),
                 # Set mc_wr_cas if write command is present on the DFI interface
                 mc_wr_cas.eq(dfi.phases[wrphase].wrdata_en),
-                If(mc_wr_cas, mc_cas_slot.eq(wrphase)),
-            )
+                If(mc_wr_cas, mc_cas_slot.eq(wr_slot)),
+            ),
+            win_rank.eq(cas_rank),
         ]
 
         # DFI to Read/Write Data -------------------------------------------------------------------
-        wr_data      = Signal(databits*8)
-        wr_data_mask = Signal(databits//8*8)
+        # MIG data buses are sized on the pads, lanes above databits are left unused (tied to 0 on
+        # writes, ignored on reads).
+        wr_data      = Signal(padbits*8)
+        wr_data_mask = Signal(padbits//8*8)
         wr_data_en   = Signal()
-        rd_data      = Signal(databits*8)
+        wr_data_addr = Signal(5)
+        wr_buf_adr   = Signal(5)
+        rd_data      = Signal(padbits*8)
+        rd_data_en   = Signal()
+        dfi_wr_data      = Signal(databits*8)
+        dfi_wr_data_mask = Signal(databits//8*8)
         self.comb += [
-            wr_data.eq(Cat(Cat(
+            dfi_wr_data.eq(Cat(Cat(
                 dfi.phases[0].wrdata[i], dfi.phases[0].wrdata[databits+i],
                 dfi.phases[1].wrdata[i], dfi.phases[1].wrdata[databits+i],
                 dfi.phases[2].wrdata[i], dfi.phases[2].wrdata[databits+i],
                 dfi.phases[3].wrdata[i], dfi.phases[3].wrdata[databits+i])
                 for i in range(databits))),
-            wr_data_mask.eq(Cat(Cat(
+            dfi_wr_data_mask.eq(Cat(Cat(
                 dfi.phases[0].wrdata_mask[i], dfi.phases[0].wrdata_mask[databits//8+i],
                 dfi.phases[1].wrdata_mask[i], dfi.phases[1].wrdata_mask[databits//8+i],
                 dfi.phases[2].wrdata_mask[i], dfi.phases[2].wrdata_mask[databits//8+i],
                 dfi.phases[3].wrdata_mask[i], dfi.phases[3].wrdata_mask[databits//8+i])
                 for i in range(databits//8))),
-            Cat(Cat(
-                dfi.phases[0].rddata[i], dfi.phases[0].rddata[databits+i],
-                dfi.phases[1].rddata[i], dfi.phases[1].rddata[databits+i],
-                dfi.phases[2].rddata[i], dfi.phases[2].rddata[databits+i],
-                dfi.phases[3].rddata[i], dfi.phases[3].rddata[databits+i])
-                for i in range(databits)).eq(rd_data)
         ]
-        rd_data_en = Signal() # FIXME: use
 
+        # MIG Model (simulation) -------------------------------------------------------------------
+        # sim_model can be set to False to drive the MIG side directly or to a dict of
+        # USDDR4MIGPHYModel parameters.
+        if simulation and sim_model:
+            sim_model_kwargs = sim_model if isinstance(sim_model, dict) else {}
+            self.submodules.model = model = USDDR4MIGPHYModel(
+                addressbits = addressbits,
+                babits      = len(pads.ba),
+                bgbits      = len(pads.bg),
+                databits    = padbits,
+                nranks      = nranks,
+                cl          = cl,
+                cwl         = cwl,
+                write_dbi   = write_dbi,
+                read_dbi    = read_dbi,
+                **sim_model_kwargs)
+            self.comb += [
+                # Calibration
+                self.calib_done.status.eq(model.calib_done),
+
+                # PHY Commands
+                model.mc_act_n.eq(mc_act_n),
+                model.mc_adr.eq(mc_adr),
+                model.mc_ba.eq(mc_ba),
+                model.mc_bg.eq(mc_bg),
+                model.mc_cs_n.eq(mc_cs_n),
+                model.mc_odt.eq(mc_odt),
+                model.mc_cke.eq(mc_cke),
+                model.mc_cas_slot.eq(mc_cas_slot),
+                model.win_rank.eq(win_rank),
+                model.mc_rd_cas.eq(mc_rd_cas),
+                model.mc_wr_cas.eq(mc_wr_cas),
+                model.d_buf_adr.eq(wr_buf_adr),
+
+                # PHY Writes
+                model.wr_data.eq(wr_data),
+                model.wr_data_mask.eq(wr_data_mask),
+                wr_data_en.eq(model.wr_data_en),
+                wr_data_addr.eq(model.wr_data_addr),
+
+                # PHY Reads
+                rd_data.eq(model.rd_data),
+                rd_data_en.eq(model.rd_data_en),
+            ]
+
+        # MIG --------------------------------------------------------------------------------------
         if not simulation:
+            xci = os.path.join("ip", "ddr4_0", "ddr4_0.xci")
+            check_mig_xci(xci, data_rate, cl, cwl, write_dbi, read_dbi)
             rst    = platform.request("cpu_reset")
             clk300 = platform.request("clk300")
             self.specials += Instance("ddr4_0",
@@ -197,8 +438,8 @@ class USDDR4MIGPHY(Module, AutoCSR):
                 o_c0_init_calib_complete  = self.calib_done.status,
 
                 # PHY Statics / Optionals --------------------------------------------------------------
-                i_dBufAdr                    = 0,           # Reserved, should be tied low
-                o_wrDataAddr                 = Signal(5),   # Not used (optional)
+                i_dBufAdr                    = wr_buf_adr,  # Write buffer address (returned on wrDataAddr)
+                o_wrDataAddr                 = wr_data_addr,
                 o_rdDataAddr                 = Signal(5),   # Not used (optional)
                 o_per_rd_done                = Signal(),    # Not used (optional)
                 o_rmw_rd_done                = Signal(),    # Not used (optional)
@@ -207,7 +448,7 @@ class USDDR4MIGPHY(Module, AutoCSR):
                 i_gt_data_ready              = 0,           # Not used (optional)
                 o_dbg_bus                    = Signal(512), # Not used (optional)
                 o_tCWL                       = Signal(),    # tCWL, FIXME: add check with internal tCWL
-                i_winRank                    = 0,           # Tied to 0 for single-rank systems, FIXME for dual-rank
+                i_winRank                    = win_rank,    # Rank of the CAS command
                 i_winBuf                     = 0,           # Not used (optional)
 
                 # PHY Commands -------------------------------------------------------------------------
@@ -235,28 +476,191 @@ class USDDR4MIGPHY(Module, AutoCSR):
             if use_dcp:
                 platform.add_source(os.path.join("ip", "ddr4_0", "ddr4_0.dcp"))
             else:
-                platform.add_ip(os.path.join("ip", "ddr4_0", "ddr4_0.xci"))
+                platform.add_ip(xci)
+
+        # Read Data Return -------------------------------------------------------------------------
+        # Read data is captured in a FIFO on rdDataEn and released to the DFI read_latency cycles
+        # after the read command, the FIFO absorbs the variable MIG read latency. The measured MIG
+        # latency (mcRdCAS to rdDataEn, in sys_clk cycles) is reported in rd_latency (max value
+        # seen), read_latency can be lowered down to rd_latency + 2. rd_underflow is set when
+        # data is not available at release time, read_latency is then too low.
+        rd_fifo = SyncFIFO(8*databits, max(read_latency, 2))
+        self.submodules += rd_fifo
+        self.comb += [
+            rd_fifo.we.eq(rd_data_en),
+            rd_fifo.din.eq(rd_data),
+        ]
 
-        # Flow Control (for debug) -----------------------------------------------------------------
-        rddata_en = dfi.phases[self.settings.rdphase].rddata_en
-        for i in range(self.settings.read_latency-1):
+        # Release read data read_latency cycles after the read command (last cycle is registered).
+        rddata_en = mc_rd_cas
+        for i in range(read_latency-1):
             n_rddata_en = Signal()
             self.sync += n_rddata_en.eq(rddata_en)
             rddata_en = n_rddata_en
+        rddata       = Signal(8*databits)
+        rddata_valid = Signal()
+        self.comb += rd_fifo.re.eq(rddata_en)
+        self.sync += [
+            rddata.eq(rd_fifo.dout),
+            rddata_valid.eq(rddata_en & rd_fifo.readable),
+            If(rddata_en & ~rd_fifo.readable,
+                self.rd_underflow.status.eq(1)
+            )
+        ]
+        self.comb += [
+            Cat(Cat(
+                dfi.phases[0].rddata[i], dfi.phases[0].rddata[databits+i],
+                dfi.phases[1].rddata[i], dfi.phases[1].rddata[databits+i],
+                dfi.phases[2].rddata[i], dfi.phases[2].rddata[databits+i],
+                dfi.phases[3].rddata[i], dfi.phases[3].rddata[databits+i])
+                for i in range(databits)).eq(rddata),
+            [phase.rddata_valid.eq(rddata_valid) for phase in dfi.phases]
+        ]
+
+        # Measure MIG read latency: timestamp read commands and compare on rdDataEn.
+        rd_timer      = Signal(8)
+        rd_measured   = Signal(8)
+        rd_timestamps = SyncFIFO(len(rd_timer), 16)
+        self.submodules += rd_timestamps
+        self.sync += rd_timer.eq(rd_timer + 1)
+        self.comb += [
+            rd_timestamps.we.eq(mc_rd_cas),
+            rd_timestamps.din.eq(rd_timer),
+            rd_timestamps.re.eq(rd_data_en),
+            rd_measured.eq(rd_timer - rd_timestamps.dout),
+        ]
+        self.sync += [
+            If(rd_data_en & rd_timestamps.readable,
+                If(rd_measured > self.rd_latency.status,
+                    self.rd_latency.status.eq(rd_measured)
+                )
+            )
+        ]
+
+        # Write Data Staging -----------------------------------------------------------------------
+        # Each write command is given a buffer address (dBufAdr) that the MIG returns on wrDataAddr
+        # when requesting the data (wrDataEn). DFI write data is stored at this address
+        # write_latency cycles after the write command and presented to the MIG on the cycle after
+        # wrDataEn. wr_underflow is set when the MIG requests data not yet received from the DFI.
+        wr_buf    = Memory(len(dfi_wr_data) + len(dfi_wr_data_mask), 2**len(wr_buf_adr))
+        wr_buf_wp = wr_buf.get_port(write_capable=True)
+        wr_buf_rp = wr_buf.get_port()
+        self.specials += wr_buf, wr_buf_wp, wr_buf_rp
+
+        # Capture DFI write data write_latency cycles after the write command.
+        wrdata_en = mc_wr_cas
+        for i in range(write_latency):
+            n_wrdata_en = Signal()
+            self.sync += n_wrdata_en.eq(wrdata_en)
+            wrdata_en = n_wrdata_en
+        wr_data_ptr = Signal(len(wr_buf_adr))
+        self.comb += [
+            wr_buf_wp.we.eq(wrdata_en),
+            wr_buf_wp.adr.eq(wr_data_ptr),
+            wr_buf_wp.dat_w.eq(Cat(dfi_wr_data, dfi_wr_data_mask)),
+        ]
+        self.sync += [
+            If(mc_wr_cas, wr_buf_adr.eq(wr_buf_adr + 1)),
+            If(wrdata_en, wr_data_ptr.eq(wr_data_ptr + 1)),
+        ]
+
+        # Present write data to the MIG on the cycle after wrDataEn.
+        wr_buf_data = wr_buf_rp.dat_r[:len(dfi_wr_data)]
+        wr_buf_mask = wr_buf_rp.dat_r[len(dfi_wr_data):]
+        self.comb += wr_buf_rp.adr.eq(wr_data_addr)
+
+        # Write DBI --------------------------------------------------------------------------------
+        # Each byte (of each beat) with more than 4 zeros is inverted and sent with DBI_n low. DBI_n
+        # is driven on DM_DBI_n through wrDataMask: DDR4 write DBI and data masks are exclusive,
+        # DFI write masks are then ignored.
+        if write_dbi:
+            for i in range(databits//8):
+                for beat in range(8):
+                    byte  = [wr_buf_data[8*(8*i + j) + beat] for j in range(8)]
+                    dbi_n = Signal()
+                    self.comb += [
+                        dbi_n.eq(sum(byte) >= 4),
+                        wr_data_mask[8*i + beat].eq(dbi_n),
+                        [wr_data[8*(8*i + j) + beat].eq(byte[j] ^ ~dbi_n) for j in range(8)],
+                    ]
+        else:
+            self.comb += [
+                wr_data.eq(wr_buf_data),
+                wr_data_mask.eq(wr_buf_mask),
+            ]
+
+        wr_pending = Signal(len(wr_buf_adr) + 1)
+        self.sync += [
+            wr_pending.eq(wr_pending + wrdata_en - wr_data_en),
+            If(wr_data_en & (wr_pending == 0),
+                self.wr_underflow.status.eq(1)
+            )
+        ]
 
-        wrdata_en = Signal()
-        last_wrdata_en = Signal(cwl_sys_latency+2)
-        wrphase = dfi.phases[self.settings.wrphase]
-        self.sync += last_wrdata_en.eq(Cat(wrphase.wrdata_en, last_wrdata_en[:-1]))
-        self.comb += wrdata_en.eq(last_wrdata_en[cwl_sys_latency])
+        # Performance Counters ---------------------------------------------------------------------
+        # Free-running counters of the commands sent to the MIG (decoded from the mc_* signals on
+        # the DRAM clock slots), copied to the CSRs on snapshot: cycles (sys_clk), rd_cas, wr_cas,
+        # act, pre, ref, idle (sys_clk cycles without command) and rd_to_wr/wr_to_rd (CAS
+        # direction changes).
+        if with_counters:
+            counters = {name: Signal(64) for name in perf_counters}
+            slots    = {name: [] for name in ["cmd", "act", "pre", "ref"]}
+            for slot in range(0, 8, 2):
+                cs    = ~reduce(and_, [mc_cs_n[8*r + slot] for r in range(nranks)])
+                we_n  = mc_adr[8*(addressbits - 3) + slot]
+                cas_n = mc_adr[8*(addressbits - 2) + slot]
+                ras_n = mc_adr[8*(addressbits - 1) + slot]
+                act_n = mc_act_n[slot]
+                for name, cmd in [("cmd", cs),
+                                  ("act", cs & ~act_n),
+                                  ("pre", cs & act_n & ~ras_n &  cas_n & ~we_n),
+                                  ("ref", cs & act_n & ~ras_n & ~cas_n &  we_n)]:
+                    slots[name].append(Signal())
+                    self.comb += slots[name][-1].eq(cmd)
+            cas_seen    = Signal()
+            cas_wr_last = Signal()
+            self.sync += [
+                If(mc_rd_cas | mc_wr_cas,
+                    cas_seen.eq(1),
+                    cas_wr_last.eq(mc_wr_cas)
+                ),
+                counters["cycles"].eq(counters["cycles"] + 1),
+                counters["rd_cas"].eq(counters["rd_cas"] + mc_rd_cas),
+                counters["wr_cas"].eq(counters["wr_cas"] + mc_wr_cas),
+                counters["act"].eq(counters["act"] + reduce(add, slots["act"])),
+                counters["pre"].eq(counters["pre"] + reduce(add, slots["pre"])),
+                counters["ref"].eq(counters["ref"] + reduce(add, slots["ref"])),
+                If(~reduce(or_, slots["cmd"]),
+                    counters["idle"].eq(counters["idle"] + 1)
+                ),
+                If(mc_wr_cas & cas_seen & ~cas_wr_last,
+                    counters["rd_to_wr"].eq(counters["rd_to_wr"] + 1)
+                ),
+                If(mc_rd_cas & cas_seen & cas_wr_last,
+                    counters["wr_to_rd"].eq(counters["wr_to_rd"] + 1)
+                ),
+                If(self.snapshot.re,
+                    [getattr(self, name).status.eq(counters[name]) for name in perf_counters]
+                ),
+            ]
 
         # Debug ------------------------------------------------------------------------------------
         self.mc_rd_cas      = mc_rd_cas
         self.mc_wr_cas      = mc_wr_cas
         self.mc_cas_slot    = mc_cas_slot
+        self.mc_act_n       = mc_act_n
+        self.mc_adr         = mc_adr
+        self.mc_ba          = mc_ba
+        self.mc_bg          = mc_bg
+        self.mc_cs_n        = mc_cs_n
+        self.mc_odt         = mc_odt
+        self.mc_cke         = mc_cke
+        self.win_rank       = win_rank
         self.wr_data_mask   = wr_data_mask
         self.wr_data        = wr_data
         self.wr_data_en     = wr_data_en
+        self.wr_data_addr   = wr_data_addr
+        self.wr_buf_adr     = wr_buf_adr
         self.rd_data        = rd_data
         self.rd_data_en     = rd_data_en
 
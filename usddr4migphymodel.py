@@ -0,0 +1,249 @@
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+from functools import reduce
+from operator import or_
+
+from migen import *
+from migen.genlib.record import Record
+
+from litedram.common import get_sys_latency
+
+# Pads ---------------------------------------------------------------------------------------------
+
+def ddr4_model_pads(databits=64, nranks=1):
+    """DDR4 pads (KCU105 layout) to use with USDDR4MIGPHY in simulation."""
+    return Record([
+        ("a",       14),
+        ("ba",       2),
+        ("bg",       1),
+        ("ras_n",    1),
+        ("cas_n",    1),
+        ("we_n",     1),
+        ("cs_n",     nranks),
+        ("act_n",    1),
+        ("dm",       databits//8),
+        ("dq",       databits),
+        ("dqs_p",    databits//8),
+        ("dqs_n",    databits//8),
+        ("clk_p",    1),
+        ("clk_n",    1),
+        ("cke",      nranks),
+        ("odt",      nranks),
+        ("reset_n",  1),
+    ])
+
+# Xilinx Ultrascale DDR4 MIG PHY-only Model --------------------------------------------------------
+
+class USDDR4MIGPHYModel(Module):
+    """Behavioral model of the Xilinx Ultrascale DDR4 MIG PHY-only interface
+
+    Cycle-accurate (sys_clk) model of the MIG PHY-only user interface, synthesizable so that it can
+    be used in Verilator simulations as well as with Migen's simulator:
+    - Calibration completes calib_delay cycles after reset.
+    - mc_* commands are decoded on each DRAM clock (slots 0, 2, 4, 6), ACTs open the rows used to
+      address the following CASs (of the rank given by winRank for multi-rank systems).
+    - Read CASs (mcRdCAS/mcCasSlot) return rdData/rdDataEn/rdDataAddr rd_latency cycles later
+      (default: CL + 4 sys_clk cycles, a value of the model, not of the MIG).
+    - Write CASs (mcWrCAS/mcCasSlot) request data with wrDataEn/wrDataAddr wr_latency cycles later,
+      data is sampled on the next cycle.
+    - With write_dbi, wrDataMask is the DBI_n of each byte (data is inverted when low) and all
+      bytes are written. Read DBI is encoded by the DRAM and decoded by the MIG, so rdData is
+      unchanged with read_dbi.
+
+    The DRAM content is stored in a memory of mem_depth bursts addressed by the lowest bits of
+    {row, rank, bank, column}, higher address bits are ignored (aliased).
+
+    Memory is read on the read CAS and written when the write data is sampled: a read CAS to the
+    burst of a write CAS still in flight would return stale data (a real DRAM would not, tWTR
+    prevents it). Such reads set raw_hazard (sticky), to be checked by the testbenches.
+    """
+    def __init__(self, addressbits, babits, bgbits, databits, nranks=1, cl=11, cwl=9,
+        calib_delay=1000, rd_latency=None, wr_latency=None, mem_depth=2**14,
+        write_dbi=False, read_dbi=False):
+        nphases  = 4
+        nbanks   = 2**(babits + bgbits)
+        rankbits = log2_int(nranks)
+        colbits  = 10
+        if rd_latency is None:
+            rd_latency = get_sys_latency(nphases, cl) + 4
+        if wr_latency is None:
+            wr_latency = get_sys_latency(nphases, cwl)
+        assert rd_latency >= 2
+        assert wr_latency >= 1
+
+        # PHY Commands
+        self.mc_act_n     = Signal(8)
+        self.mc_adr       = Signal(8*addressbits)
+        self.mc_ba        = Signal(8*babits)
+        self.mc_bg        = Signal(8*bgbits)
+        self.mc_cs_n      = Signal(8*nranks)
+        self.mc_odt       = Signal(8*nranks)
+        self.mc_cke       = Signal(8*nranks)
+        self.mc_cas_slot  = Signal(2)
+        self.win_rank     = Signal(max(rankbits, 1))
+        self.mc_rd_cas    = Signal()
+        self.mc_wr_cas    = Signal()
+        self.d_buf_adr    = Signal(5)
+
+        # PHY Writes
+        self.wr_data      = Signal(8*databits)
+        self.wr_data_mask = Signal(databits)
+        self.wr_data_en   = Signal()
+        self.wr_data_addr = Signal(5)
+
+        # PHY Reads
+        self.rd_data      = Signal(8*databits)
+        self.rd_data_en   = Signal()
+        self.rd_data_addr = Signal(5)
+
+        # Calibration
+        self.calib_done   = Signal()
+
+        # Checks
+        self.raw_hazard   = Signal()
+
+        # # #
+
+        # Calibration ------------------------------------------------------------------------------
+        calib_count = Signal(max=calib_delay + 1, reset=calib_delay)
+        self.sync += If(calib_count != 0, calib_count.eq(calib_count - 1))
+        self.comb += self.calib_done.eq(calib_count == 0)
+
+        # Slots decoding ---------------------------------------------------------------------------
+        def slot_field(signal, width, slot):
+            return Cat(signal[8*i + slot] for i in range(width))
+
+        slots = []
+        for n in range(nphases):
+            slot = 2*n # Commands are duplicated on both slots of a DRAM clock.
+            cs   = ~slot_field(self.mc_cs_n, nranks, slot)
+            rank = Signal(max(rankbits, 1))
+            for r in range(nranks):
+                self.comb += If(cs[r], rank.eq(r))
+            slots.append(dict(
+                act  = (cs != 0) & ~self.mc_act_n[slot],
+                adr  = slot_field(self.mc_adr, addressbits, slot),
+                bank = Cat(slot_field(self.mc_ba, babits, slot), slot_field(self.mc_bg, bgbits, slot)),
+                rank = rank,
+            ))
+
+        # Open rows --------------------------------------------------------------------------------
+        def rank_bank(rank, bank):
+            return bank if nranks == 1 else Cat(bank, rank)
+
+        open_rows = Array(Signal(addressbits) for _ in range(nranks*nbanks))
+        for slot in slots:
+            self.sync += If(self.calib_done & slot["act"],
+                open_rows[rank_bank(slot["rank"], slot["bank"])].eq(slot["adr"]))
+
+        # CAS address ------------------------------------------------------------------------------
+        cas_adr  = Array(slot["adr"]  for slot in slots)[self.mc_cas_slot]
+        cas_bank = Array(slot["bank"] for slot in slots)[self.mc_cas_slot]
+        cas_row  = open_rows[rank_bank(self.win_rank, cas_bank)]
+        # Only the log2(mem_depth) LSBs of {row, rank, bank, column} are kept: bursts whose
+        # addresses only differ above share a memory location (aliasing, data read back is the last
+        # written through any of the aliases, not a corruption).
+        mem_adr  = Signal(log2_int(mem_depth))
+        self.comb += mem_adr.eq(Cat(cas_adr[3:colbits], rank_bank(self.win_rank, cas_bank), cas_row))
+
+        # Memory -----------------------------------------------------------------------------------
+        # Stored with beats as MSBs (beat-major) so that byte enables map to bytes of each beat,
+        # the MIG buses are DQ-major (8 consecutive bits per DQ).
+        def dq_to_beat_major(signal, width):
+            return Cat(signal[8*i + beat] for beat in range(8) for i in range(width))
+
+        def beat_to_dq_major(signal, width):
+            return Cat(signal[width*beat + i] for i in range(width) for beat in range(8))
+
+        mem = Memory(8*databits, mem_depth)
+        wr_port = mem.get_port(write_capable=True, we_granularity=8)
+        rd_port = mem.get_port()
+        self.specials += mem, wr_port, rd_port
+
+        # Reads ------------------------------------------------------------------------------------
+        # Memory is read on the CAS cycle, data is then delayed to get a rd_latency cycles latency.
+        rd_valid = Signal()
+        rd_addr  = Signal(5)
+        rd_data  = Signal(8*databits)
+        self.comb += rd_port.adr.eq(mem_adr)
+        self.sync += [
+            rd_valid.eq(self.calib_done & self.mc_rd_cas),
+            rd_addr.eq(self.d_buf_adr),
+        ]
+        self.comb += rd_data.eq(beat_to_dq_major(rd_port.dat_r, databits))
+        for i in range(rd_latency - 1):
+            n_rd_valid = Signal()
+            n_rd_data  = Signal(8*databits)
+            n_rd_addr  = Signal(5)
+            self.sync += [
+                n_rd_valid.eq(rd_valid),
+                n_rd_data.eq(rd_data),
+                n_rd_addr.eq(rd_addr),
+            ]
+            rd_valid, rd_data, rd_addr = n_rd_valid, n_rd_data, n_rd_addr
+        self.comb += [
+            self.rd_data_en.eq(rd_valid),
+            self.rd_data.eq(rd_data),
+            self.rd_data_addr.eq(rd_addr),
+        ]
+
+        # Writes -----------------------------------------------------------------------------------
+        wr_valid   = Signal()
+        wr_addr    = Signal(5)
+        wr_mem     = Signal(len(mem_adr))
+        wr_pending = [] # (valid, memory address) of the writes in flight.
+        self.comb += [
+            wr_valid.eq(self.calib_done & self.mc_wr_cas),
+            wr_addr.eq(self.d_buf_adr),
+            wr_mem.eq(mem_adr),
+        ]
+        for i in range(wr_latency):
+            n_wr_valid = Signal()
+            n_wr_addr  = Signal(5)
+            n_wr_mem   = Signal(len(mem_adr))
+            self.sync += [
+                n_wr_valid.eq(wr_valid),
+                n_wr_addr.eq(wr_addr),
+                n_wr_mem.eq(wr_mem),
+            ]
+            wr_valid, wr_addr, wr_mem = n_wr_valid, n_wr_addr, n_wr_mem
+            wr_pending.append((wr_valid, wr_mem))
+        self.comb += [
+            self.wr_data_en.eq(wr_valid),
+            self.wr_data_addr.eq(wr_addr),
+        ]
+
+        # Write data is sampled on the cycle following wrDataEn.
+        wr_sample     = Signal()
+        wr_sample_mem = Signal(len(mem_adr))
+        self.sync += [
+            wr_sample.eq(wr_valid),
+            wr_sample_mem.eq(wr_mem),
+        ]
+        wr_pending.append((wr_sample, wr_sample_mem))
+
+        # Read after a write still in flight to the same burst.
+        self.sync += If(self.calib_done & self.mc_rd_cas &
+            reduce(or_, [valid & (mem == mem_adr) for valid, mem in wr_pending]),
+            self.raw_hazard.eq(1)
+        )
+
+        # With write DBI, wrDataMask carries DBI_n: data is decoded and all bytes are written.
+        wr_data = Signal(8*databits)
+        wr_mask = Signal(databits)
+        if write_dbi:
+            self.comb += wr_data.eq(Cat(self.wr_data[8*(8*i + j) + beat] ^ ~self.wr_data_mask[8*i + beat]
+                for i in range(databits//8) for j in range(8) for beat in range(8)))
+        else:
+            self.comb += [
+                wr_data.eq(self.wr_data),
+                wr_mask.eq(self.wr_data_mask),
+            ]
+        self.comb += [
+            wr_port.adr.eq(wr_sample_mem),
+            wr_port.dat_w.eq(dq_to_beat_major(wr_data, databits)),
+            If(wr_sample,
+                wr_port.we.eq(~dq_to_beat_major(wr_mask, databits//8))
+            )
+        ]
@@ -0,0 +1,390 @@
+# This file is Copyright (c) 2026 Florent Kermarrec <florent@enjoy-digital.fr>
+# License: BSD
+
+from functools import reduce
+from operator import add, or_
+
+from migen import *
+from migen.genlib.fifo import SyncFIFO
+
+from litex.soc.interconnect.csr import *
+
+from litedram.common import LiteDRAMNativePort
+
+# Helpers ------------------------------------------------------------------------------------------
+
+def _select(module, valids, keys):
+    """Combinatorial selection of the valid entry with the highest key (lowest index on ties),
+    returns (found, index)."""
+    found = Constant(0)
+    index = Constant(0)
+    best  = Constant(0)
+    for n, (valid, key) in enumerate(zip(valids, keys)):
+        take      = Signal()
+        new_found = Signal()
+        new_index = Signal(max=max(len(valids), 2))
+        new_best  = Signal(len(key))
+        module.comb += [
+            take.eq(valid & (~found | (key > best))),
+            new_found.eq(found | valid),
+            new_index.eq(Mux(take, n, index)),
+            new_best.eq(Mux(take, key, best)),
+        ]
+        found, index, best = new_found, new_index, new_best
+    return found, index
+
+# Write Buffer -------------------------------------------------------------------------------------
+
+class WriteBuffer(Module, AutoCSR):
+    """Write buffering and read reordering stage in front of a LiteDRAM native port
+
+    Sits between a user native port (self.port) and a crossbar port (ROW_BANK_COL addresses:
+    colbits column bits, then bankbits bank bits) to reduce the read/write turnarounds of mixed
+    traffic:
+    - Writes are posted in a depth entries buffer, a write to a buffered address is combined with
+      it (byte enables). The buffer is drained in batches: from high_watermark entries down to
+      low_watermark entries (or when no read is waiting), entries hitting an open row first.
+    - Reads are held in a read_depth window (also holding the reads in flight until their data is
+      returned) and issued open row hits first (reorder) when not draining, read data is returned
+      in order.
+    - A read to a buffered address forces a drain of the buffer (flush) before it is issued, a
+      write to the address of a read not yet issued waits for it.
+
+    level is the number of buffered writes. Counters (cleared with clear): combined writes,
+    reordered reads, flushes and turnarounds (direction changes of the commands issued to the
+    controller).
+
+    With bypass (reset value: bypass), self.port is connected directly to the controller port.
+    bypass must only be changed with no access in flight and the buffer empty (level = 0).
+    """
+    def __init__(self, port, colbits, bankbits, depth=16, read_depth=16, bypass=False):
+        assert read_depth >= 2 and read_depth & (read_depth - 1) == 0
+        self.port = LiteDRAMNativePort("both", port.address_width, port.data_width)
+
+        self.bypass         = CSRStorage(reset=bypass)
+        self.high_watermark = CSRStorage(bits_for(depth), reset=3*depth//4)
+        self.low_watermark  = CSRStorage(bits_for(depth), reset=depth//4)
+        self.reorder        = CSRStorage(reset=1)
+        self.level          = CSRStatus(bits_for(depth))
+        self.clear          = CSR()
+        self.combined       = CSRStatus(32)
+        self.reordered      = CSRStatus(32)
+        self.flushes        = CSRStatus(32)
+        self.turnarounds    = CSRStatus(32)
+
+        # # #
+
+        aw = port.address_width
+        dw = port.data_width
+        bw = dw//8
+
+        # Bypass -----------------------------------------------------------------------------------
+        # user/port: buffer side of self.port and of the controller port.
+        controller = port
+        user       = LiteDRAMNativePort("both", aw, dw)
+        port       = LiteDRAMNativePort("both", aw, dw)
+        self.comb += [
+            If(self.bypass.storage,
+                self.port.cmd.connect(controller.cmd),
+                self.port.wdata.connect(controller.wdata),
+                controller.rdata.connect(self.port.rdata)
+            ).Else(
+                self.port.cmd.connect(user.cmd),
+                self.port.wdata.connect(user.wdata),
+                user.rdata.connect(self.port.rdata),
+                port.cmd.connect(controller.cmd),
+                port.wdata.connect(controller.wdata),
+                controller.rdata.connect(port.rdata)
+            )
+        ]
+
+        def bank(addr):
+            return addr[colbits:colbits + bankbits]
+
+        def row(addr):
+            return addr[colbits + bankbits:]
+
+        # Open rows (last row accessed in each bank) -----------------------------------------------
+        open_valid = Array(Signal()                             for n in range(2**bankbits))
+        open_row   = Array(Signal(aw - colbits - bankbits) for n in range(2**bankbits))
+
+        def row_hit(addr):
+            hit = Signal()
+            self.comb += hit.eq(open_valid[bank(addr)] & (open_row[bank(addr)] == row(addr)))
+            return hit
+
+        # Write entries ----------------------------------------------------------------------------
+        wr_valid = [Signal()   for n in range(depth)]
+        wr_addr  = [Signal(aw) for n in range(depth)]
+        wr_data  = [Signal(dw) for n in range(depth)]
+        wr_we    = [Signal(bw) for n in range(depth)]
+        count    = Signal(max=depth + 1)
+        self.comb += [
+            count.eq(reduce(add, wr_valid)),
+            self.level.status.eq(count),
+        ]
+
+        # Read window ------------------------------------------------------------------------------
+        rd_used   = [Signal()   for n in range(read_depth)]
+        rd_issued = [Signal()   for n in range(read_depth)]
+        rd_ready  = [Signal()   for n in range(read_depth)]
+        rd_addr   = [Signal(aw) for n in range(read_depth)]
+        rd_data   = [Signal(dw) for n in range(read_depth)]
+        rd_alloc  = Signal(max=max(read_depth, 2))
+        rd_ret    = Signal(max=max(read_depth, 2))
+        rd_held   = [Signal() for n in range(read_depth)]
+        rd_raw    = [Signal() for n in range(read_depth)]
+        for n in range(read_depth):
+            self.comb += [
+                rd_held[n].eq(rd_used[n] & ~rd_issued[n]),
+                # Read after write: buffered write to the read address.
+                rd_raw[n].eq(reduce(or_, [wr_valid[i] & (wr_addr[i] == rd_addr[n])
+                    for i in range(depth)])),
+            ]
+
+        # Mode: draining writes or issuing reads ---------------------------------------------------
+        write_mode = Signal()
+        reads_held = Signal()
+        raw        = Signal()
+        self.comb += [
+            reads_held.eq(reduce(or_, rd_held) | (user.cmd.valid & ~user.cmd.we)),
+            raw.eq(reduce(or_, [rd_held[n] & rd_raw[n] for n in range(read_depth)])),
+        ]
+        self.sync += [
+            If(~write_mode,
+                If((count >= self.high_watermark.storage) | raw | ((count != 0) & ~reads_held),
+                    write_mode.eq(1)
+                )
+            ).Else(
+                If((count == 0) |
+                   ((count <= self.low_watermark.storage) & reads_held & ~raw),
+                    write_mode.eq(0)
+                )
+            )
+        ]
+
+        # Drain / read issue selection -------------------------------------------------------------
+        wr_busy   = Signal()
+        wr_target = Signal(max=max(depth, 2))
+        wr_fifo   = SyncFIFO(dw + bw, 4)
+        rd_fifo   = SyncFIFO(bits_for(read_depth - 1), read_depth)
+        self.submodules += wr_fifo, rd_fifo
+
+        drain_found, drain_index = _select(self,
+            valids = [wr_valid[i] & ~(wr_busy & (wr_target == i)) for i in range(depth)],
+            keys   = [row_hit(wr_addr[i]) for i in range(depth)])
+
+        # Reads: oldest first, open row hits first when reordering, reads to buffered addresses
+        # are skipped (wait for the drain).
+        age_bits = log2_int(read_depth, need_pow2=False) + 1
+        rd_age   = [Signal(age_bits) for n in range(read_depth)]
+        rd_keys  = []
+        for n in range(read_depth):
+            self.comb += rd_age[n].eq(read_depth - 1 - ((n - rd_ret) & (read_depth - 1)))
+            rd_keys.append(Cat(rd_age[n], self.reorder.storage & row_hit(rd_addr[n])))
+        read_found, read_index = _select(self,
+            valids = [rd_held[n] & ~rd_raw[n] for n in range(read_depth)],
+            keys   = rd_keys)
+        oldest_found, oldest_index = _select(self,
+            valids = rd_held,
+            keys   = rd_age)
+
+        # Commands to the controller (held while waiting) ------------------------------------------
+        locked    = Signal()
+        sel_we    = Signal()
+        sel_index = Signal(max=max(depth, read_depth, 2))
+        cmd_we    = Signal()
+        cmd_index = Signal(max=max(depth, read_depth, 2))
+        cmd_valid = Signal()
+        self.comb += [
+            If(locked,
+                cmd_valid.eq(1),
+                cmd_we.eq(sel_we),
+                cmd_index.eq(sel_index)
+            ).Elif(write_mode,
+                cmd_valid.eq(drain_found & wr_fifo.writable),
+                cmd_we.eq(1),
+                cmd_index.eq(drain_index)
+            ).Else(
+                # In-order mode: the oldest read only.
+                cmd_valid.eq(read_found & rd_fifo.writable &
+                             (self.reorder.storage | (read_index == oldest_index))),
+                cmd_we.eq(0),
+                cmd_index.eq(read_index)
+            ),
+            port.cmd.valid.eq(cmd_valid),
+            port.cmd.we.eq(cmd_we),
+            port.cmd.addr.eq(Mux(cmd_we,
+                Array(wr_addr)[cmd_index],
+                Array(rd_addr)[cmd_index[:max(bits_for(read_depth - 1), 1)]])),
+        ]
+        cmd_done = Signal()
+        drain    = Signal()
+        issue    = Signal()
+        self.comb += [
+            cmd_done.eq(port.cmd.valid & port.cmd.ready),
+            drain.eq(cmd_done & cmd_we),
+            issue.eq(cmd_done & ~cmd_we),
+        ]
+        last_we   = Signal()
+        last_seen = Signal()
+        self.sync += [
+            locked.eq(port.cmd.valid & ~port.cmd.ready),
+            sel_we.eq(cmd_we),
+            sel_index.eq(cmd_index),
+            If(cmd_done,
+                open_valid[bank(port.cmd.addr)].eq(1),
+                open_row[bank(port.cmd.addr)].eq(row(port.cmd.addr)),
+                last_seen.eq(1),
+                last_we.eq(cmd_we)
+            )
+        ]
+
+        # Write data to the controller (copied from the entry when its command is issued).
+        drain_data = Signal(dw)
+        drain_we   = Signal(bw)
+        self.comb += [
+            drain_data.eq(Array(wr_data)[cmd_index]),
+            drain_we.eq(Array(wr_we)[cmd_index]),
+            wr_fifo.we.eq(drain),
+            wr_fifo.din.eq(Cat(drain_data, drain_we)),
+            port.wdata.valid.eq(wr_fifo.readable),
+            port.wdata.data.eq(wr_fifo.dout[:dw]),
+            port.wdata.we.eq(wr_fifo.dout[dw:]),
+            wr_fifo.re.eq(port.wdata.ready),
+        ]
+
+        # Read data from the controller (in issue order) to the read window.
+        self.comb += [
+            rd_fifo.we.eq(issue),
+            rd_fifo.din.eq(cmd_index),
+            port.rdata.ready.eq(1),
+            rd_fifo.re.eq(port.rdata.valid),
+        ]
+
+        # User commands ----------------------------------------------------------------------------
+        wr_match = [Signal() for i in range(depth)]
+        for i in range(depth):
+            self.comb += wr_match[i].eq(wr_valid[i] & (wr_addr[i] == user.cmd.addr))
+        free_found, free_index = _select(self,
+            valids = [~wr_valid[i] for i in range(depth)],
+            keys   = [Constant(0) for i in range(depth)])
+        wr_hit, hit_index = _select(self,
+            valids = wr_match,
+            keys   = [Constant(0) for i in range(depth)])
+        # Write after read: read not yet issued to the write address.
+        war = Signal()
+        self.comb += war.eq(reduce(or_, [rd_held[n] & (rd_addr[n] == user.cmd.addr)
+            for n in range(read_depth)]))
+
+        wr_accept = Signal()
+        rd_accept = Signal()
+        self.comb += [
+            If(user.cmd.we,
+                user.cmd.ready.eq(~wr_busy & (wr_hit | free_found) & ~war &
+                    # Entry being drained.
+                    ~(drain & wr_hit & (cmd_index == hit_index)))
+            ).Else(
+                user.cmd.ready.eq(~wr_busy & ~Array(rd_used)[rd_alloc])
+            ),
+            wr_accept.eq(user.cmd.valid & user.cmd.ready & user.cmd.we),
+            rd_accept.eq(user.cmd.valid & user.cmd.ready & ~user.cmd.we),
+        ]
+
+        # User write data (with the command or after it).
+        wdata_target = Signal(max=max(depth, 2))
+        wdata_accept = Signal()
+        self.comb += [
+            wdata_target.eq(Mux(wr_busy, wr_target, Mux(wr_hit, hit_index, free_index))),
+            user.wdata.ready.eq(wr_busy | wr_accept),
+            wdata_accept.eq(user.wdata.valid & user.wdata.ready),
+        ]
+        self.sync += [
+            If(wr_accept & ~wdata_accept,
+                wr_busy.eq(1),
+                wr_target.eq(wdata_target)
+            ).Elif(wdata_accept,
+                wr_busy.eq(0)
+            )
+        ]
+
+        # Write entries update.
+        for i in range(depth):
+            alloc  = Signal()
+            fill   = Signal()
+            old_we = Signal(bw)
+            self.comb += [
+                alloc.eq(wr_accept & ~wr_hit & (free_index == i)),
+                fill.eq(wdata_accept & (wdata_target == i)),
+                old_we.eq(Mux(alloc, 0, wr_we[i])),
+            ]
+            self.sync += [
+                If(alloc,
+                    wr_valid[i].eq(1),
+                    wr_addr[i].eq(user.cmd.addr)
+                ).Elif(drain & (cmd_index == i),
+                    wr_valid[i].eq(0)
+                ),
+                If(fill,
+                    wr_we[i].eq(old_we | user.wdata.we),
+                    wr_data[i].eq(Cat(*[Mux(user.wdata.we[b],
+                        user.wdata.data[8*b:8*(b + 1)],
+                        wr_data[i][8*b:8*(b + 1)]) for b in range(bw)]))
+                ).Elif(alloc,
+                    wr_we[i].eq(0)
+                )
+            ]
+
+        # Read window update / user read data (in order).
+        rd_slot = Signal(max=max(read_depth, 2))
+        self.comb += [
+            rd_slot.eq(rd_fifo.dout),
+            user.rdata.valid.eq(Array(rd_used)[rd_ret] & Array(rd_ready)[rd_ret]),
+            user.rdata.data.eq(Array(rd_data)[rd_ret]),
+        ]
+        rd_return = Signal()
+        self.comb += rd_return.eq(user.rdata.valid & user.rdata.ready)
+        for n in range(read_depth):
+            self.sync += [
+                If(rd_accept & (rd_alloc == n),
+                    rd_used[n].eq(1),
+                    rd_addr[n].eq(user.cmd.addr)
+                ).Elif(rd_return & (rd_ret == n),
+                    rd_used[n].eq(0)
+                ),
+                If(issue & (cmd_index == n),
+                    rd_issued[n].eq(1)
+                ).Elif(rd_return & (rd_ret == n),
+                    rd_issued[n].eq(0)
+                ),
+                If(port.rdata.valid & (rd_slot == n),
+                    rd_ready[n].eq(1),
+                    rd_data[n].eq(port.rdata.data)
+                ).Elif(rd_return & (rd_ret == n),
+                    rd_ready[n].eq(0)
+                )
+            ]
+        self.sync += [
+            If(rd_accept,
+                rd_alloc.eq(rd_alloc + 1)
+            ),
+            If(rd_return,
+                rd_ret.eq(rd_ret + 1)
+            )
+        ]
+
+        # Counters ---------------------------------------------------------------------------------
+        flush = Signal()
+        self.comb += flush.eq(~write_mode & raw)
+        for counter, inc in [
+            (self.combined,    wr_accept & wr_hit),
+            (self.reordered,   issue & (cmd_index != oldest_index)),
+            (self.flushes,     flush),
+            (self.turnarounds, cmd_done & last_seen & (cmd_we != last_we))]:
+            self.sync += [
+                If(self.clear.re,
+                    counter.status.eq(0)
+                ).Elif(inc,
+                    counter.status.eq(counter.status + 1)
+                )
+            ]